@@ -0,0 +1,190 @@
+"""Accounts and per-account running balances, maintained one year segment at a time
+
+Income adds to its account, an expense takes from it and a transfer moves the amount
+from `account` to `to_account`. Rows saved before accounts existed belong to DEFAULT_ACCOUNT.
+
+The balance index keeps, per segment, each account's net change (also stored in the
+manifest) and, on demand, its day-by-day cumulative sum. A balance is the opening balance,
+plus the totals carried over from earlier segments, plus one binary search in its own
+segment. An edit only invalidates its own segment.
+"""
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+from budget_schema import DAY_FIELD, DEFAULT_ACCOUNT, epoch_day
+
+
+def account_of(t):
+    """Account a transaction belongs to"""
+    return t.get('account') or DEFAULT_ACCOUNT
+
+
+def account_flows(rows):
+    """(accounts, epoch days, signed amounts) of every money movement in a list of transactions"""
+    accounts, days, amounts = [], [], []
+
+    def add(account, day, amount):
+        accounts.append(account)
+        days.append(day)
+        amounts.append(amount)
+
+    for t in rows:
+        day = t[DAY_FIELD] if DAY_FIELD in t else epoch_day(t['date'][:10])
+        amount = float(t['amount'])
+        if t['type'] == 'Income':
+            add(account_of(t), day, amount)
+        else:
+            add(account_of(t), day, -amount)
+            if t['type'] == 'Transfer':
+                add(t['to_account'], day, amount)
+    return np.array(accounts, dtype=object), np.array(days, dtype=np.int64), np.array(amounts, dtype=float)
+
+
+def account_amounts(df, account):
+    """Signed amounts (money in is positive) of the frame's rows that move money in or out of an account"""
+    accounts = df['account'].fillna(DEFAULT_ACCOUNT) if 'account' in df.columns \
+        else pd.Series(DEFAULT_ACCOUNT, index=df.index)
+    to_accounts = df['to_account'] if 'to_account' in df.columns else pd.Series(None, index=df.index, dtype=object)
+    outgoing = (accounts == account) & (df['type'] != 'Income')
+    incoming = ((accounts == account) & (df['type'] == 'Income')) | ((to_accounts == account) & (df['type'] == 'Transfer'))
+    return df['amount'].where(incoming, -df['amount'])[incoming | outgoing]
+
+
+def account_totals(rows):
+    """Net change of each account over a list of transactions"""
+    accounts, _, amounts = account_flows(rows)
+    if not len(amounts):
+        return {}
+    totals = pd.Series(amounts).groupby(accounts).sum()
+    return {str(account): round(float(total), 2) for account, total in totals.items()}
+
+
+def segment_balances(rows):
+    """Running net change of each account within one segment: {account: (days, cumulative)}
+
+    One entry per day with activity; cumulative[i] is the change from the start of the
+    segment through days[i].
+    """
+    accounts, days, amounts = account_flows(rows)
+    if not len(amounts):
+        return {}
+    daily = pd.Series(amounts).groupby([accounts, days]).sum()
+    return {
+        account: (series.index.get_level_values(1).to_numpy(dtype=np.int64), np.cumsum(series.to_numpy()))
+        for account, series in daily.groupby(level=0)
+    }
+
+
+def build_balance_index(openings):
+    """Empty balance index; fill it with refresh_balance_index"""
+    return {'openings': dict(openings), 'digests': {}, 'totals': {}, 'detail': {}, 'years': [], 'carried': [{}]}
+
+
+def _accumulate(index):
+    """Balances carried into each segment: running sums of the segment totals"""
+    index['years'] = sorted(index['totals'])
+    carried, running = [{}], {}
+    for year in index['years']:
+        for account, total in index['totals'][year].items():
+            running[account] = running.get(account, 0.0) + total
+        carried.append(dict(running))
+    index['carried'] = carried
+
+
+def refresh_balance_index(index, segments, load_rows, openings=None):
+    """Bring the index up to date with the manifest's segments
+
+    Segments whose digest is unchanged keep their totals and per-day detail; a changed
+    segment is recomputed on its own. Totals come from the manifest when it has them, so
+    years that aren't loaded are only read for manifests written before accounts existed.
+    """
+    if openings is not None:
+        index['openings'] = dict(openings)
+    for year in list(index['digests']):
+        if segments.get(year, {}).get('digest') != index['digests'][year]:
+            for part in ('digests', 'totals', 'detail'):
+                index[part].pop(year, None)
+    for year, info in segments.items():
+        if year in index['digests']:
+            continue
+        if 'accounts' in info:
+            index['totals'][year] = info['accounts']
+        else:
+            rows = load_rows(year)
+            index['totals'][year] = account_totals(rows)
+            index['detail'][year] = segment_balances(rows)
+        index['digests'][year] = info['digest']
+    _accumulate(index)
+    return index
+
+
+def record_append(index, transaction, digest):
+    """Fold a just-saved new transaction into the index without rebuilding its segment
+
+    When the row is on or after the last day of every account it touches, the tail of
+    that account's cumulative sum is extended. Otherwise the segment is dropped and
+    rebuilt on the next refresh.
+    """
+    year = transaction['date'][:4]
+    detail = index['detail'].get(year)
+    accounts, days, amounts = account_flows([transaction])
+    at_tail = detail is not None and all(
+        account not in detail or detail[account][0][-1] <= day for account, day in zip(accounts, days)
+    )
+    if not at_tail:
+        for part in ('digests', 'totals', 'detail'):
+            index[part].pop(year, None)
+        return index
+    totals = dict(index['totals'][year])
+    for account, day, amount in zip(accounts, days, amounts):
+        account_days, cumulative = detail.get(account, (np.array([], dtype=np.int64), np.array([])))
+        last = cumulative[-1] if len(cumulative) else 0.0
+        if len(account_days) and account_days[-1] == day:
+            cumulative = np.concatenate([cumulative[:-1], [last + amount]])
+        else:
+            account_days = np.append(account_days, day)
+            cumulative = np.append(cumulative, last + amount)
+        detail[account] = (account_days, cumulative)
+        totals[account] = round(totals.get(account, 0.0) + amount, 2)
+    index['totals'][year] = totals
+    index['digests'][year] = digest
+    _accumulate(index)
+    return index
+
+
+def _detail(index, year, load_rows):
+    if year not in index['detail']:
+        index['detail'][year] = segment_balances(load_rows(year))
+    return index['detail'][year]
+
+
+def balances_at(index, account, days, load_rows):
+    """Balance of an account at the end of each epoch day in `days` (vectorized per segment)"""
+    days = np.asarray(days, dtype=np.int64)
+    years = days.astype('datetime64[D]').astype('datetime64[Y]').astype(int) + 1970
+    balances = np.full(len(days), float(index['openings'].get(account, 0.0)))
+    for number in np.unique(years):
+        year = str(number)
+        selected = years == number
+        position = bisect_left(index['years'], year)
+        balances[selected] += index['carried'][position].get(account, 0.0)
+        if year in index['totals']:
+            account_days, cumulative = _detail(index, year, load_rows).get(account, (np.array([]), np.array([])))
+            found = np.searchsorted(account_days, days[selected], side='right')
+            balances[selected] += np.append(0.0, cumulative)[found]
+    return balances
+
+
+def balance_at(index, account, day, load_rows):
+    """Balance of an account at the end of one epoch day"""
+    return float(balances_at(index, account, [day], load_rows)[0])
+
+
+def known_accounts(index):
+    """Every account with an opening balance or any transactions"""
+    names = set(index['openings'])
+    for totals in index['totals'].values():
+        names.update(totals)
+    return names
@@ -0,0 +1,568 @@
+"""Pure-pandas analytics used by the Streamlit app (no Streamlit imports here)"""
+import calendar
+import math
+import warnings
+
+import numpy as np
+import pandas as pd
+
+MONTH_NAMES = [calendar.month_abbr[m] for m in range(1, 13)]
+
+CUBE_INDEX = ['year', 'month', 'type', 'category']
+
+
+# Year x month x category pivot cube
+def build_pivot_cube(df):
+    """Aggregate transactions into a (year, month, type, category) cube of totals and counts"""
+    if df.empty:
+        index = pd.MultiIndex.from_arrays([[], [], [], []], names=CUBE_INDEX)
+        return pd.DataFrame({'amount': pd.Series(dtype=float), 'count': pd.Series(dtype=int)}, index=index)
+    keys = [df['date'].dt.year.rename('year'), df['date'].dt.month.rename('month'), df['type'], df['category']]
+    cube = df.groupby(keys, sort=True)['amount'].agg(['sum', 'count'])
+    cube.columns = ['amount', 'count']
+    return cube
+
+
+def build_month_index(df):
+    """Map (year, month) to the row positions of its transactions, for drill-down without rescanning"""
+    if df.empty:
+        return {}
+    groups = df.groupby([df['date'].dt.year, df['date'].dt.month], sort=False).indices
+    return {(int(y), int(m)): rows for (y, m), rows in groups.items()}
+
+
+def _cube_slice(cube, transaction_type):
+    """Totals for one transaction type, still indexed by year, month and category"""
+    if cube.empty or transaction_type not in cube.index.get_level_values('type'):
+        return pd.Series(dtype=float)
+    return cube.xs(transaction_type, level='type')['amount']
+
+
+def _xs_or_empty(series, key, level):
+    """Cross-section of a cube series, or an empty series when the key is absent"""
+    try:
+        return series.xs(key, level=level)
+    except KeyError:
+        return pd.Series(dtype=float)
+
+
+def _add_change_columns(table, current, previous):
+    """Add absolute and percentage change columns comparing two total columns"""
+    table['Change'] = table[current] - table[previous]
+    prior = table[previous].replace(0, np.nan)
+    table['Change %'] = table['Change'] / prior * 100
+    return table
+
+
+def yoy_by_year(cube, transaction_type):
+    """Yearly totals with change versus the previous year"""
+    totals = _cube_slice(cube, transaction_type)
+    if totals.empty:
+        return pd.DataFrame(columns=['Year', 'Total', 'Prior Year', 'Change', 'Change %'])
+    by_year = totals.groupby(level='year').sum()
+    years = np.arange(by_year.index.min(), by_year.index.max() + 1)
+    by_year = by_year.reindex(years, fill_value=0.0)
+    table = pd.DataFrame({'Year': years, 'Total': by_year.values, 'Prior Year': by_year.shift(1).values})
+    return _add_change_columns(table, 'Total', 'Prior Year')
+
+
+def yoy_month_matrix(cube, transaction_type):
+    """Year x month matrix of totals plus the same-month change versus the previous year"""
+    totals = _cube_slice(cube, transaction_type)
+    if totals.empty:
+        empty = pd.DataFrame(columns=MONTH_NAMES, dtype=float)
+        return empty, empty.copy(), empty.copy()
+    matrix = totals.groupby(level=['year', 'month']).sum().unstack('month')
+    years = np.arange(matrix.index.min(), matrix.index.max() + 1)
+    matrix = matrix.reindex(index=years, columns=range(1, 13), fill_value=0.0).fillna(0.0)
+    matrix.columns = MONTH_NAMES
+    delta = matrix.diff()
+    pct = delta / matrix.shift(1).replace(0, np.nan) * 100
+    return matrix, delta, pct
+
+
+def yoy_category_matrix(cube, transaction_type):
+    """Category x year matrix of totals"""
+    totals = _cube_slice(cube, transaction_type)
+    if totals.empty:
+        return pd.DataFrame()
+    matrix = totals.groupby(level=['category', 'year']).sum().unstack('year', fill_value=0.0)
+    years = np.arange(matrix.columns.min(), matrix.columns.max() + 1)
+    return matrix.reindex(columns=years, fill_value=0.0)
+
+
+def yoy_year_detail(cube, transaction_type, year, month=None):
+    """Per-month (or, for a single month, per-category) totals of a year compared with the year before"""
+    totals = _cube_slice(cube, transaction_type)
+    if totals.empty:
+        return pd.DataFrame(columns=['Total', 'Prior Year', 'Change', 'Change %'])
+    if month is None:
+        by_month = totals.groupby(level=['year', 'month']).sum()
+        current = _xs_or_empty(by_month, year, 'year')
+        previous = _xs_or_empty(by_month, year - 1, 'year')
+        keys = pd.Index(range(1, 13), name='month')
+    else:
+        current = _xs_or_empty(totals, (year, month), ['year', 'month'])
+        previous = _xs_or_empty(totals, (year - 1, month), ['year', 'month'])
+        keys = current.index.union(previous.index).rename('category')
+    table = pd.DataFrame({
+        'Total': current.reindex(keys, fill_value=0.0),
+        'Prior Year': previous.reindex(keys, fill_value=0.0)
+    })
+    table = _add_change_columns(table, 'Total', 'Prior Year')
+    if month is None:
+        table.index = pd.Index(MONTH_NAMES, name='Month')
+    else:
+        table = table.sort_values('Total', ascending=False)
+        table.index.name = 'Category'
+    return table
+
+
+# Cash-flow forecasting
+FREQUENCY_DAYS = {'Daily': 1, 'Weekly': 7, 'Bi-weekly': 14}
+
+SEASONAL_MIN_MONTHS = 24
+
+
+def forecast_calendar(start, months):
+    """Daily calendar from start through the same day `months` months later"""
+    end = pd.Timestamp(start) + pd.DateOffset(months=months) - pd.Timedelta(days=1)
+    return pd.date_range(pd.Timestamp(start), end, freq='D')
+
+
+def recurring_occurrences(template, calendar_days):
+    """Boolean mask of the calendar days on which a recurring template will fire"""
+    days = calendar_days.values.astype('datetime64[D]')
+    start = np.datetime64(template['start_date'][:10], 'D')
+    last = np.datetime64(template['last_processed'][:10], 'D') if template.get('last_processed') else None
+    mask = days >= start
+    if last is not None:
+        mask &= days > last
+    
+    frequency = template['frequency']
+    if frequency in FREQUENCY_DAYS:
+        anchor = last if last is not None else start
+        mask &= (days - anchor).astype(int) % FREQUENCY_DAYS[frequency] == 0
+    else:
+        # Monthly and yearly templates fire on the start date's day, clipped to short months
+        start_ts = pd.Timestamp(start)
+        due_day = np.minimum(start_ts.day, calendar_days.days_in_month.values)
+        mask &= calendar_days.day.values == due_day
+        if frequency == 'Yearly':
+            mask &= calendar_days.month.values == start_ts.month
+            if last is not None:
+                mask &= calendar_days.year.values != pd.Timestamp(last).year
+        elif last is not None:
+            last_ts = pd.Timestamp(last)
+            mask &= (calendar_days.year.values != last_ts.year) | (calendar_days.month.values != last_ts.month)
+    return mask
+
+
+def expand_recurring(recurring, calendar_days):
+    """Days x (type, category) matrix of amounts from active recurring templates"""
+    columns = {}
+    for template in recurring:
+        if not template.get('active', True):
+            continue
+        key = (template['type'], template['category'])
+        amounts = recurring_occurrences(template, calendar_days) * float(template['amount'])
+        columns[key] = columns[key] + amounts if key in columns else amounts
+    matrix = pd.DataFrame(columns, index=calendar_days)
+    matrix.columns = pd.MultiIndex.from_tuples(matrix.columns, names=['type', 'category']) if columns else \
+        pd.MultiIndex.from_arrays([[], []], names=['type', 'category'])
+    return matrix
+
+
+def seasonal_baseline(df, as_of, history_months=36):
+    """Expected monthly amount per (type, category) for each calendar month, learned from history
+
+    Transactions created by recurring templates are left out because the templates
+    themselves are projected forward. With at least two years of history the recent
+    monthly level is scaled by each calendar month's seasonal index.
+    """
+    empty = pd.DataFrame(index=range(1, 13), columns=pd.MultiIndex.from_arrays([[], []], names=['type', 'category']), dtype=float)
+    if df.empty:
+        return empty
+    current = pd.Timestamp(as_of).to_period('M')
+    first = current - history_months
+    history = df
+    if 'recurring' in history.columns:
+        history = history[~history['recurring'].fillna(False).astype(bool)]
+    periods = history['date'].dt.to_period('M')
+    in_window = (periods >= first) & (periods < current)
+    history = history[in_window]
+    if history.empty:
+        return empty
+    
+    monthly = history.groupby([periods[in_window], history['type'], history['category']])['amount'].sum()
+    monthly = monthly.unstack(['type', 'category'], fill_value=0.0)
+    months = pd.period_range(monthly.index.min(), current - 1, freq='M')
+    monthly = monthly.reindex(months, fill_value=0.0)
+    
+    level = monthly.tail(12).mean()
+    if len(monthly) >= SEASONAL_MIN_MONTHS:
+        by_month = monthly.groupby(monthly.index.month).mean().reindex(range(1, 13), fill_value=0.0)
+        overall = monthly.mean().replace(0, np.nan)
+        seasonal_index = (by_month / overall).fillna(1.0)
+    else:
+        seasonal_index = pd.DataFrame(1.0, index=range(1, 13), columns=monthly.columns)
+    return seasonal_index * level
+
+
+def forecast_cash_flow(df, recurring, start, months, starting_balance=0.0):
+    """Project daily income, expenses, net cash flow and balance for the next `months` months"""
+    calendar_days = forecast_calendar(start, months)
+    
+    # Seasonal baseline, spread evenly across the days of each month
+    baseline = seasonal_baseline(df, start)
+    month_of_year = calendar_days.month.values - 1
+    daily_baseline = baseline.values[month_of_year] / calendar_days.days_in_month.values[:, None]
+    baseline_types = baseline.columns.get_level_values('type') if len(baseline.columns) else np.array([])
+    
+    scheduled = expand_recurring(recurring, calendar_days)
+    scheduled_types = scheduled.columns.get_level_values('type') if len(scheduled.columns) else np.array([])
+    
+    def _total(values, types, transaction_type):
+        columns = np.asarray(types) == transaction_type
+        return values[:, columns].sum(axis=1) if columns.any() else np.zeros(len(calendar_days))
+    
+    income = _total(daily_baseline, baseline_types, 'Income') + _total(scheduled.values, scheduled_types, 'Income')
+    expenses = _total(daily_baseline, baseline_types, 'Expense') + _total(scheduled.values, scheduled_types, 'Expense')
+    net = income - expenses
+    
+    return pd.DataFrame({
+        'date': calendar_days,
+        'income': income,
+        'expenses': expenses,
+        'net': net,
+        'balance': starting_balance + np.cumsum(net)
+    })
+
+
+def forecast_by_month(forecast):
+    """Roll a daily forecast up to calendar months"""
+    if forecast.empty:
+        return pd.DataFrame(columns=['month', 'income', 'expenses', 'net', 'balance'])
+    months = forecast['date'].dt.to_period('M')
+    monthly = forecast.groupby(months).agg({'income': 'sum', 'expenses': 'sum', 'net': 'sum', 'balance': 'last'})
+    monthly.index = monthly.index.astype(str)
+    return monthly.rename_axis('month').reset_index()
+
+
+# Monte Carlo goal projections
+DAYS_PER_MONTH = 30.44
+
+
+def monthly_net_history(df, as_of, history_months=24):
+    """Net savings (income minus expenses) of each full month before `as_of`"""
+    if df.empty:
+        return np.array([])
+    current = pd.Timestamp(as_of).to_period('M')
+    periods = df['date'].dt.to_period('M')
+    in_window = (periods >= current - history_months) & (periods < current)
+    if not in_window.any():
+        return np.array([])
+    # Transfers move money between accounts and don't change net savings
+    signed = np.select([df['type'] == 'Income', df['type'] == 'Expense'], [df['amount'], -df['amount']], 0.0)
+    net = pd.Series(signed[in_window.values], index=periods[in_window]).groupby(level=0).sum()
+    months = pd.period_range(net.index.min(), current - 1, freq='M')
+    return net.reindex(months, fill_value=0.0).values
+
+
+def simulate_goal(goal, monthly_net, as_of, paths=5000, seed=0, share=1.0):
+    """Bootstrap monthly net savings to estimate when a goal's target is reached
+
+    Each path resamples the ledger's historical monthly net savings (floored at zero,
+    since a goal balance is not drawn down), scaled by the goal's `share` of them, and
+    accumulates it on top of the goal's current amount. Returns the probability of
+    reaching the target by the deadline and the P10/P50/P90 completion dates (None when
+    not reached within the horizon).
+    """
+    as_of = pd.Timestamp(as_of).normalize()
+    deadline = pd.Timestamp(goal['deadline'][:10])
+    remaining = goal['target'] - goal['current']
+    if remaining <= 0:
+        return {'probability': 1.0, 'p10': as_of, 'p50': as_of, 'p90': as_of}
+    
+    contributions = np.clip(np.asarray(monthly_net, dtype=float), 0.0, None) * share
+    # A deadline later this month still leaves one contribution
+    days_to_deadline = (deadline - as_of).days
+    months_to_deadline = math.ceil(days_to_deadline / DAYS_PER_MONTH) if days_to_deadline > 0 else 0
+    if contributions.size == 0 or not contributions.any():
+        return {'probability': 0.0, 'p10': None, 'p50': None, 'p90': None}
+    
+    # Simulate past the deadline so late completion dates can still be reported
+    horizon = max(months_to_deadline, 12) * 2
+    rng = np.random.default_rng(seed)
+    draws = rng.choice(contributions, size=(paths, horizon))
+    reached = np.cumsum(draws, axis=1) >= remaining
+    hit_month = np.where(reached.any(axis=1), reached.argmax(axis=1) + 1, horizon + 1)
+    
+    probability = float((hit_month <= months_to_deadline).mean())
+    result = {'probability': probability}
+    for label, q in (('p10', 10), ('p50', 50), ('p90', 90)):
+        month = int(np.percentile(hit_month, q, method='higher'))
+        result[label] = as_of + pd.DateOffset(months=month) if month <= horizon else None
+    return result
+
+
+def simulate_goals(goals, monthly_net, as_of, paths=5000):
+    """Monte Carlo projection for every goal, in the same order as `goals`
+
+    The household's savings are split evenly between the goals that still need money,
+    rather than counted in full towards each of them.
+    """
+    open_goals = sum(goal['target'] > goal['current'] for goal in goals)
+    share = 1.0 / max(open_goals, 1)
+    return [simulate_goal(goal, monthly_net, as_of, paths=paths, seed=idx, share=share)
+            for idx, goal in enumerate(goals)]
+
+
+# Spending anomaly detection
+ANOMALY_THRESHOLD = 3.5
+
+MAD_SCALE = 0.6745
+
+
+def spend_matrix(df, freq='D', end=None):
+    """Expense totals per period (rows) and category (columns), empty periods filled with zero"""
+    expenses = df[df['type'] == 'Expense'] if not df.empty else df
+    if expenses.empty:
+        return pd.DataFrame()
+    periods = expenses['date'].dt.to_period(freq)
+    matrix = expenses.groupby([periods, expenses['category']])['amount'].sum().unstack('category', fill_value=0.0)
+    last = matrix.index.max()
+    if end is not None:
+        last = max(last, pd.Period(end, freq=freq))
+    return matrix.reindex(pd.period_range(matrix.index.min(), last, freq=freq), fill_value=0.0)
+
+
+def _stack_flags(values, expected, scores, flagged):
+    """Long-format table of the flagged cells of a period x category matrix"""
+    table = pd.DataFrame({
+        'amount': values.stack(),
+        'expected': expected.stack(),
+        'score': scores.stack(),
+        'flagged': flagged.stack()
+    })
+    table = table[table['flagged']].drop(columns='flagged')
+    table.index.names = ['period', 'category']
+    return table.reset_index().sort_values('score', ascending=False)
+
+
+def _trailing_mad(matrix, median, window, min_periods):
+    """Median absolute deviation of each cell's `window` preceding periods from their own median
+
+    The trailing windows of all cells are a strided view of the matrix (NaN-padded at the
+    start), so every window is measured against its own median in one vectorized pass.
+    """
+    values = matrix.to_numpy(dtype=float)
+    padded = np.vstack([np.full((window, values.shape[1]), np.nan), values])
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window, axis=0)[:len(values)]
+    deviations = np.abs(windows - median.to_numpy(dtype=float)[:, :, None])
+    enough = (~np.isnan(windows)).sum(axis=2) >= min_periods
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # windows that are all padding
+        mad = np.nanmedian(deviations, axis=2)
+    return pd.DataFrame(np.where(enough, mad, np.nan), index=matrix.index, columns=matrix.columns)
+
+
+def rolling_anomalies(matrix, window, min_periods=3, threshold=ANOMALY_THRESHOLD, recent=None):
+    """Flag category spend that is far above that category's own trailing window
+
+    All categories are scored at once with column-wise rolling windows. Each period is
+    compared with the `window` periods before it using a robust z-score (median/MAD),
+    falling back to a classic z-score where the MAD is zero (e.g. mostly-empty days).
+    A flagged value must also exceed the window's maximum, so regular large payments
+    such as rent do not trip the daily check every month. With `recent`, only the last
+    `recent` periods (plus their lookback) are evaluated.
+    """
+    if matrix.empty:
+        return pd.DataFrame(columns=['period', 'category', 'amount', 'expected', 'score'])
+    if recent is not None:
+        matrix = matrix.iloc[-(recent + window):]
+    history = matrix.shift(1).rolling(window, min_periods=min_periods)
+    median = history.median()
+    mad = _trailing_mad(matrix, median, window, min_periods)
+    mean = history.mean()
+    std = history.std()
+    
+    robust = MAD_SCALE * (matrix - median) / mad.where(mad > 0)
+    classic = (matrix - mean) / std.where(std > 0)
+    scores = robust.where(mad > 0, classic)
+    flagged = (scores > threshold) & (matrix > history.max().fillna(0.0))
+    if recent is not None:
+        matrix, median, scores, flagged = (m.iloc[-recent:] for m in (matrix, median, scores, flagged))
+    return _stack_flags(matrix, median, scores, flagged.fillna(False))
+
+
+def category_amount_stats(df):
+    """Median, MAD and count of expense transaction amounts per category"""
+    expenses = df[df['type'] == 'Expense'] if not df.empty else df
+    if expenses.empty:
+        return pd.DataFrame(columns=['median', 'mad', 'count'])
+    by_category = expenses.groupby('category')['amount']
+    median = by_category.median()
+    deviation = (expenses['amount'] - expenses['category'].map(median)).abs()
+    mad = deviation.groupby(expenses['category']).median()
+    return pd.DataFrame({'median': median, 'mad': mad, 'count': by_category.size()})
+
+
+def transaction_outliers(df, stats, threshold=ANOMALY_THRESHOLD, min_count=5):
+    """Expense transactions far above their category's usual amount
+
+    Scores only the rows of `df` against precomputed `stats`, so new transactions can be
+    checked incrementally without rescanning the ledger.
+    """
+    if df.empty or stats.empty:
+        return df.iloc[0:0].assign(expected=pd.Series(dtype=float), score=pd.Series(dtype=float))
+    expenses = df[df['type'] == 'Expense']
+    category_stats = stats.reindex(expenses['category'])
+    usable = (category_stats['count'].values >= min_count) & (category_stats['mad'].values > 0)
+    scores = np.full(len(expenses), np.nan)
+    scores[usable] = MAD_SCALE * (expenses['amount'].values[usable] - category_stats['median'].values[usable]) \
+        / category_stats['mad'].values[usable]
+    outliers = expenses.assign(expected=category_stats['median'].values, score=scores)
+    return outliers[outliers['score'] > threshold].sort_values('score', ascending=False)
+
+
+# Prefix sums for constant-time date-range totals
+def build_prefix_sums(df):
+    """Cumulative daily totals per (type, category) column, with a leading zero row
+
+    Row i holds the totals of every day before start + i, so the total of any inclusive
+    date range is cumulative[end + 1] - cumulative[start]: two lookups, whatever the span.
+    """
+    if df.empty:
+        return {'start': None, 'columns': pd.MultiIndex.from_tuples([], names=['type', 'category']),
+                'cumulative': np.zeros((1, 0))}
+    days = df['date'].values.astype('datetime64[D]')
+    start = days.min()
+    offsets = (days - start).astype(np.int64)
+    keys = pd.MultiIndex.from_arrays([df['type'].values, df['category'].values], names=['type', 'category'])
+    codes, columns = pd.factorize(keys)
+    daily = np.zeros((int(offsets.max()) + 1, len(columns)))
+    np.add.at(daily, (offsets, codes), df['amount'].values.astype(float))
+    cumulative = np.vstack([np.zeros((1, len(columns))), np.cumsum(daily, axis=0)])
+    return {'start': start, 'columns': pd.MultiIndex.from_tuples(list(columns), names=['type', 'category']),
+            'cumulative': cumulative}
+
+
+def _prefix_rows(prefix, start_date, end_date):
+    """Clipped cumulative row numbers bracketing an inclusive date range"""
+    n = len(prefix['cumulative']) - 1
+    if prefix['start'] is None:
+        return 0, 0
+    first = int((np.datetime64(start_date, 'D') - prefix['start']).astype(np.int64))
+    last = int((np.datetime64(end_date, 'D') - prefix['start']).astype(np.int64)) + 1
+    return min(max(first, 0), n), min(max(last, 0), n)
+
+
+def range_category_totals(prefix, start_date, end_date):
+    """Totals per (type, category) over an inclusive date range"""
+    first, last = _prefix_rows(prefix, start_date, end_date)
+    totals = prefix['cumulative'][last] - prefix['cumulative'][first]
+    return pd.Series(totals, index=prefix['columns'])
+
+
+def range_summary(prefix, start_date, end_date):
+    """Income, expenses, net, average daily spend and savings rate over an inclusive date range"""
+    by_type = range_category_totals(prefix, start_date, end_date).groupby(level='type').sum()
+    income = float(by_type.get('Income', 0.0))
+    expenses = float(by_type.get('Expense', 0.0))
+    days = max(1, (end_date - start_date).days + 1)
+    return {
+        'income': income,
+        'expenses': expenses,
+        'net': income - expenses,
+        'avg_daily_spend': expenses / days,
+        'savings_rate': (income - expenses) / income * 100 if income > 0 else 0.0
+    }
+
+
+def range_daily_totals(prefix, start_date, end_date, transaction_type):
+    """Per-day totals of one type over an inclusive date range (days without activity omitted)"""
+    first, last = _prefix_rows(prefix, start_date, end_date)
+    selected = np.asarray(prefix['columns'].get_level_values('type') == transaction_type)
+    cumulative = prefix['cumulative'][first:last + 1, selected].sum(axis=1)
+    daily = np.diff(cumulative)
+    days = prefix['start'] + np.arange(first, last) if prefix['start'] is not None else np.array([], 'datetime64[D]')
+    active = np.abs(daily) > 1e-9
+    return pd.DataFrame({'date': pd.to_datetime(days[active]).date, 'amount': daily[active]})
+
+
+# Envelope budgeting
+def month_keys(first, last):
+    """'YYYY-MM' keys from first to last inclusive, stepping by calendar month"""
+    return [str(p) for p in pd.period_range(pd.Period(first, freq='M'), pd.Period(last, freq='M'), freq='M')]
+
+
+def budget_matrix(budgets, months):
+    """Month x category matrix of budgeted amounts (missing entries are zero)"""
+    rows = {month: budgets.get(month, {}) for month in months}
+    return pd.DataFrame.from_dict(rows, orient='index', dtype=float).reindex(months).fillna(0.0)
+
+
+def roll_envelopes(budget, actual, opening=None, started=None):
+    """Envelope balances: unused budget (or overspending) carries into the next month
+
+    `budget` and `actual` are month x category matrices with the same rows. A
+    category's chain starts at its first budgeted month, so spending from before it
+    was budgeted doesn't count against it. The whole chain is one cumulative sum of
+    (budget - actual); `opening` and `started` continue a chain computed earlier.
+    Returns month x category frames: carry (into the month), available and closing.
+    """
+    columns = budget.columns.union(actual.columns)
+    budget = budget.reindex(columns=columns, fill_value=0.0)
+    actual = actual.reindex(index=budget.index, columns=columns, fill_value=0.0).fillna(0.0)
+    opening = (opening if opening is not None else pd.Series(dtype=float)).reindex(columns, fill_value=0.0)
+    started = (started if started is not None else pd.Series(dtype=bool)).reindex(columns, fill_value=False)
+
+    active = budget.gt(0).cummax() | started
+    flow = (budget - actual).where(active, 0.0)
+    closing = flow.cumsum() + opening
+    carry = closing.shift(1)
+    carry.iloc[0] = opening
+    return {'carry': carry, 'available': budget + carry, 'closing': closing}
+
+
+def update_envelopes(previous, budget, actual, changed_month):
+    """Recompute envelopes from `changed_month` on, reusing the earlier months of `previous`"""
+    months = list(budget.index)
+    if changed_month not in months or changed_month == months[0]:
+        return roll_envelopes(budget, actual)
+    position = months.index(changed_month)
+    suffix = roll_envelopes(
+        budget.iloc[position:], actual.reindex(budget.index).iloc[position:],
+        opening=previous['carry'].loc[changed_month],
+        started=budget.iloc[:position].gt(0).any()
+    )
+    return {
+        name: pd.concat([previous[name].iloc[:position].reindex(columns=frame.columns, fill_value=0.0), frame])
+        for name, frame in suffix.items()
+    }
+
+
+def budget_vs_actual(envelopes, month_budget, month):
+    """Budget, carryover, available, actual, remaining and percent used of each category budgeted (or carried) in a month"""
+    month_available = envelopes['available'].loc[month]
+    month_carry = envelopes['carry'].loc[month]
+    month_actual = month_available - envelopes['closing'].loc[month]
+    rows = []
+    for category in month_available.index:
+        budget_amount = month_budget.get(category, 0.0)
+        carryover = month_carry.get(category, 0.0)
+        if budget_amount > 0 or abs(carryover) > 0.005:
+            actual = month_actual[category]
+            available = month_available[category]
+            rows.append({
+                'Category': category,
+                'Budget': budget_amount,
+                'Carryover': carryover,
+                'Available': available,
+                'Actual': actual,
+                'Remaining': available - actual,
+                'Percent Used': (actual / available * 100) if available > 0 else (100.0 if actual > 0 else 0)
+            })
+    return pd.DataFrame(rows, columns=['Category', 'Budget', 'Carryover', 'Available', 'Actual', 'Remaining',
+                                       'Percent Used'])
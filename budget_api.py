@@ -0,0 +1,384 @@
+"""Local read-only JSON API over the saved budget data, for dashboards that shouldn't scrape the app
+
+    python budget_api.py [--data-dir budget_data] [--port 8765]
+
+Endpoints (GET only, localhost by default):
+    /summary/monthly   ?period=2024 | 2024-Q3 | 2023-07..2024-06   income, expenses and net per month
+    /categories        ?period=...&type=Expense                     totals per category
+    /budget            ?month=2024-07&rollover=1                     budget vs actual, with envelope carryover
+    /goals                                                           progress and monthly contributions
+    /transactions      ?q=<query>&page=1&per_page=50                 query results, newest first
+    /version                                                         current data version
+
+Amounts are in the reporting currency chosen in the app (transactions: as entered, with
+their currency). Every response carries an ETag of the data version (the stamps of the
+manifest, the budget, goal, account and settings files and the exchange-rate table, plus
+today's date). A request whose If-None-Match matches
+gets 304 before anything is read or computed, and computed responses are kept per version,
+so repeated requests for unchanged data cost one stat() per file. Errors are JSON too:
+{"error": ...} with 400 for a bad request and 500 for data that can't be read.
+"""
+import argparse
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+from budget_analytics import budget_matrix, month_keys, roll_envelopes, spend_matrix
+from budget_currency import (
+    BASE_CURRENCY, RATES_FILE_NAME, SETTINGS_FILE_NAME, convert_frame, convert_monthly, needs_conversion, read_rates,
+    read_reporting_currency, segment_currencies
+)
+from budget_goals import SAVINGS_ACCOUNT, contribution_matrix, goal_progress, migrate_goal
+from budget_query import QueryError, compile_query, parse_period
+from budget_schema import DAY_FIELD, DEFAULT_ACCOUNT, TRANSACTION_TYPES, days_to_datetimes
+from budget_storage import MANIFEST_NAME, read_manifest, read_segment
+
+DEFAULT_PORT = 8765
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+MAX_CACHED_RESPONSES = 256
+DATA_FILES = ("budgets.json", "goals.json", "accounts.json", SETTINGS_FILE_NAME, RATES_FILE_NAME)
+TRANSACTION_COLUMNS = ['date', 'type', 'category', 'amount', 'currency', 'description', 'account', 'to_account',
+                       'tags', 'notes', 'recurring', 'cleared']
+
+
+class ApiError(ValueError):
+    """A request the API can't answer, with its HTTP status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _param(params, name, default=None):
+    values = params.get(name)
+    return values[-1] if values else default
+
+
+def _int_param(params, name, default, minimum=1, maximum=None):
+    text = _param(params, name)
+    if text is None:
+        return default
+    try:
+        value = int(text)
+    except ValueError:
+        raise ApiError(f"{name} must be a whole number") from None
+    if value < minimum or (maximum is not None and value > maximum):
+        raise ApiError(f"{name} must be between {minimum} and {maximum}" if maximum else f"{name} must be at least {minimum}")
+    return value
+
+
+def _period(params):
+    """(start, end) dates of the `period` parameter, or (None, None) without one"""
+    text = _param(params, 'period')
+    if not text:
+        return None, None
+    try:
+        return parse_period(text)
+    except QueryError as e:
+        raise ApiError(str(e)) from None
+
+
+def _records(df):
+    """JSON-ready rows of a transactions frame"""
+    df = df.reindex(columns=TRANSACTION_COLUMNS)
+    df = df.assign(date=df['date'].dt.strftime('%Y-%m-%d'), account=df['account'].fillna(DEFAULT_ACCOUNT),
+                   currency=df['currency'].fillna(BASE_CURRENCY))
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+class BudgetApi:
+    """Routes requests over one data directory, with the ledger frame and responses cached per version"""
+
+    def __init__(self, data_dir):
+        self.data_dir = Path(data_dir)
+        self.segment_dir = self.data_dir / "transactions"
+        self.computed = 0  # responses actually computed (not served from cache or as 304)
+        self._lock = threading.Lock()
+        self._ledger = (None, None)
+        self._responses = OrderedDict()
+        self.routes = {
+            '/summary/monthly': self.monthly_summary,
+            '/categories': self.category_breakdown,
+            '/budget': self.budget_status,
+            '/goals': self.goals,
+            '/transactions': self.transactions,
+            '/version': lambda params: {'version': self.version()}
+        }
+
+    def version(self):
+        """Data version: changes whenever a data file (or the date) does"""
+        parts = [date.today().isoformat()]
+        for path in [self.segment_dir / MANIFEST_NAME] + [self.data_dir / name for name in DATA_FILES]:
+            try:
+                stat = path.stat()
+                parts.append(f"{stat.st_mtime_ns}-{stat.st_size}")
+            except FileNotFoundError:
+                parts.append("-")
+        return hashlib.sha1("|".join(parts).encode()).hexdigest()[:16]
+
+    def handle(self, target, if_none_match=None):
+        """Request target (path and query) -> (status, ETag or None, JSON body bytes)"""
+        url = urlsplit(target)
+        path = url.path.rstrip('/') or '/'
+        if path == '/':
+            return 200, None, json.dumps({'endpoints': sorted(self.routes)}).encode()
+        route = self.routes.get(path)
+        if route is None:
+            return 404, None, json.dumps({'error': f"No endpoint {path}"}).encode()
+
+        etag = f'"{self.version()}"'
+        if if_none_match and (if_none_match.strip() == '*' or etag in [t.strip() for t in if_none_match.split(',')]):
+            return 304, etag, b''
+        params = parse_qs(url.query)
+        key = (etag, path, tuple(sorted((name, tuple(values)) for name, values in params.items())))
+        with self._lock:
+            body = self._responses.get(key)
+            if body is not None:
+                self._responses.move_to_end(key)
+        if body is None:
+            try:
+                body = json.dumps(route(params)).encode()
+            except ApiError as e:
+                return e.status, None, json.dumps({'error': str(e)}).encode()
+            except Exception as e:  # SchemaError, malformed data files, OSError, ...: answer rather than drop
+                return 500, None, json.dumps({'error': f"{type(e).__name__}: {e}"}).encode()
+            with self._lock:
+                self.computed += 1
+                self._responses[key] = body
+                while len(self._responses) > MAX_CACHED_RESPONSES:
+                    self._responses.popitem(last=False)
+        return 200, etag, body
+
+    # Data
+
+    def _read_json(self, name, default):
+        path = self.data_dir / name
+        if not path.exists():
+            return default
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def ledger(self):
+        """(manifest, every saved transaction as one frame, newest first), rebuilt when the manifest changes"""
+        manifest = read_manifest(self.segment_dir)
+        stamp = json.dumps({year: info['digest'] for year, info in manifest['segments'].items()}, sort_keys=True)
+        with self._lock:
+            cached_stamp, df = self._ledger
+        if cached_stamp != stamp:
+            rows = [t for year in sorted(manifest['segments']) for t in read_segment(self.segment_dir, manifest, year)]
+            if rows:
+                df = pd.DataFrame(rows)
+                df['date'] = days_to_datetimes(df.pop(DAY_FIELD).values)
+            else:
+                df = pd.DataFrame({'date': pd.Series(dtype='datetime64[ns]'), 'type': pd.Series(dtype=object),
+                                   'category': pd.Series(dtype=object), 'amount': pd.Series(dtype=float)})
+            df = df.sort_values('date', ascending=False, kind='stable').reset_index(drop=True)
+            with self._lock:
+                self._ledger = (stamp, df)
+        return manifest, df
+
+    def reporting(self):
+        """(reporting currency, exchange-rate table) of the data directory"""
+        try:
+            return read_reporting_currency(self.data_dir), read_rates(self.data_dir / RATES_FILE_NAME)
+        except ValueError as e:  # CurrencyError
+            raise ApiError(str(e), status=500) from None
+
+    def reporting_ledger(self):
+        """(reporting currency, the ledger frame with amounts converted into it)"""
+        currency, rates = self.reporting()
+        _, df = self.ledger()
+        if not df.empty and needs_conversion(df, currency):
+            df = df.assign(amount=convert_frame(df, rates, currency)[0])
+        return currency, df
+
+    # Endpoints
+
+    def monthly_summary(self, params):
+        """Income, expenses, transfers and net per month, straight from the manifest"""
+        start, end = _period(params)
+        currency, rates = self.reporting()
+        segments = read_manifest(self.segment_dir)['segments']
+        months = {}
+        for info in segments.values():
+            months.update(info.get('monthly', {}))
+        stored = pd.DataFrame.from_dict(months, orient='index', columns=['Income', 'Expense']).fillna(0.0)
+        converted = convert_monthly(stored, segment_currencies(segments), rates, currency)
+        rows = []
+        for month in sorted(months):
+            if start is not None and not (start.isoformat()[:7] <= month <= end.isoformat()[:7]):
+                continue
+            income, expenses = converted.loc[month, 'Income'], converted.loc[month, 'Expense']
+            rows.append({'month': month, 'income': round(float(income), 2), 'expenses': round(float(expenses), 2),
+                         'transfers': round(months[month].get('Transfer', 0.0), 2),
+                         'net': round(float(income - expenses), 2)})
+        return {'currency': currency, 'months': rows}
+
+    def category_breakdown(self, params):
+        """Total, count and share per category of one transaction type over a period"""
+        transaction_type = _param(params, 'type', 'Expense')
+        if transaction_type not in TRANSACTION_TYPES:
+            raise ApiError(f"type must be one of {', '.join(TRANSACTION_TYPES)}")
+        start, end = _period(params)
+        currency, df = self.reporting_ledger()
+        selected = df['type'] == transaction_type
+        if start is not None:
+            selected &= (df['date'] >= pd.Timestamp(start)) & (df['date'] <= pd.Timestamp(end))
+        grouped = df[selected].groupby('category')['amount'].agg(['sum', 'count']).sort_values('sum', ascending=False)
+        total = float(grouped['sum'].sum())
+        return {
+            'type': transaction_type,
+            'currency': currency,
+            'start': start.isoformat() if start else None,
+            'end': end.isoformat() if end else None,
+            'total': round(total, 2),
+            'categories': [{'category': category, 'amount': round(float(row['sum']), 2), 'count': int(row['count']),
+                            'share': round(float(row['sum']) / total, 4) if total else 0.0}
+                           for category, row in grouped.iterrows()]
+        }
+
+    def budget_status(self, params):
+        """Budget vs actual per category for one month, with envelope carryover unless rollover=0"""
+        month = _param(params, 'month', date.today().strftime('%Y-%m'))
+        try:
+            month = str(pd.Period(month, freq='M'))
+        except ValueError:
+            raise ApiError(f"month {month!r} is not a month (use YYYY-MM)") from None
+        rollover = _param(params, 'rollover', '1') not in ('0', 'false', 'no')
+        budgets = self._read_json("budgets.json", {})
+        budgeted = sorted(m for m, b in budgets.items() if any(v > 0 for v in b.values()))
+        first = min(budgeted[0], month) if budgeted and rollover else month
+        months = month_keys(first, month)
+
+        currency, df = self.reporting_ledger()
+        actual = spend_matrix(df, freq='M')
+        actual.index = actual.index.astype(str)
+        envelopes = roll_envelopes(budget_matrix(budgets, months), actual.reindex(months).fillna(0.0))
+        month_budget = budgets.get(month, {})
+        available = envelopes['available'].loc[month]
+        carry = envelopes['carry'].loc[month]
+        spent = available - envelopes['closing'].loc[month]
+        categories = []
+        for category in available.index:
+            budget_amount = float(month_budget.get(category, 0.0))
+            if budget_amount <= 0 and abs(carry[category]) <= 0.005:
+                continue
+            categories.append({
+                'category': category,
+                'budget': round(budget_amount, 2),
+                'carryover': round(float(carry[category]), 2),
+                'available': round(float(available[category]), 2),
+                'actual': round(float(spent[category]), 2),
+                'remaining': round(float(available[category] - spent[category]), 2),
+                'percent_used': round(float(spent[category] / available[category] * 100), 1)
+                if available[category] > 0 else (100.0 if spent[category] > 0 else 0.0)
+            })
+        return {
+            'month': month,
+            'currency': currency,
+            'rollover': rollover,
+            'total_budget': round(sum(c['budget'] for c in categories), 2),
+            'total_actual': round(sum(c['actual'] for c in categories), 2),
+            'total_remaining': round(sum(c['remaining'] for c in categories), 2),
+            'categories': categories
+        }
+
+    def goals(self, params):
+        """Every goal's progress plus its contributions per month, from the manifest"""
+        contributions = contribution_matrix(read_manifest(self.segment_dir)['segments'])
+        goals = [migrate_goal(goal) for goal in self._read_json("goals.json", [])]
+        result = []
+        for goal in goal_progress(goals, contributions):
+            monthly = contributions[goal['id']] if goal['id'] in contributions.columns else pd.Series(dtype=float)
+            result.append({
+                'id': goal['id'],
+                'name': goal['name'],
+                'target': goal['target'],
+                'current': round(goal['current'], 2),
+                'contributed': round(goal['contributed'], 2),
+                'remaining': round(max(goal['target'] - goal['current'], 0.0), 2),
+                'percent': round(goal['current'] / goal['target'] * 100, 1) if goal['target'] > 0 else 0.0,
+                'deadline': goal['deadline'],
+                'priority': goal.get('priority', 'Medium'),
+                'account': goal.get('account', SAVINGS_ACCOUNT),
+                'contributions': {month: round(float(amount), 2) for month, amount in monthly.items() if amount}
+            })
+        return {'goals': result}
+
+    def transactions(self, params):
+        """One page of the transactions matching a query (the app's query language), newest first"""
+        query = _param(params, 'q', '')
+        page = _int_param(params, 'page', 1)
+        per_page = _int_param(params, 'per_page', DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE)
+        _, df = self.ledger()
+        try:
+            matched = df[compile_query(query)(df)] if query else df
+        except QueryError as e:
+            raise ApiError(f"Query: {e}") from None
+        total = len(matched)
+        pages = max((total + per_page - 1) // per_page, 1)
+        rows = matched.iloc[(page - 1) * per_page:page * per_page]
+        return {'query': query, 'total': total, 'page': page, 'per_page': per_page, 'pages': pages,
+                'transactions': _records(rows)}
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    """HTTP front end of a BudgetApi (set as the server's `api` attribute)"""
+
+    def do_GET(self):
+        status, etag, body = self.server.api.handle(self.path, self.headers.get('If-None-Match'))
+        self.send_response(status)
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        if status != 304:
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.send_error(405, "Read-only API: use GET")
+
+    do_POST = do_PUT = do_PATCH = do_DELETE = do_HEAD
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(data_dir, host='127.0.0.1', port=DEFAULT_PORT, quiet=False):
+    """HTTP server for the API (port 0 picks a free port; see server.server_address)"""
+    server = ThreadingHTTPServer((host, port), ApiRequestHandler)
+    server.api = BudgetApi(data_dir)
+    server.quiet = quiet
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read-only JSON API over the budget data")
+    parser.add_argument('--data-dir', default="budget_data")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    server = make_server(args.data_dir, args.host, args.port)
+    print(f"Serving {args.data_dir} on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
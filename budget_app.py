@@ -1,12 +1,56 @@
+from budget_startup import StartupTimer, LazyModule, deferred_import_times
+run_timer = StartupTimer()
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import json
 import os
 from pathlib import Path
 import calendar
+from budget_analytics import (
+    MONTH_NAMES, build_pivot_cube, build_month_index, yoy_by_year,
+    yoy_month_matrix, yoy_category_matrix, yoy_year_detail,
+    forecast_cash_flow, forecast_by_month, monthly_net_history, simulate_goals,
+    spend_matrix, rolling_anomalies, category_amount_stats, transaction_outliers,
+    build_prefix_sums, range_summary, range_category_totals, range_daily_totals,
+    month_keys, budget_matrix, roll_envelopes, update_envelopes, budget_vs_actual
+)
+from budget_ledger import (
+    find_duplicate_groups, build_duplicate_index, match_duplicates, merge_duplicate_group,
+    diff_grid_edits, normalize_description, find_recurring_charges, recurring_template
+)
+from budget_storage import (
+    read_manifest, segment_years, read_segment, write_segments, clear_segments,
+    migrate_legacy_file, set_closed_year_compression, write_quick_stats, read_quick_stats, LedgerView,
+    ledger_lock, rows_added_elsewhere, LEGACY_FILE_NAME
+)
+from budget_schema import SchemaError, DAY_FIELD, DEFAULT_ACCOUNT, epoch_day, stamp_days, days_to_datetimes
+from budget_query import QueryError, parse_query, compile_query, date_span
+from budget_snapshots import read_index, take_snapshot, restore_snapshot, version_at
+from budget_rules import RuleError, validate_rule, compile_rules, rule_changes, rename_rule_category
+from budget_reconcile import StatementError, parse_statement, reconcile
+from budget_ingest import FEED_ID_FIELD
+from budget_reports import CATEGORY_PERIODS, period_start, monthly_summary, category_analysis, cash_flow, tax_summary
+from budget_export import (
+    category_pie, daily_trend, top_categories_bar, net_worth_area, balance_lines, budget_vs_actual_bar,
+    monthly_overview, contribution_chart, type_totals, report_envelopes, period_report
+)
+from budget_goals import GOAL_FIELD, SAVINGS_ACCOUNT, new_goal_id, migrate_goal, contribution_matrix, goal_progress, contribution_history
+from budget_currency import (
+    BASE_CURRENCY, CURRENCY_FIELD, RATES_FILE_NAME, SETTINGS_FILE_NAME, CurrencyError, currency_symbol, empty_rates,
+    parse_rates, read_rates, convert_amounts, convert_balances, convert_frame, needs_conversion, segment_currencies, convert_monthly
+)
+from budget_accounts import (
+    account_amounts, build_balance_index, refresh_balance_index, record_append, balance_at, balances_at, known_accounts
+)
+
+# Plotly is only imported once a chart is actually drawn
+px = LazyModule("plotly.express")
+go = LazyModule("plotly.graph_objects")
+from budget_categorizer import (
+    train_categorizer, update_categorizer, save_categorizer, load_categorizer,
+    compile_categorizer, predict_categories, FALLBACK_CATEGORIES
+)
 
 # Page configuration
 st.set_page_config(
@@ -42,11 +86,22 @@ st.markdown("""
 # Data storage path
 DATA_DIR = Path("budget_data")
 DATA_DIR.mkdir(exist_ok=True)
-TRANSACTIONS_FILE = DATA_DIR / "transactions.json"
+TRANSACTIONS_DIR = DATA_DIR / "transactions"
+TRANSACTIONS_FILE = DATA_DIR / LEGACY_FILE_NAME  # legacy single-file ledger, migrated on load
 CATEGORIES_FILE = DATA_DIR / "categories.json"
 GOALS_FILE = DATA_DIR / "goals.json"
 BUDGETS_FILE = DATA_DIR / "budgets.json"
 RECURRING_FILE = DATA_DIR / "recurring.json"
+VIEWS_FILE = DATA_DIR / "views.json"
+RULES_FILE = DATA_DIR / "rules.json"
+ACCOUNTS_FILE = DATA_DIR / "accounts.json"
+CATEGORIZER_FILE = DATA_DIR / "categorizer.json"
+QUICK_STATS_FILE = DATA_DIR / "quick_stats.json"
+SETTINGS_FILE = DATA_DIR / SETTINGS_FILE_NAME
+RATES_FILE = DATA_DIR / RATES_FILE_NAME
+# Files captured by version history (the categorizer is derived data and is retrained instead)
+SNAPSHOT_PATTERNS = ["categories.json", "goals.json", "budgets.json", "recurring.json", "views.json", "rules.json",
+                     "accounts.json", SETTINGS_FILE_NAME, RATES_FILE_NAME, "transactions/*"]
 
 # Default categories
 DEFAULT_EXPENSE_CATEGORIES = [
@@ -62,9 +117,27 @@ DEFAULT_INCOME_CATEGORIES = [
     "💰 Bonus", "🏢 Business Income", "🏦 Interest", "💸 Refunds", "📊 Other Income"
 ]
 
+AUTO_CATEGORY = "🤖 Auto-detect"
+TRANSFER_CATEGORY = "🔁 Transfer"
+
+# Years of transactions loaded up front; older years load on demand
+RECENT_YEARS = 2
+
+# Seconds between checks for transactions committed by the ingestion service
+LEDGER_POLL_SECONDS = 2
+
+# Transactions grid: rows per page and editable column -> transaction field
+GRID_PAGE_SIZE = 50
+GRID_FIELDS = {'Date': 'date', 'Category': 'category', 'Account': 'account', 'Description': 'description',
+               'Amount': 'amount', 'Cleared': 'cleared'}
+
 # Initialize session state
 if 'transactions' not in st.session_state:
     st.session_state.transactions = []
+if 'loaded_years' not in st.session_state:
+    st.session_state.loaded_years = set()
+if 'manifest' not in st.session_state:
+    st.session_state.manifest = {'segments': {}, 'compress_closed': False}
 if 'categories' not in st.session_state:
     st.session_state.categories = {
         'expense': DEFAULT_EXPENSE_CATEGORIES,
@@ -76,12 +149,36 @@ if 'budgets' not in st.session_state:
     st.session_state.budgets = {}
 if 'recurring' not in st.session_state:
     st.session_state.recurring = []
+if 'views' not in st.session_state:
+    st.session_state.views = {}
+if 'rules' not in st.session_state:
+    st.session_state.rules = []
+if 'accounts' not in st.session_state:
+    st.session_state.accounts = [{'name': DEFAULT_ACCOUNT, 'opening_balance': 0.0}]
+if 'settings' not in st.session_state:
+    st.session_state.settings = {'reporting_currency': BASE_CURRENCY}
+if 'deleted_feed_ids' not in st.session_state:
+    st.session_state.deleted_feed_ids = set()
 
 # Data persistence functions
 def save_data():
-    """Save all data to JSON files"""
-    with open(TRANSACTIONS_FILE, 'w') as f:
-        json.dump(st.session_state.transactions, f)
+    """Save all data to JSON files (transactions go to their year segments)"""
+    with ledger_lock(TRANSACTIONS_DIR):
+        # The ingestion service may have committed since this run loaded the ledger: keep its rows
+        manifest = read_manifest(TRANSACTIONS_DIR)
+        added = rows_added_elsewhere(TRANSACTIONS_DIR, st.session_state.manifest, manifest,
+                                     st.session_state.transactions, st.session_state.loaded_years, FEED_ID_FIELD,
+                                     st.session_state.deleted_feed_ids)
+        if added:
+            st.session_state.transactions.extend(added)
+        st.session_state.manifest = write_segments(TRANSACTIONS_DIR, manifest,
+                                                   st.session_state.transactions, st.session_state.loaded_years)
+    # The deletions are on disk now, so no later merge can find those rows
+    st.session_state.deleted_feed_ids = set()
+    st.session_state.loaded_years = st.session_state.loaded_years | {t['date'][:4] for t in st.session_state.transactions}
+    if not getattr(st.session_state.transactions, 'pristine', False):
+        # Swap this session's private copy for the shared rows of the segments just written
+        rebase_transactions()
     with open(CATEGORIES_FILE, 'w') as f:
         json.dump(st.session_state.categories, f)
     with open(GOALS_FILE, 'w') as f:
@@ -90,27 +187,282 @@ def save_data():
         json.dump(st.session_state.budgets, f)
     with open(RECURRING_FILE, 'w') as f:
         json.dump(st.session_state.recurring, f)
+    with open(VIEWS_FILE, 'w') as f:
+        json.dump(st.session_state.views, f)
+    with open(RULES_FILE, 'w') as f:
+        json.dump(st.session_state.rules, f)
+    with open(ACCOUNTS_FILE, 'w') as f:
+        json.dump(st.session_state.accounts, f)
+    with open(SETTINGS_FILE, 'w') as f:
+        json.dump(st.session_state.settings, f)
+    take_snapshot(DATA_DIR, SNAPSHOT_PATTERNS)
+
+def show_schema_error(error):
+    """Stop the app with the list of malformed stored rows, so nothing gets saved over them"""
+    st.error(f"❌ Some stored transactions are malformed. Fix or remove these rows in `{DATA_DIR}` and reload:")
+    st.code(str(error), language=None)
+    st.stop()
+
+def load_segment(year):
+    """Shared read-only rows of one year segment"""
+    try:
+        return read_segment(TRANSACTIONS_DIR, st.session_state.manifest, year)
+    except SchemaError as e:
+        show_schema_error(e)
+
+def ensure_loaded(start=None, end=None):
+    """Load the year segments overlapping [start, end] (None = open-ended) that are not loaded yet"""
+    for year in segment_years(st.session_state.manifest, start, end):
+        if year not in st.session_state.loaded_years:
+            rows = load_segment(year)
+            if isinstance(st.session_state.transactions, LedgerView):
+                st.session_state.transactions.attach(year, rows)
+            else:
+                st.session_state.transactions.extend(rows)
+            st.session_state.loaded_years = st.session_state.loaded_years | {year}
+
+def rebase_transactions():
+    """Point the session back at the shared segments of its loaded years (after a save)"""
+    ledger = LedgerView()
+    for year in sorted(st.session_state.loaded_years):
+        if year in st.session_state.manifest['segments']:
+            ledger.attach(year, load_segment(year))
+    st.session_state.transactions = ledger
+
+def apply_transaction_changes(updates, deletions):
+    """Apply a batch of edits ({index: {field: value}}) and deletions with a single save"""
+    transactions = st.session_state.transactions
+    learn_transactions([transactions[i] for i in set(updates) | set(deletions)], weight=-1)
+    for index, changes in updates.items():
+        if 'date' in changes:
+            changes['date'] = pd.Timestamp(changes['date']).date().isoformat()
+        if 'amount' in changes:
+            changes['amount'] = float(changes['amount'])
+        if 'description' in changes:
+            changes['description'] = changes['description'] or ''
+        if 'cleared' in changes:
+            changes['cleared'] = bool(changes['cleared'])
+        update_transaction(index, **changes)
+    learn_transactions([transactions[i] for i in updates if i not in deletions])
+    if deletions:
+        remove_transactions(deletions)
+    save_data()
+
+def remove_transactions(indices):
+    """Drop rows from the session ledger, remembering their feed IDs until the next save"""
+    removed = set(indices)
+    transactions = st.session_state.transactions
+    st.session_state.deleted_feed_ids |= {transactions[i][FEED_ID_FIELD] for i in removed
+                                          if FEED_ID_FIELD in transactions[i]}
+    st.session_state.transactions = [t for i, t in enumerate(transactions) if i not in removed]
+
+def update_transaction(index, **changes):
+    """Copy-on-write edit: stored rows are shared between sessions, so replace rather than mutate"""
+    row = dict(st.session_state.transactions[index])
+    if 'date' in changes:
+        row.pop(DAY_FIELD, None)
+    row.update(changes)
+    st.session_state.transactions[index] = row
+
+def has_transactions():
+    """Whether the ledger has any transactions, loaded or not"""
+    return bool(st.session_state.manifest['segments'] or st.session_state.transactions)
 
 def load_data():
-    """Load all data from JSON files"""
+    """Load all data from JSON files (transactions: only the recent years' segments)"""
     if TRANSACTIONS_FILE.exists():
-        with open(TRANSACTIONS_FILE, 'r') as f:
-            st.session_state.transactions = json.load(f)
+        try:
+            with ledger_lock(TRANSACTIONS_DIR):
+                if TRANSACTIONS_FILE.exists():
+                    migrate_legacy_file(TRANSACTIONS_FILE, TRANSACTIONS_DIR)
+        except SchemaError as e:
+            show_schema_error(e)
+    manifest = read_manifest(TRANSACTIONS_DIR)
+    # Records the on-disk state if it changed outside the app (no-op otherwise)
+    take_snapshot(DATA_DIR, SNAPSHOT_PATTERNS)
+    st.session_state.manifest = manifest
+    st.session_state.transactions = LedgerView()
+    st.session_state.loaded_years = set()
+    this_year = datetime.now().year
+    ensure_loaded(datetime(this_year - RECENT_YEARS + 1, 1, 1).date(), None)
     if CATEGORIES_FILE.exists():
         with open(CATEGORIES_FILE, 'r') as f:
             st.session_state.categories = json.load(f)
     if GOALS_FILE.exists():
         with open(GOALS_FILE, 'r') as f:
-            st.session_state.goals = json.load(f)
+            stored_goals = json.load(f)
+        st.session_state.goals = [migrate_goal(dict(goal)) for goal in stored_goals]
+        if st.session_state.goals != stored_goals:
+            # Persist the migration once instead of redoing it on every run
+            with ledger_lock(TRANSACTIONS_DIR):
+                with open(GOALS_FILE, 'w') as f:
+                    json.dump(st.session_state.goals, f)
     if BUDGETS_FILE.exists():
         with open(BUDGETS_FILE, 'r') as f:
             st.session_state.budgets = json.load(f)
     if RECURRING_FILE.exists():
         with open(RECURRING_FILE, 'r') as f:
             st.session_state.recurring = json.load(f)
+    if VIEWS_FILE.exists():
+        with open(VIEWS_FILE, 'r') as f:
+            st.session_state.views = json.load(f)
+    if RULES_FILE.exists():
+        with open(RULES_FILE, 'r') as f:
+            stored_rules = json.load(f)
+        st.session_state.rules = []
+        for rule in stored_rules:
+            try:
+                st.session_state.rules.append(validate_rule(rule))
+            except RuleError as e:
+                st.warning(f"⚠️ Skipped a stored rule ({rule.get('name', '?')}): {e}")
+    if ACCOUNTS_FILE.exists():
+        with open(ACCOUNTS_FILE, 'r') as f:
+            st.session_state.accounts = json.load(f)
+    if SETTINGS_FILE.exists():
+        with open(SETTINGS_FILE, 'r') as f:
+            st.session_state.settings.update(json.load(f))
+
+# Quick Stats
+def compute_quick_stats():
+    """Current month income and expenses in the reporting currency, straight from the loaded transactions"""
+    month = datetime.now().strftime('%Y-%m')
+    totals = {'month': month, 'currency': reporting_currency(), 'Income': 0.0, 'Expense': 0.0}
+    rows = [t for t in st.session_state.transactions if t['date'].startswith(month) and t['type'] in totals]
+    if rows:
+        amounts, _ = convert_amounts(pd.to_datetime([t['date'] for t in rows]).values,
+                                     [t.get(CURRENCY_FIELD, BASE_CURRENCY) for t in rows],
+                                     [t['amount'] for t in rows], get_rates(), reporting_currency())
+        for t, amount in zip(rows, amounts):
+            totals[t['type']] += float(amount)
+    return totals
+
+def render_quick_stats(placeholder, stats):
+    """Draw the sidebar Quick Stats into a placeholder (redrawing replaces the previous values)"""
+    income = stats['Income']
+    expenses = stats['Expense']
+    net = income - expenses
+    symbol = currency_symbol(stats.get('currency', BASE_CURRENCY))
+    with placeholder.container():
+        st.metric("Monthly Income", f"{symbol}{income:,.2f}", delta=None)
+        st.metric("Monthly Expenses", f"{symbol}{expenses:,.2f}", delta=None)
+        st.metric("Net Savings", f"{symbol}{net:,.2f}", 
+                  delta=f"{symbol}{net:,.2f}", 
+                  delta_color="normal" if net >= 0 else "inverse")
+        
+        savings_rate = (net / income * 100) if income > 0 else 0
+        st.metric("Savings Rate", f"{savings_rate:.1f}%")
+
+# First paint: header and the Quick Stats saved last time, before the ledger is loaded
+st.title("💰 Ultimate Budget Tracker")
+st.markdown("**Your complete personal finance management solution**")
+with st.sidebar:
+    st.header("📊 Quick Stats")
+    quick_stats_placeholder = st.empty()
+saved_stats = read_quick_stats(QUICK_STATS_FILE)
+if saved_stats and saved_stats.get('month') == datetime.now().strftime('%Y-%m'):
+    render_quick_stats(quick_stats_placeholder, saved_stats)
+run_timer.mark('first paint')
 
 # Load data on startup
 load_data()
+run_timer.mark('data loaded')
+
+# Totals, budgets and goals are shown in the reporting currency
+CUR = currency_symbol(st.session_state.settings['reporting_currency'])
+MONEY = f"{CUR}{{:,.2f}}"
+
+# Categorize/tag rules
+@st.cache_resource(max_entries=4, show_spinner=False)
+def get_compiled_rules(rules_json):
+    """Combined matcher for a rule list, compiled once per process"""
+    return compile_rules(json.loads(rules_json))
+
+def get_rule_matcher():
+    """Matcher for the current rules"""
+    return get_compiled_rules(json.dumps(st.session_state.rules, sort_keys=True))
+
+def apply_rules(transaction, keep_category=False):
+    """Apply the rules to a new transaction in place"""
+    transaction.update(rule_changes(get_rule_matcher(), [transaction], keep_category=keep_category).get(0, {}))
+    return transaction
+
+# Accounts
+def get_balance_index():
+    """Per-account balance index, brought up to date with the manifest (only changed years are redone)"""
+    openings = {a['name']: float(a.get('opening_balance', 0.0)) for a in st.session_state.accounts}
+    if 'balance_index' not in st.session_state:
+        st.session_state.balance_index = build_balance_index(openings)
+    return refresh_balance_index(st.session_state.balance_index, st.session_state.manifest['segments'],
+                                 load_segment, openings)
+
+def note_appended(transaction):
+    """Extend the balance index with a transaction that was just added and saved"""
+    info = st.session_state.manifest['segments'].get(transaction['date'][:4])
+    if 'balance_index' in st.session_state and info:
+        record_append(st.session_state.balance_index, transaction, info['digest'])
+
+def account_names():
+    """Configured accounts first, then any other account stored transactions use"""
+    names = [a['name'] for a in st.session_state.accounts]
+    return names + sorted(known_accounts(get_balance_index()) - set(names))
+
+def account_currencies():
+    """{account: currency} of the configured accounts (any other account is in the base currency)"""
+    return {a['name']: a.get(CURRENCY_FIELD, BASE_CURRENCY) for a in st.session_state.accounts}
+
+def shared_currency(names):
+    """The one currency all of these accounts are in, or None if they differ"""
+    codes = {account_currencies().get(name, BASE_CURRENCY) for name in names}
+    return codes.pop() if len(codes) == 1 else None
+
+def account_symbol(name):
+    """Prefix of an account's amounts"""
+    return currency_symbol(account_currencies().get(name, BASE_CURRENCY))
+
+def get_month_end_balances(month_ends):
+    """Month-end x account balance frame from the balance index"""
+    balance_index = get_balance_index()
+    end_days = month_ends.values.astype('datetime64[D]').astype('int64')
+    return pd.DataFrame({name: balances_at(balance_index, name, end_days, load_segment) for name in account_names()},
+                        index=month_ends)
+
+def ensure_account(name):
+    """Add an account (with a zero opening balance) unless it's already configured"""
+    if name not in [a['name'] for a in st.session_state.accounts]:
+        st.session_state.accounts.append({'name': name, 'opening_balance': 0.0})
+
+# Goals
+def get_goal_contributions():
+    """Month x goal ID contributions, read from the manifest (no ledger scan)"""
+    return contribution_matrix(st.session_state.manifest['segments'])
+
+def get_goals_progress(contributions=None):
+    """The goals with `current` = amount saved before tracking + contributions in the ledger"""
+    if contributions is None:
+        contributions = get_goal_contributions()
+    return goal_progress(st.session_state.goals, contributions)
+
+def add_goal_contribution(goal, amount, from_account):
+    """Record a contribution as a transfer into the goal's account, tagged with the goal's ID"""
+    goal_account = goal.get('account', SAVINGS_ACCOUNT)
+    ensure_account(goal_account)
+    transaction = {
+        'date': datetime.now().date().isoformat(),
+        'type': 'Transfer',
+        'category': TRANSFER_CATEGORY,
+        'amount': float(amount),
+        'description': f"Contribution to {goal['name']}",
+        'tags': ['goal'],
+        'notes': '',
+        'recurring': False,
+        'account': from_account,
+        'to_account': goal_account,
+        GOAL_FIELD: goal['id']
+    }
+    st.session_state.transactions.append(transaction)
+    save_data()
+    note_appended(transaction)
+    return transaction
 
 # Process recurring transactions
 def process_recurring_transactions():
@@ -155,20 +507,81 @@ def add_transaction_from_recurring(recurring):
         'tags': recurring.get('tags', []),
         'recurring': True
     }
+    if recurring.get(CURRENCY_FIELD):
+        transaction[CURRENCY_FIELD] = recurring[CURRENCY_FIELD]
+    # The template's category is the user's choice; rules only add their tags
+    apply_rules(transaction, keep_category=True)
     st.session_state.transactions.append(transaction)
 
 # Process recurring transactions
 process_recurring_transactions()
+run_timer.mark('recurring processed')
 
 # Helper functions
-def get_transactions_df():
-    """Convert transactions to DataFrame"""
-    if not st.session_state.transactions:
+def build_transactions_df(transactions):
+    """DataFrame of a transaction list"""
+    if not transactions:
         return pd.DataFrame()
-    df = pd.DataFrame(st.session_state.transactions)
-    df['date'] = pd.to_datetime(df['date'])
+    # Dates were decoded to epoch days at load; only rows added since then need decoding here
+    df = pd.DataFrame(stamp_days(transactions))
+    df['date'] = days_to_datetimes(df.pop(DAY_FIELD).values)
     return df
 
+@st.cache_resource(max_entries=8, show_spinner=False)
+def get_shared_transactions_df(manifest_stamp, segments):
+    """One DataFrame per process for each saved ledger version and segment order, shared by all sessions"""
+    manifest = read_manifest(TRANSACTIONS_DIR)
+    return build_transactions_df([t for year in segments for t in read_segment(TRANSACTIONS_DIR, manifest, year)])
+
+def get_transactions_df():
+    """Convert transactions to DataFrame"""
+    ledger = st.session_state.transactions
+    if isinstance(ledger, LedgerView) and ledger.pristine and ledger.segments:
+        # Unchanged since load: a view of the shared frame (pandas copy-on-write keeps it intact)
+        return get_shared_transactions_df(get_manifest_stamp(), tuple(ledger.segments)).copy(deep=False)
+    return build_transactions_df(ledger)
+
+# Currencies
+def reporting_currency():
+    """Currency totals, budgets and goals are shown in"""
+    return st.session_state.settings['reporting_currency']
+
+def get_rates_stamp():
+    """Modification stamp of the exchange-rate table"""
+    stamp = RATES_FILE.stat() if RATES_FILE.exists() else None
+    return f"{stamp.st_mtime_ns}-{stamp.st_size}" if stamp else "0-0"
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def get_rate_table(rates_stamp):
+    """Parsed exchange-rate table, shared by all sessions until the file changes"""
+    return read_rates(RATES_FILE)
+
+def get_rates():
+    """The exchange-rate table (empty while the file is malformed; the sidebar says why)"""
+    try:
+        return get_rate_table(get_rates_stamp())
+    except CurrencyError:
+        return empty_rates()
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def get_converted_amounts(_df, ledger_version):
+    """(amounts in the reporting currency, currencies without rates): one as-of join per ledger version"""
+    return convert_frame(_df, get_rates(), reporting_currency())
+
+def currency_options():
+    """Currencies a transaction can be entered in: the base currency, those with rates and those already used"""
+    used = segment_currencies(st.session_state.manifest['segments'])
+    others = set(get_rates()['currency']) | set(used) | {reporting_currency()}
+    return [BASE_CURRENCY] + sorted(others - {BASE_CURRENCY})
+
+def get_reporting_df():
+    """Transactions with `amount` in the reporting currency (the stored amount stays in `original_amount`)"""
+    df = get_transactions_df()
+    if df.empty or not needs_conversion(df, reporting_currency()):
+        return df
+    amounts, _ = get_converted_amounts(df, get_ledger_version())
+    return df.assign(original_amount=df['amount'], amount=amounts)
+
 def filter_by_date_range(df, start_date, end_date):
     """Filter DataFrame by date range"""
     if df.empty:
@@ -191,31 +604,244 @@ def calculate_summary(df, transaction_type=None):
         df = df[df['type'] == transaction_type]
     return df['amount'].sum()
 
-# Main app
-st.title("💰 Ultimate Budget Tracker")
-st.markdown("**Your complete personal finance management solution**")
+def get_monthly_totals():
+    """Income and expense per month: loaded years from memory, the others from the segment manifest"""
+    df = get_reporting_df()
+    unloaded = {year: info for year, info in st.session_state.manifest['segments'].items()
+                if year not in st.session_state.loaded_years}
+    totals = {}
+    for info in unloaded.values():
+        totals.update(info['monthly'])
+    stored = pd.DataFrame.from_dict(totals, orient='index', columns=['Income', 'Expense'])
+    stored = convert_monthly(stored, segment_currencies(unloaded), get_rates(), reporting_currency())
+    stored = stored.where(stored != 0)
+    if not df.empty:
+        loaded = df.groupby([df['date'].dt.strftime('%Y-%m'), 'type'])['amount'].sum().unstack('type')
+        stored = pd.concat([stored, loaded.reindex(columns=['Income', 'Expense'])])
+    stored = stored.sort_index()
+    stored.index.name = 'month'
+    return stored
+
+def get_net_worth():
+    """Net worth at the end of each month: opening balances plus cumulative income minus expenses"""
+    monthly_totals = get_monthly_totals().fillna(0.0)
+    openings = {a['name']: float(a.get('opening_balance', 0.0)) for a in st.session_state.accounts}
+    # Opening balances are in their accounts' currencies, converted at each month end's rates
+    month_ends = pd.PeriodIndex(monthly_totals.index, freq='M').end_time.normalize()
+    opening_totals = [convert_balances(openings, account_currencies(), month_end, get_rates(), reporting_currency())[0].sum()
+                      for month_end in month_ends]
+    return pd.Series(opening_totals, index=monthly_totals.index) + \
+        (monthly_totals['Income'] - monthly_totals['Expense']).cumsum()
+
+def get_category_counts(transaction_type):
+    """Number of transactions per category over the whole ledger, without loading old years"""
+    counts = pd.Series(dtype=int)
+    for year, info in st.session_state.manifest['segments'].items():
+        if year not in st.session_state.loaded_years:
+            counts = counts.add(pd.Series(info['categories'].get(transaction_type, {}), dtype=int), fill_value=0)
+    df = get_transactions_df()
+    if not df.empty:
+        counts = counts.add(df[df['type'] == transaction_type]['category'].value_counts(), fill_value=0)
+    return counts.astype(int).sort_values(ascending=False)
+
+def get_ledger_start_date():
+    """Date of the oldest transaction, read from the manifest without loading old years"""
+    dates = [info['min_date'] for info in st.session_state.manifest['segments'].values()]
+    dates += [t['date'] for t in st.session_state.transactions]
+    return datetime.fromisoformat(min(dates)[:10]).date() if dates else datetime.now().date()
+
+def get_manifest_stamp():
+    """Modification stamp of the saved ledger"""
+    manifest_file = TRANSACTIONS_DIR / "manifest.json"
+    stamp = manifest_file.stat() if manifest_file.exists() else None
+    return f"{stamp.st_mtime_ns}-{stamp.st_size}" if stamp else "0-0"
+
+@st.fragment(run_every=LEDGER_POLL_SECONDS)
+def watch_ledger(seen_stamp):
+    """Rerun the whole app once the saved ledger changes on disk (e.g. the ingestion service committed)"""
+    if get_manifest_stamp() != seen_stamp:
+        st.rerun(scope="app")
+
+def get_ledger_version():
+    """Cheap fingerprint of the loaded ledger (manifest stamp, loaded years, unsaved in-memory additions) as reported"""
+    years = ",".join(sorted(st.session_state.loaded_years))
+    return (f"{get_manifest_stamp()}-{years}-{len(st.session_state.transactions)}-"
+            f"{reporting_currency()}-{get_rates_stamp()}")
+
+@st.cache_data(show_spinner=False)
+def get_prefix_sums(_df, ledger_version):
+    """Cumulative daily totals per category; any date-range total is then two lookups"""
+    return build_prefix_sums(_df)
+
+@st.cache_data(show_spinner=False)
+def get_monthly_spend(_df, ledger_version):
+    """Month ('YYYY-MM') x category expense totals"""
+    matrix = spend_matrix(_df, freq='M')
+    matrix.index = matrix.index.astype(str)
+    return matrix
+
+def get_envelopes(months):
+    """Envelope balances for consecutive months, updated from the edited month onwards when possible"""
+    budget = budget_matrix(st.session_state.budgets, months)
+    actual = get_monthly_spend(get_reporting_df(), get_ledger_version()).reindex(months).fillna(0.0)
+    key = (get_ledger_version(), tuple(months))
+    budgets_fingerprint = json.dumps(st.session_state.budgets, sort_keys=True)
+    cached = st.session_state.get('envelopes')
+    changed_month = st.session_state.pop('envelope_changed', None)
+    if cached and cached['key'] == key and cached['budgets'] == budgets_fingerprint:
+        result = cached['result']
+    elif cached and cached['key'] == key and changed_month in months:
+        result = update_envelopes(cached['result'], budget, actual, changed_month)
+    else:
+        result = roll_envelopes(budget, actual)
+    st.session_state.envelopes = {'key': key, 'budgets': budgets_fingerprint, 'result': result}
+    return result
+
+@st.cache_data(show_spinner=False)
+def get_pivot_cube(_df, ledger_version):
+    """Year x month x category cube and month row index, rebuilt only when the ledger changes"""
+    return build_pivot_cube(_df), build_month_index(_df)
+
+@st.cache_data(show_spinner=False)
+def get_cash_flow_forecast(_df, ledger_version, recurring, months, start_date, starting_balance):
+    """Daily cash-flow projection, recomputed only when the ledger, templates or inputs change"""
+    return forecast_cash_flow(_df, recurring, start_date, months, starting_balance)
+
+@st.cache_data(show_spinner=False)
+def get_goal_projections(_df, ledger_version, goals, as_of):
+    """Monte Carlo completion estimates per goal, recomputed only when the ledger or goals change"""
+    return simulate_goals(goals, monthly_net_history(_df, as_of), as_of)
+
+@st.cache_data(show_spinner=False)
+def get_duplicate_index(_df, ledger_version):
+    """Key hash -> dates of the existing ledger, for checking new transactions in O(1)"""
+    return build_duplicate_index(_df)
+
+@st.cache_data(show_spinner=False)
+def get_recurring_proposals(_df, ledger_version, as_of):
+    """Regular income/expenses found in the loaded history (amounts as stored)"""
+    return find_recurring_charges(_df, as_of=as_of)
+
+@st.cache_data(show_spinner=False)
+def get_anomaly_report(_df, ledger_version, as_of):
+    """Recent daily/monthly spending anomalies plus per-category amount stats for scoring new rows"""
+    return {
+        'daily': rolling_anomalies(spend_matrix(_df, 'D', as_of), window=90, min_periods=14, recent=30),
+        'monthly': rolling_anomalies(spend_matrix(_df, 'M', as_of), window=12, min_periods=3, recent=6),
+        'stats': category_amount_stats(_df)
+    }
+
+# Auto-categorizer
+def all_transactions():
+    """Every row of the ledger: this session's loaded years plus the stored rows of the others"""
+    rows = list(st.session_state.transactions)
+    for year in sorted(st.session_state.manifest['segments']):
+        if year not in st.session_state.loaded_years:
+            rows.extend(load_segment(year) or [])
+    return rows
+
+def categorizer_stamp():
+    """(mtime, size) of categorizer.json, None if it doesn't exist"""
+    try:
+        stat = CATEGORIZER_FILE.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def use_categorizer(model):
+    """Make `model` this session's auto-categorizer, matching the saved file"""
+    st.session_state.categorizer = model
+    st.session_state.categorizer_stamp = categorizer_stamp()
+    st.session_state.pop('categorizer_compiled', None)
+
+def get_categorizer():
+    """Persisted auto-categorizer (reloaded when another session saved it), trained from the whole ledger the first time"""
+    stamp = categorizer_stamp()
+    if 'categorizer' not in st.session_state or st.session_state.get('categorizer_stamp') != stamp:
+        model = load_categorizer(CATEGORIZER_FILE) if stamp else None
+        if model is None:
+            retrain_categorizer()
+        else:
+            use_categorizer(model)
+    return st.session_state.categorizer
+
+def retrain_categorizer():
+    """Rebuild the auto-categorizer from every year of the ledger"""
+    model = train_categorizer(all_transactions())
+    with ledger_lock(TRANSACTIONS_DIR):
+        save_categorizer(model, CATEGORIZER_FILE)
+        use_categorizer(model)
+
+def learn_transactions(transactions, weight=1):
+    """Incrementally add (weight=1) or remove (weight=-1) transactions from the auto-categorizer
+
+    The counts are applied to the saved model under the ledger lock, so what other sessions
+    learned since this one loaded it is kept.
+    """
+    model = get_categorizer()
+    with ledger_lock(TRANSACTIONS_DIR):
+        model = load_categorizer(CATEGORIZER_FILE) or model
+        for transaction in transactions:
+            update_categorizer(model, transaction, weight)
+        save_categorizer(model, CATEGORIZER_FILE)
+        use_categorizer(model)
+
+def suggest_categories(transactions):
+    """(category, confidence) suggestions limited to the currently defined categories"""
+    model = get_categorizer()
+    compiled = st.session_state.get('categorizer_compiled')
+    if compiled is None or compiled['revision'] != model['revision']:
+        compiled = compile_categorizer(model)
+        st.session_state.categorizer_compiled = compiled
+    allowed = st.session_state.categories['expense'] + st.session_state.categories['income']
+    return predict_categories(compiled, transactions, allowed_categories=allowed)
 
 # Sidebar
 with st.sidebar:
-    st.header("📊 Quick Stats")
+    # Current month summary (replaces the saved values painted at startup)
+    current_stats = compute_quick_stats()
+    if current_stats != saved_stats:
+        render_quick_stats(quick_stats_placeholder, current_stats)
+        write_quick_stats(QUICK_STATS_FILE, current_stats)
     
-    # Current month summary
-    start_date, end_date = get_current_month_range()
-    df = get_transactions_df()
-    current_month_df = filter_by_date_range(df, start_date, end_date)
-    
-    income = calculate_summary(current_month_df, 'Income')
-    expenses = calculate_summary(current_month_df, 'Expense')
-    net = income - expenses
-    
-    st.metric("Monthly Income", f"${income:,.2f}", delta=None)
-    st.metric("Monthly Expenses", f"${expenses:,.2f}", delta=None)
-    st.metric("Net Savings", f"${net:,.2f}", 
-              delta=f"${net:,.2f}", 
-              delta_color="normal" if net >= 0 else "inverse")
-    
-    savings_rate = (net / income * 100) if income > 0 else 0
-    st.metric("Savings Rate", f"{savings_rate:.1f}%")
+    # Reporting currency and the exchange-rate table
+    with st.expander(f"💱 Currency: {reporting_currency()}"):
+        currencies = currency_options()
+        chosen_currency = st.selectbox("Reporting currency", currencies, index=currencies.index(reporting_currency()),
+                                       help="Totals, budgets, goals and charts are converted into this currency")
+        if chosen_currency != reporting_currency():
+            st.session_state.settings['reporting_currency'] = chosen_currency
+            with open(SETTINGS_FILE, 'w') as f:
+                json.dump(st.session_state.settings, f)
+            st.rerun()
+        
+        try:
+            rates = get_rate_table(get_rates_stamp())
+        except CurrencyError as e:
+            st.error(f"❌ {RATES_FILE.name}: {e}")
+            rates = empty_rates()
+        if rates.empty:
+            st.caption(f"No exchange rates yet. Upload a CSV with columns date, currency and rate "
+                       f"(the value of one unit in {BASE_CURRENCY} from that date on).")
+        else:
+            st.caption(f"{len(rates):,} rates for {rates['currency'].nunique()} currencies, "
+                       f"{rates['date'].min():%Y-%m-%d} to {rates['date'].max():%Y-%m-%d}")
+        used = set(segment_currencies(st.session_state.manifest['segments'])) | {reporting_currency()}
+        missing_rates = sorted(used - set(rates['currency']) - {BASE_CURRENCY})
+        if missing_rates:
+            st.warning(f"⚠️ No exchange rates for {', '.join(missing_rates)}: those amounts are counted unconverted")
+        
+        rates_upload = st.file_uploader("Exchange-rate table (CSV)", type=['csv'], key="rates_upload")
+        if rates_upload is not None and st.button("💾 Use This Rate Table", use_container_width=True):
+            try:
+                uploaded_rates = parse_rates(rates_upload)
+            except CurrencyError as e:
+                st.error(f"❌ {e}")
+            else:
+                RATES_FILE.write_bytes(rates_upload.getvalue())
+                take_snapshot(DATA_DIR, SNAPSHOT_PATTERNS)
+                st.success(f"Saved {len(uploaded_rates):,} exchange rates")
+                st.rerun()
     
     st.divider()
     
@@ -234,6 +860,8 @@ with st.sidebar:
             st.success("Data reloaded!")
     
     if st.button("📥 Export to CSV", use_container_width=True):
+        ensure_loaded()
+        df = get_transactions_df()
         if not df.empty:
             csv = df.to_csv(index=False)
             st.download_button(
@@ -246,13 +874,62 @@ with st.sidebar:
     
     if st.button("🗑️ Clear All Data", type="secondary", use_container_width=True):
         if st.checkbox("I'm sure I want to delete everything"):
+            st.session_state.manifest = clear_segments(TRANSACTIONS_DIR, st.session_state.manifest)
             st.session_state.transactions = []
+            st.session_state.loaded_years = set()
             st.session_state.goals = []
             st.session_state.budgets = {}
             st.session_state.recurring = []
             save_data()
             st.success("All data cleared!")
             st.rerun()
+    
+    compress_closed = st.session_state.manifest.get('compress_closed', False)
+    if st.checkbox("🗜️ Compress past years", value=compress_closed,
+                   help="Store closed years gzip-compressed to save disk space") != compress_closed:
+        st.session_state.manifest = set_closed_year_compression(TRANSACTIONS_DIR, st.session_state.manifest,
+                                                                not compress_closed)
+        st.rerun()
+    
+    loaded_count = sum(st.session_state.manifest['segments'][y]['count']
+                       for y in st.session_state.loaded_years if y in st.session_state.manifest['segments'])
+    total_count = sum(info['count'] for info in st.session_state.manifest['segments'].values())
+    st.caption(f"{loaded_count:,} of {total_count:,} transactions loaded "
+               f"({len(st.session_state.loaded_years)} of {len(st.session_state.manifest['segments'])} years)")
+    if st.toggle("📡 Live updates", value=True, key="live_updates",
+                 help="Refresh by itself when the ingestion service (budget_ingest.py) adds transactions"):
+        watch_ledger(get_manifest_stamp())
+
+    # Version history
+    with st.expander("🕓 Version History"):
+        snapshot_index = read_index(DATA_DIR)
+        versions = snapshot_index['versions']
+        if versions:
+            history_bytes = sum(v['bytes'] for v in versions)
+            st.caption(f"{len(versions)} versions kept ({history_bytes / 1024:,.0f} KB), "
+                       f"oldest {versions[0]['time'].replace('T', ' ')}")
+            restore_date = st.date_input("Restore as of", value=datetime.now().date(),
+                                         min_value=datetime.fromisoformat(versions[0]['time']).date(),
+                                         max_value=datetime.now().date(), key="restore_date")
+            restore_time = st.time_input("Time", value=datetime.now().time().replace(second=0, microsecond=0),
+                                         key="restore_time")
+            target = version_at(snapshot_index, datetime.combine(restore_date, restore_time).replace(second=59))
+            if target is None:
+                st.info("No saved version that early")
+            else:
+                st.write(f"Version {target['id']} saved {target['time'].replace('T', ' ')}"
+                         + (f" — {target['label']}" if target['label'] else ""))
+                if st.button("⏪ Restore This Version", use_container_width=True,
+                             disabled=target['id'] == versions[-1]['id']):
+                    with ledger_lock(TRANSACTIONS_DIR):
+                        restore_snapshot(DATA_DIR, SNAPSHOT_PATTERNS, target['id'])
+                    load_data()
+                    ensure_loaded()
+                    retrain_categorizer()
+                    st.success(f"Restored version {target['id']}")
+                    st.rerun()
+        else:
+            st.info("No versions saved yet")
 
 # Main tabs
 tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs([
@@ -269,17 +946,36 @@ with tab1:
     with col1:
         st.subheader("➕ Add New Transaction")
         
+        if st.session_state.get('anomaly_notice'):
+            st.warning(st.session_state.pop('anomaly_notice'))
+        
         # Move type selector OUTSIDE the form so it updates immediately
-        trans_type = st.radio("Type", ["Expense", "Income"], horizontal=True, key="trans_type_radio")
+        trans_type = st.radio("Type", ["Expense", "Income", "Transfer"], horizontal=True, key="trans_type_radio")
         
         with st.form("transaction_form", clear_on_submit=True):
             trans_date = st.date_input("Date", datetime.now())
             
-            # Use session state to determine categories
-            categories = st.session_state.categories['expense'] if trans_type == "Expense" else st.session_state.categories['income']
-            trans_category = st.selectbox("Category", categories, key=f"cat_{trans_type}")
-            
-            trans_amount = st.number_input("Amount ($)", min_value=0.01, step=0.01, format="%.2f")
+            accounts = account_names()
+            if trans_type == "Transfer":
+                categories = [TRANSFER_CATEGORY]
+                trans_category = TRANSFER_CATEGORY
+                trans_account = st.selectbox("From Account", accounts, key="trans_account")
+                trans_to_account = st.selectbox("To Account", accounts, index=min(1, len(accounts) - 1),
+                                                key="trans_to_account")
+            else:
+                # Use session state to determine categories
+                categories = st.session_state.categories['expense'] if trans_type == "Expense" else st.session_state.categories['income']
+                trans_category = st.selectbox("Category", [AUTO_CATEGORY] + categories, key=f"cat_{trans_type}",
+                                              help="Auto-detect picks a category from the description and tags")
+                trans_account = st.selectbox("Account", accounts, key="trans_account")
+            
+            col_amount, col_currency = st.columns([3, 1])
+            with col_amount:
+                trans_amount = st.number_input("Amount", min_value=0.01, step=0.01, format="%.2f")
+            with col_currency:
+                currencies = currency_options()
+                trans_currency = st.selectbox("Currency", currencies, index=currencies.index(reporting_currency()),
+                                              key="trans_currency")
             
             trans_description = st.text_input("Description")
             
@@ -289,7 +985,9 @@ with tab1:
             
             submitted = st.form_submit_button("Add Transaction", type="primary", use_container_width=True)
             
-            if submitted:
+            if submitted and trans_type == "Transfer" and trans_account == trans_to_account:
+                st.error("❌ Pick two different accounts for a transfer")
+            elif submitted:
                 transaction = {
                     'date': trans_date.isoformat(),
                     'type': trans_type,
@@ -298,188 +996,373 @@ with tab1:
                     'description': trans_description,
                     'tags': [tag.strip() for tag in trans_tags.split(',') if tag.strip()],
                     'notes': trans_notes,
-                    'recurring': False
+                    'recurring': False,
+                    'account': trans_account
                 }
+                if trans_type == "Transfer":
+                    transaction['to_account'] = trans_to_account
+                if trans_currency != BASE_CURRENCY:
+                    transaction[CURRENCY_FIELD] = trans_currency
+                
+                auto_detect = trans_category == AUTO_CATEGORY
+                if auto_detect:
+                    suggested, _ = suggest_categories([transaction])[0]
+                    fallback = FALLBACK_CATEGORIES[trans_type]
+                    transaction['category'] = suggested or (fallback if fallback in categories else categories[0])
+                # Rules may override an auto-detected category, never one picked by hand
+                apply_rules(transaction, keep_category=not auto_detect)
+                trans_category = transaction['category']
+                
+                # Score the new row against the cached category stats (no ledger rescan)
+                amount_stats = get_anomaly_report(get_reporting_df(), get_ledger_version(),
+                                                  datetime.now().date())['stats']
+                scored = pd.DataFrame([transaction]).assign(date=lambda d: pd.to_datetime(d['date']))
+                scored['amount'] = convert_frame(scored, get_rates(), reporting_currency())[0]
+                flagged = transaction_outliers(scored, amount_stats)
+                if not flagged.empty:
+                    st.session_state.anomaly_notice = (
+                        f"⚠️ {CUR}{flagged['amount'].iloc[0]:,.2f} is unusually high for {trans_category} "
+                        f"(typically {CUR}{flagged['expected'].iloc[0]:,.2f})"
+                    )
+                
+                dup_window = timedelta(days=st.session_state.get('dup_tolerance', 1))
+                ensure_loaded(trans_date - dup_window, trans_date + dup_window)
+                new_row = pd.DataFrame([transaction]).assign(date=lambda d: pd.to_datetime(d['date']))
+                duplicate_index = get_duplicate_index(get_transactions_df(), get_ledger_version())
+                if match_duplicates(duplicate_index, new_row, dup_window.days)[0]:
+                    st.session_state.anomaly_notice = (
+                        "⚠️ This looks like a duplicate of an existing transaction. "
+                        "Review it under Duplicate Review below."
+                    )
+                
                 st.session_state.transactions.append(transaction)
+                learn_transactions([transaction])
                 save_data()
-                st.success(f"✅ {trans_type} of ${trans_amount:.2f} added!")
+                note_appended(transaction)
+                symbol = currency_symbol(trans_currency)
+                if trans_type == "Transfer":
+                    st.success(f"✅ Transfer of {symbol}{trans_amount:.2f} from {trans_account} to {trans_to_account} recorded!")
+                else:
+                    st.success(f"✅ {trans_type} of {symbol}{trans_amount:.2f} added to {trans_category}!")
                 st.rerun()
     
     with col2:
         st.subheader("📋 Recent Transactions")
         
+        # Query box and saved views
+        view_names = sorted(st.session_state.views)
+        col_q, col_v = st.columns([3, 1])
+        with col_v:
+            selected_view = st.selectbox("Saved View", ["(none)"] + view_names, key="selected_view")
+        if selected_view != st.session_state.get('applied_view'):
+            st.session_state.applied_view = selected_view
+            if selected_view != "(none)":
+                st.session_state.transaction_query = st.session_state.views[selected_view]
+        with col_q:
+            query = st.text_input("Query", key="transaction_query",
+                                  placeholder="amount>100 and category:groceries and tag:costco and date:2024-Q3",
+                                  help="Fields: amount, date (2024, 2024-Q3, 2024-07, 2024-07-15, A..B), category, "
+                                       "type, account, tag, description, notes, recurring, cleared. Operators: `:` `=` `!=` `>` `>=` "
+                                       "`<` `<=`. Combine with and/or/not, `-term` and parentheses; bare words "
+                                       "search descriptions.")
+        try:
+            query_tree = parse_query(query)
+        except QueryError as e:
+            st.error(f"❌ {e}")
+            query_tree = None
+            query = ""
+        
+        if query_tree is not None:
+            with st.expander("💾 Save or delete views"):
+                view_col1, view_col2 = st.columns([3, 1])
+                with view_col1:
+                    view_name = st.text_input("View name", value="" if selected_view == "(none)" else selected_view,
+                                              key="view_name")
+                with view_col2:
+                    st.write("")
+                    if st.button("Save View", use_container_width=True) and view_name.strip():
+                        st.session_state.views[view_name.strip()] = query
+                        save_data()
+                        st.success(f"Saved view '{view_name.strip()}'")
+                if selected_view != "(none)" and st.button(f"🗑️ Delete view '{selected_view}'"):
+                    del st.session_state.views[selected_view]
+                    st.session_state.applied_view = None
+                    save_data()
+                    st.rerun()
+        
         # Filters
         col_a, col_b, col_c = st.columns(3)
         with col_a:
-            filter_type = st.selectbox("Filter by Type", ["All", "Income", "Expense"])
+            filter_type = st.selectbox("Filter by Type", ["All", "Income", "Expense", "Transfer"])
         with col_b:
             all_categories = st.session_state.categories['expense'] + st.session_state.categories['income']
             filter_category = st.selectbox("Filter by Category", ["All"] + all_categories)
         with col_c:
             date_range = st.selectbox("Date Range", ["All Time", "This Month", "Last Month", "Last 3 Months", "This Year"])
         
-        # Apply filters
+        # Dropdowns narrow the date window; the query may narrow it further
+        today = datetime.now().date()
+        start, end = None, None
+        if date_range == "This Month":
+            start, end = get_current_month_range()
+        elif date_range == "Last Month":
+            end = today.replace(day=1) - timedelta(days=1)
+            start = end.replace(day=1)
+        elif date_range == "Last 3 Months":
+            start, end = today - timedelta(days=90), today
+        elif date_range == "This Year":
+            start, end = today.replace(month=1, day=1), today
+        query_start, query_end = date_span(query_tree)
+        load_start = max(d for d in (start, query_start) if d) if start or query_start else None
+        load_end = min(d for d in (end, query_end) if d) if end or query_end else None
+        ensure_loaded(load_start, load_end)
         display_df = get_transactions_df()
         
         if not display_df.empty:
+            # Every filter goes into one boolean mask, applied once
+            mask = compile_query(query)(display_df)
             if filter_type != "All":
-                display_df = display_df[display_df['type'] == filter_type]
-            
+                mask &= (display_df['type'] == filter_type).values
             if filter_category != "All":
-                display_df = display_df[display_df['category'] == filter_category]
+                mask &= (display_df['category'] == filter_category).values
+            if start is not None:
+                day = display_df['date'].values.astype('datetime64[D]')
+                mask &= (day >= pd.Timestamp(start).to_datetime64()) & (day <= pd.Timestamp(end).to_datetime64())
+            display_df = display_df[mask]
             
-            # Date filtering
-            today = datetime.now().date()
-            if date_range == "This Month":
-                start, end = get_current_month_range()
-                display_df = filter_by_date_range(display_df, start, end)
-            elif date_range == "Last Month":
-                first = today.replace(day=1)
-                end = first - timedelta(days=1)
-                start = end.replace(day=1)
-                display_df = filter_by_date_range(display_df, start, end)
-            elif date_range == "Last 3 Months":
-                end = today
-                start = today - timedelta(days=90)
-                display_df = filter_by_date_range(display_df, start, end)
-            elif date_range == "This Year":
-                start = today.replace(month=1, day=1)
-                display_df = filter_by_date_range(display_df, start, today)
-            
-            # Sort by date descending
+            # Sort by date descending (the index still points into st.session_state.transactions)
             display_df = display_df.sort_values('date', ascending=False)
-            display_df = display_df.reset_index(drop=True)
             
             # Display transaction count
             st.write(f"**{len(display_df)} transactions found**")
             
-            # Headers
-            header_col1, header_col2, header_col3, header_col4, header_col5 = st.columns([1.5, 2.5, 1.5, 1, 0.8])
-            with header_col1:
-                st.markdown("**Date**")
-            with header_col2:
-                st.markdown("**Category & Description**")
-            with header_col3:
-                st.markdown("**Amount**")
-            with header_col4:
-                st.markdown("**Actions**")
-            with header_col5:
-                st.markdown("**Del**")
-            
-            st.divider()
-            
-            # Display transactions with edit capability
-            for idx in display_df.index[:20]:  # Show first 20
-                row = display_df.loc[idx]
-                original_idx = st.session_state.transactions.index(
-                    [t for t in st.session_state.transactions 
-                     if t['date'] == row['date'].strftime('%Y-%m-%d') 
-                     and t['type'] == row['type']
-                     and t['category'] == row['category']
-                     and t['amount'] == row['amount']
-                     and t.get('description', '') == row.get('description', '')][0]
+            # One page of transactions as an editable grid; edits and deletions are collected
+            # in a form and applied as one batch with a single save
+            page_count = max(1, -(-len(display_df) // GRID_PAGE_SIZE))
+            page = 1
+            if page_count > 1:
+                page = st.selectbox("Page", list(range(1, page_count + 1)), key="transaction_page",
+                                    format_func=lambda p: f"Page {p} of {page_count}")
+            page_df = display_df.iloc[(page - 1) * GRID_PAGE_SIZE:page * GRID_PAGE_SIZE]
+            grid = pd.DataFrame({
+                'Date': page_df['date'].dt.date,
+                'Type': page_df['type'].map({'Income': "📤 Income", 'Expense': "📥 Expense", 'Transfer': "🔁 Transfer"}),
+                'Category': page_df['category'],
+                'Account': page_df['account'].fillna(DEFAULT_ACCOUNT) if 'account' in page_df else DEFAULT_ACCOUNT,
+                'Description': page_df['description'].fillna('') if 'description' in page_df else '',
+                'Amount': page_df['amount'].astype(float),
+                'Currency': page_df[CURRENCY_FIELD].fillna(BASE_CURRENCY) if CURRENCY_FIELD in page_df else BASE_CURRENCY,
+                'Tags': page_df['tags'].map(lambda tags: ", ".join(tags) if isinstance(tags, list) else "")
+                        if 'tags' in page_df else '',
+                'Cleared': page_df['cleared'].fillna(False).astype(bool) if 'cleared' in page_df else False,
+                'Delete': False
+            }, index=page_df.index)
+            
+            with st.form("transaction_grid_form"):
+                edited_grid = st.data_editor(
+                    grid, hide_index=True, use_container_width=True,
+                    disabled=['Type', 'Currency', 'Tags'],
+                    column_config={
+                        'Date': st.column_config.DateColumn(format="YYYY-MM-DD", required=True),
+                        'Category': st.column_config.SelectboxColumn(options=all_categories + [TRANSFER_CATEGORY],
+                                                                     required=True),
+                        'Account': st.column_config.SelectboxColumn(options=account_names(), required=True),
+                        'Cleared': st.column_config.CheckboxColumn("✔️", help="Matched on a bank statement"),
+                        'Amount': st.column_config.NumberColumn(format="%.2f", min_value=0.01, step=0.01,
+                                                                required=True),
+                        'Delete': st.column_config.CheckboxColumn("🗑️", help="Delete on save")
+                    },
+                    key=f"transaction_grid_{hash(tuple(page_df.index))}_{get_ledger_version()}"
                 )
-                
-                # Check if this transaction is in edit mode
-                edit_key = f"edit_{original_idx}"
-                if edit_key not in st.session_state:
-                    st.session_state[edit_key] = False
-                
-                with st.container():
-                    if st.session_state[edit_key]:
-                        # EDIT MODE
-                        edit_col1, edit_col2, edit_col3, edit_col4, edit_col5 = st.columns([1.5, 2.5, 1.5, 1, 0.8])
-                        
-                        with edit_col1:
-                            new_date = st.date_input(
-                                "Date", 
-                                value=row['date'].date(),
-                                key=f"edit_date_{original_idx}",
-                                label_visibility="collapsed"
-                            )
-                        
-                        with edit_col2:
-                            # Category dropdown based on type
-                            categories = st.session_state.categories['expense'] if row['type'] == 'Expense' else st.session_state.categories['income']
-                            new_category = st.selectbox(
-                                "Category",
-                                categories,
-                                index=categories.index(row['category']) if row['category'] in categories else 0,
-                                key=f"edit_cat_{original_idx}",
-                                label_visibility="collapsed"
-                            )
-                            new_description = st.text_input(
-                                "Description",
-                                value=row.get('description', ''),
-                                key=f"edit_desc_{original_idx}",
-                                label_visibility="collapsed",
-                                placeholder="Description"
-                            )
-                        
-                        with edit_col3:
-                            new_amount = st.number_input(
-                                "Amount",
-                                value=float(row['amount']),
-                                min_value=0.01,
-                                step=0.01,
-                                format="%.2f",
-                                key=f"edit_amt_{original_idx}",
-                                label_visibility="collapsed"
-                            )
-                        
-                        with edit_col4:
-                            if st.button("💾", key=f"save_{original_idx}", help="Save changes"):
-                                # Update the transaction
-                                st.session_state.transactions[original_idx]['date'] = new_date.isoformat()
-                                st.session_state.transactions[original_idx]['category'] = new_category
-                                st.session_state.transactions[original_idx]['amount'] = float(new_amount)
-                                st.session_state.transactions[original_idx]['description'] = new_description
-                                st.session_state[edit_key] = False
-                                save_data()
-                                st.success("Transaction updated!")
-                                st.rerun()
-                            
-                            if st.button("❌", key=f"cancel_{original_idx}", help="Cancel editing"):
-                                st.session_state[edit_key] = False
-                                st.rerun()
-                        
-                        with edit_col5:
-                            st.write("")  # Placeholder
-                    
-                    else:
-                        # VIEW MODE
-                        view_col1, view_col2, view_col3, view_col4, view_col5 = st.columns([1.5, 2.5, 1.5, 1, 0.8])
-                        
-                        with view_col1:
-                            st.write(f"{row['date'].strftime('%Y-%m-%d')}")
-                        
-                        with view_col2:
-                            type_emoji = "📤" if row['type'] == "Income" else "📥"
-                            st.write(f"{type_emoji} {row['category']}")
-                            if row.get('description'):
-                                st.caption(row['description'])
-                        
-                        with view_col3:
-                            color = "green" if row['type'] == "Income" else "red"
-                            st.markdown(f":{color}[**${row['amount']:,.2f}**]")
-                        
-                        with view_col4:
-                            if st.button("✏️", key=f"edit_btn_{original_idx}", help="Edit transaction"):
-                                st.session_state[edit_key] = True
-                                st.rerun()
-                        
-                        with view_col5:
-                            if st.button("🗑️", key=f"del_{original_idx}", help="Delete transaction"):
-                                st.session_state.transactions.pop(original_idx)
-                                save_data()
-                                st.rerun()
-                    
-                    st.divider()
+                save_grid = st.form_submit_button("💾 Save Changes", type="primary", use_container_width=True)
+            
+            if save_grid:
+                updates, deletions = diff_grid_edits(grid, edited_grid, list(GRID_FIELDS))
+                rejected = []
+                for idx, changes in list(updates.items()):
+                    row = st.session_state.transactions[idx]
+                    if 'Category' in changes:
+                        type_categories = {
+                            'Expense': st.session_state.categories['expense'],
+                            'Income': st.session_state.categories['income'],
+                            'Transfer': [TRANSFER_CATEGORY]
+                        }[row['type']]
+                        if changes['Category'] not in type_categories:
+                            rejected.append(f"{changes.pop('Category')} is not a {row['type'].lower()} category")
+                    if row['type'] == 'Transfer' and changes.get('Account') == row['to_account']:
+                        rejected.append(f"A transfer can't go from {changes.pop('Account')} to itself")
+                    updates[idx] = {GRID_FIELDS[column]: value for column, value in changes.items()}
+                updates = {idx: changes for idx, changes in updates.items() if changes}
+                for message in rejected:
+                    st.error(f"❌ {message}")
+                if updates or deletions:
+                    apply_transaction_changes(updates, deletions)
+                    st.success(f"✅ Updated {len(updates)} and deleted {len(deletions)} transactions")
+                    if not rejected:
+                        st.rerun()
+                elif not rejected:
+                    st.info("No changes to save")
             
-            if len(display_df) > 20:
-                st.info(f"Showing 20 of {len(display_df)} transactions. Use filters to narrow down results.")
+            if page_count > 1:
+                st.caption(f"Showing {len(page_df)} of {len(display_df)} transactions. "
+                           f"Use the query or filters to narrow down results.")
         else:
             st.info("No transactions yet. Add your first transaction above!")
+    
+    st.divider()
+    
+    # Duplicate review
+    st.subheader("🧹 Duplicate Review")
+    
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        dup_tolerance = st.number_input("Date tolerance (days)", min_value=0, max_value=7, value=1, step=1,
+                                        key="dup_tolerance",
+                                        help="Same type, amount and description within this many days count as duplicates")
+    with col2:
+        st.write("")
+        scan_duplicates = st.toggle("🔍 Scan the whole ledger", key="scan_duplicates")
+    
+    if scan_duplicates:
+        ensure_loaded()
+    ledger_df = get_transactions_df() if scan_duplicates else pd.DataFrame()
+    if not scan_duplicates:
+        st.caption("Turn on the scan to review possible duplicates across all years.")
+    elif not ledger_df.empty:
+        duplicate_groups = find_duplicate_groups(ledger_df, dup_tolerance)
+        kept = ledger_df['keep_duplicate'].fillna(False).astype(bool) if 'keep_duplicate' in ledger_df else False
+        grouped = pd.DataFrame({'group': duplicate_groups, 'kept': kept})
+        grouped = grouped[grouped['group'] >= 0]
+        # Groups the user already reviewed (every row kept) are not shown again
+        open_groups = grouped.groupby('group')['kept'].all()
+        open_groups = open_groups[~open_groups].index
+        members = grouped[grouped['group'].isin(open_groups)].groupby('group').groups
+        
+        if members:
+            review_rows = []
+            for group_id, rows in members.items():
+                rows = sorted(rows)
+                first = ledger_df.loc[rows[0]]
+                currency = first.get(CURRENCY_FIELD)
+                review_rows.append({
+                    'Merge': False,
+                    'Description': first.get('description', ''),
+                    'Type': first['type'],
+                    'Amount': f"{currency_symbol(currency if pd.notna(currency) else BASE_CURRENCY)}{first['amount']:,.2f}",
+                    'Dates': ", ".join(sorted(set(ledger_df.loc[rows, 'date'].dt.strftime('%Y-%m-%d')))),
+                    'Copies': len(rows)
+                })
+            review_df = pd.DataFrame(review_rows)
+            group_rows = [sorted(rows) for rows in members.values()]
+            
+            st.write(f"**{len(review_rows)} possible duplicate groups found**")
+            edited = st.data_editor(review_df, use_container_width=True, hide_index=True,
+                                    disabled=['Description', 'Type', 'Amount', 'Dates', 'Copies'],
+                                    key="duplicate_review")
+            checked = [rows for rows, selected in zip(group_rows, edited['Merge']) if selected]
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.button(f"🔀 Merge {len(checked)} Checked Groups", type="primary",
+                             use_container_width=True, disabled=not checked):
+                    removed = []
+                    for rows in checked:
+                        st.session_state.transactions[rows[0]] = merge_duplicate_group(st.session_state.transactions, rows)
+                        removed.extend(rows[1:])
+                    learn_transactions([st.session_state.transactions[i] for i in removed], weight=-1)
+                    remove_transactions(removed)
+                    save_data()
+                    st.success(f"Merged {len(checked)} groups, removed {len(removed)} duplicates!")
+                    st.rerun()
+            with col2:
+                if st.button(f"✅ Keep {len(checked)} Checked Groups", use_container_width=True, disabled=not checked):
+                    for rows in checked:
+                        for i in rows:
+                            update_transaction(i, keep_duplicate=True)
+                    save_data()
+                    st.success("Marked as not duplicates!")
+                    st.rerun()
+        else:
+            st.success("✅ No duplicate transactions found")
+    
+    st.divider()
+    
+    # Statement reconciliation
+    st.subheader("🧾 Statement Reconciliation")
+    
+    col1, col2 = st.columns([3, 2])
+    with col1:
+        statement_file = st.file_uploader("Bank statement (CSV)", type=["csv"], key="statement_file",
+                                          help="Needs a date column and an amount column (or debit and credit columns)")
+    with col2:
+        reconcile_account = st.selectbox("Account", account_names(), key="reconcile_account")
+        match_window = st.number_input("Date window (days)", min_value=0, max_value=10, value=3, step=1,
+                                       key="reconcile_window",
+                                       help="How far apart the ledger and statement dates of a match may be")
+        charges_positive = st.checkbox("Charges are positive numbers", key="reconcile_charges_positive",
+                                       help="Common on credit card statements")
+    
+    statement = None
+    if statement_file is not None:
+        try:
+            statement = parse_statement(statement_file.getvalue(), charges_positive)
+        except StatementError as e:
+            st.error(f"❌ {e}")
+    
+    if statement is not None and not statement.empty:
+        window = timedelta(days=match_window)
+        first_day = statement['date'].min().date() - window
+        last_day = statement['date'].max().date() + window
+        ensure_loaded(first_day, last_day)
+        ledger_df = filter_by_date_range(get_transactions_df(), first_day, last_day)
+        if ledger_df.empty:
+            ledger_side = pd.DataFrame({'date': pd.Series(dtype='datetime64[ns]'), 'amount': pd.Series(dtype=float)})
+        else:
+            ledger_side = account_amounts(ledger_df, reconcile_account).rename('amount').to_frame()
+            ledger_side['date'] = ledger_df['date']
+        pairs, ledger_only, statement_only = reconcile(ledger_side, statement, match_window)
+        # The statement and the account's rows are in the account's currency
+        statement_money = f"{account_symbol(reconcile_account)}{{:,.2f}}"
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Matched", f"{len(pairs):,}")
+        with col2:
+            st.metric("Only in Ledger", f"{len(ledger_only):,}")
+        with col3:
+            st.metric("Only on Statement", f"{len(statement_only):,}")
+        with col4:
+            difference = statement['amount'].sum() - ledger_side['amount'].sum()
+            st.metric("Difference", statement_money.format(difference), help="Statement total minus ledger total for the account")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write("**Only in Ledger**")
+            if ledger_only:
+                st.dataframe(pd.DataFrame({
+                    'Date': ledger_df.loc[ledger_only, 'date'].dt.date,
+                    'Description': ledger_df.loc[ledger_only, 'description'],
+                    'Category': ledger_df.loc[ledger_only, 'category'],
+                    'Amount': ledger_side.loc[ledger_only, 'amount']
+                }).sort_values('Date').style.format({'Amount': statement_money}), use_container_width=True, hide_index=True)
+            else:
+                st.caption("Every ledger transaction is on the statement")
+        with col2:
+            st.write("**Only on Statement**")
+            if statement_only:
+                st.dataframe(statement.loc[statement_only].sort_values('date').assign(date=lambda d: d['date'].dt.date)
+                             .rename(columns=str.title).style.format({'Amount': statement_money}),
+                             use_container_width=True, hide_index=True)
+            else:
+                st.caption("Every statement line is in the ledger")
+        
+        to_clear = [i for i, _ in pairs if not st.session_state.transactions[i].get('cleared')]
+        if st.button(f"✅ Mark {len(to_clear)} Matched Transactions as Cleared", type="primary", disabled=not to_clear):
+            apply_transaction_changes({i: {'cleared': True} for i in to_clear}, [])
+            st.success(f"Cleared {len(to_clear)} transactions!")
+            st.rerun()
+    elif statement is not None:
+        st.info("The statement has no transactions")
 
 # TAB 2: DASHBOARD
 with tab2:
@@ -492,29 +1375,33 @@ with tab2:
     with col2:
         dashboard_end = st.date_input("To", datetime.now().date())
     
-    df = get_transactions_df()
-    dashboard_df = filter_by_date_range(df, dashboard_start, dashboard_end)
+    ensure_loaded(dashboard_start, dashboard_end)
+    df = get_reporting_df()
+    # Totals come from the cached prefix sums, so moving the dates doesn't rescan the ledger
+    prefix_sums = get_prefix_sums(df, get_ledger_version())
+    dashboard_totals = range_category_totals(prefix_sums, dashboard_start, dashboard_end)
     
-    if not dashboard_df.empty:
+    if (dashboard_totals != 0).any():
         # Summary metrics
         st.subheader("💰 Summary")
         col1, col2, col3, col4 = st.columns(4)
         
-        total_income = calculate_summary(dashboard_df, 'Income')
-        total_expenses = calculate_summary(dashboard_df, 'Expense')
-        net_savings = total_income - total_expenses
-        avg_daily_spending = total_expenses / max(1, (dashboard_end - dashboard_start).days + 1)
+        summary = range_summary(prefix_sums, dashboard_start, dashboard_end)
+        total_income = summary['income']
+        total_expenses = summary['expenses']
+        net_savings = summary['net']
+        avg_daily_spending = summary['avg_daily_spend']
         
         with col1:
-            st.metric("Total Income", f"${total_income:,.2f}")
+            st.metric("Total Income", f"{CUR}{total_income:,.2f}")
         with col2:
-            st.metric("Total Expenses", f"${total_expenses:,.2f}")
+            st.metric("Total Expenses", f"{CUR}{total_expenses:,.2f}")
         with col3:
-            st.metric("Net Savings", f"${net_savings:,.2f}", 
-                     delta=f"${net_savings:,.2f}",
+            st.metric("Net Savings", f"{CUR}{net_savings:,.2f}", 
+                     delta=f"{CUR}{net_savings:,.2f}",
                      delta_color="normal" if net_savings >= 0 else "inverse")
         with col4:
-            st.metric("Avg Daily Spend", f"${avg_daily_spending:,.2f}")
+            st.metric("Avg Daily Spend", f"{CUR}{avg_daily_spending:,.2f}")
         
         st.divider()
         
@@ -525,78 +1412,118 @@ with tab2:
             st.subheader("📊 Income vs Expenses")
             
             # Pie chart of expenses by category
-            expense_df = dashboard_df[dashboard_df['type'] == 'Expense']
-            if not expense_df.empty:
-                category_totals = expense_df.groupby('category')['amount'].sum().reset_index()
-                category_totals = category_totals.sort_values('amount', ascending=False)
-                
-                fig = px.pie(category_totals, values='amount', names='category', 
-                            title='Expenses by Category',
-                            hole=0.4)
-                fig.update_traces(textposition='inside', textinfo='percent+label')
-                st.plotly_chart(fig, use_container_width=True)
+            category_totals = type_totals(dashboard_totals, 'Expense')
+            if not category_totals.empty:
+                st.plotly_chart(category_pie(category_totals, 'Expenses by Category'), use_container_width=True)
             else:
                 st.info("No expense data for this period")
         
         with col2:
             st.subheader("💵 Income Sources")
             
-            income_df = dashboard_df[dashboard_df['type'] == 'Income']
-            if not income_df.empty:
-                income_totals = income_df.groupby('category')['amount'].sum().reset_index()
-                income_totals = income_totals.sort_values('amount', ascending=False)
-                
-                fig = px.pie(income_totals, values='amount', names='category',
-                            title='Income by Source',
-                            hole=0.4)
-                fig.update_traces(textposition='inside', textinfo='percent+label')
-                st.plotly_chart(fig, use_container_width=True)
+            income_totals = type_totals(dashboard_totals, 'Income')
+            if not income_totals.empty:
+                st.plotly_chart(category_pie(income_totals, 'Income by Source'), use_container_width=True)
             else:
                 st.info("No income data for this period")
         
         # Spending trends
         st.subheader("📈 Spending Trends Over Time")
         
-        # Group by date
-        daily_df = dashboard_df.copy()
-        daily_df['date'] = daily_df['date'].dt.date
-        
-        daily_income = daily_df[daily_df['type'] == 'Income'].groupby('date')['amount'].sum().reset_index()
-        daily_expenses = daily_df[daily_df['type'] == 'Expense'].groupby('date')['amount'].sum().reset_index()
-        
-        fig = go.Figure()
-        
-        if not daily_income.empty:
-            fig.add_trace(go.Scatter(x=daily_income['date'], y=daily_income['amount'],
-                                    mode='lines+markers', name='Income',
-                                    line=dict(color='green', width=2)))
-        
-        if not daily_expenses.empty:
-            fig.add_trace(go.Scatter(x=daily_expenses['date'], y=daily_expenses['amount'],
-                                    mode='lines+markers', name='Expenses',
-                                    line=dict(color='red', width=2)))
-        
-        fig.update_layout(title='Daily Income vs Expenses',
-                         xaxis_title='Date',
-                         yaxis_title='Amount ($)',
-                         hovermode='x unified')
-        
-        st.plotly_chart(fig, use_container_width=True)
+        # Daily totals are differences of neighbouring prefix sums
+        daily_income = range_daily_totals(prefix_sums, dashboard_start, dashboard_end, 'Income')
+        daily_expenses = range_daily_totals(prefix_sums, dashboard_start, dashboard_end, 'Expense')
+        st.plotly_chart(daily_trend(daily_income, daily_expenses, reporting_currency()), use_container_width=True)
         
         # Top spending categories
         st.subheader("🏆 Top Spending Categories")
         
-        if not expense_df.empty:
-            top_categories = expense_df.groupby('category')['amount'].sum().reset_index()
-            top_categories = top_categories.sort_values('amount', ascending=False).head(10)
-            
-            fig = px.bar(top_categories, x='amount', y='category', orientation='h',
-                        title='Top 10 Expense Categories',
-                        labels={'amount': 'Total Amount ($)', 'category': 'Category'})
-            fig.update_layout(yaxis={'categoryorder': 'total ascending'})
-            st.plotly_chart(fig, use_container_width=True)
+        if not category_totals.empty:
+            st.plotly_chart(top_categories_bar(category_totals, reporting_currency()), use_container_width=True)
     else:
         st.info("No transactions found for the selected date range. Start adding transactions!")
+    
+    st.divider()
+    
+    # Accounts: balances come from the incrementally maintained balance index
+    st.subheader("🏦 Accounts & Net Worth")
+    balance_index = get_balance_index()
+    accounts = account_names()
+    as_of_day = epoch_day(dashboard_end.isoformat())
+    account_balances = {name: balance_at(balance_index, name, as_of_day, load_segment) for name in accounts}
+    # Balances are in their accounts' currencies; net worth converts them at the as-of date's rates
+    converted_balances, _ = convert_balances(account_balances, account_currencies(), dashboard_end, get_rates(),
+                                             reporting_currency())
+    
+    metric_cols = st.columns(min(len(accounts), 4) + 1)
+    with metric_cols[0]:
+        st.metric("Net Worth", MONEY.format(converted_balances.sum()),
+                  help=f"All accounts on {dashboard_end}, in {reporting_currency()}")
+    for i, (name, balance) in enumerate(account_balances.items()):
+        with metric_cols[1 + i % 4]:
+            st.metric(name, f"{account_symbol(name)}{balance:,.2f}")
+    
+    if has_transactions():
+        col1, col2 = st.columns(2)
+        with col1:
+            # Net worth over the whole history, from the per-month totals (old years stay unloaded)
+            st.plotly_chart(net_worth_area(get_net_worth(), reporting_currency()), use_container_width=True)
+        with col2:
+            month_ends = pd.date_range(end=pd.Timestamp(dashboard_end), periods=12, freq='ME')
+            st.plotly_chart(balance_lines(get_month_end_balances(month_ends), shared_currency(accounts)),
+                            use_container_width=True)
+    
+    with st.expander("⚙️ Manage Accounts"):
+        with st.form("account_form", clear_on_submit=True):
+            col_a, col_b, col_c = st.columns([2, 2, 1])
+            with col_a:
+                new_account = st.text_input("Account name", placeholder="💳 Credit Card")
+            with col_b:
+                new_opening = st.number_input("Opening balance", value=0.0, step=100.0, format="%.2f",
+                                              help="In the account's currency")
+            with col_c:
+                new_account_currency = st.selectbox("Currency", currency_options(), key="new_account_currency")
+            if st.form_submit_button("➕ Add Account", use_container_width=True) and new_account.strip():
+                if new_account.strip() in accounts:
+                    st.error(f"❌ '{new_account.strip()}' already exists")
+                else:
+                    account = {'name': new_account.strip(), 'opening_balance': float(new_opening)}
+                    if new_account_currency != BASE_CURRENCY:
+                        account[CURRENCY_FIELD] = new_account_currency
+                    st.session_state.accounts.append(account)
+                    save_data()
+                    st.rerun()
+        
+        accounts_grid = pd.DataFrame([{
+            'Account': a['name'],
+            'Currency': a.get(CURRENCY_FIELD, BASE_CURRENCY),
+            'Opening Balance': float(a.get('opening_balance', 0.0)),
+            'Delete': False
+        } for a in st.session_state.accounts])
+        with st.form("accounts_grid_form"):
+            edited_accounts = st.data_editor(
+                accounts_grid, hide_index=True, use_container_width=True, disabled=['Account', 'Currency'],
+                column_config={
+                    'Opening Balance': st.column_config.NumberColumn(format="%.2f", required=True,
+                                                                     help="In the account's currency"),
+                    'Delete': st.column_config.CheckboxColumn("🗑️", help="Only accounts without transactions")
+                },
+                key=f"accounts_grid_{hash(json.dumps(st.session_state.accounts))}"
+            )
+            if st.form_submit_button("💾 Save Accounts", use_container_width=True):
+                changed, removed = diff_grid_edits(accounts_grid, edited_accounts, ['Opening Balance'])
+                for idx, changes in changed.items():
+                    st.session_state.accounts[idx]['opening_balance'] = float(changes['Opening Balance'])
+                used = set().union(*balance_index['totals'].values())
+                blocked = [st.session_state.accounts[i]['name'] for i in removed
+                           if st.session_state.accounts[i]['name'] in used]
+                kept = [a for i, a in enumerate(st.session_state.accounts) if i not in removed or a['name'] in used]
+                st.session_state.accounts = kept or st.session_state.accounts[:1]
+                save_data()
+                if blocked:
+                    st.error(f"❌ {', '.join(blocked)} still have transactions and were kept")
+                else:
+                    st.rerun()
 
 # TAB 3: BUDGET
 with tab3:
@@ -610,8 +1537,12 @@ with tab3:
     with col1:
         st.subheader("💡 Set Category Budgets")
         
-        budget_month = st.selectbox("Select Month", 
-                                   [current_month] + [(datetime.now() + timedelta(days=30*i)).strftime("%Y-%m") for i in range(1, 12)])
+        # Calendar months: every month with a budget, then the current month and the next eleven
+        upcoming_months = month_keys(current_month, pd.Period(current_month, freq='M') + 11)
+        budget_months = sorted(set(m for m, b in st.session_state.budgets.items() if b) | set(upcoming_months))
+        budget_month = st.selectbox("Select Month", budget_months, index=budget_months.index(current_month))
+        rollover = st.toggle("🔁 Roll over unused budget", value=True, key="budget_rollover",
+                             help="Envelope budgeting: what's left in a category (or overspent) carries into next month")
         
         if budget_month not in st.session_state.budgets:
             st.session_state.budgets[budget_month] = {}
@@ -632,6 +1563,7 @@ with tab3:
             
             if st.form_submit_button("💾 Save Budget", type="primary", use_container_width=True):
                 st.session_state.budgets[budget_month] = budget_values
+                st.session_state.envelope_changed = budget_month
                 save_data()
                 st.success("Budget saved successfully!")
                 st.rerun()
@@ -645,51 +1577,34 @@ with tab3:
         last_day = calendar.monthrange(year, month)[1]
         month_end = datetime(year, month, last_day).date()
         
-        df = get_transactions_df()
-        month_df = filter_by_date_range(df, month_start, month_end)
-        
-        if not month_df.empty:
-            month_expenses = month_df[month_df['type'] == 'Expense']
-        else:
-            month_expenses = pd.DataFrame()
+        # Envelopes chain from the first budgeted month up to the selected one
+        budgeted_months = sorted(m for m, b in st.session_state.budgets.items() if any(v > 0 for v in b.values()))
+        first_month = min(budgeted_months[0], budget_month) if budgeted_months and rollover else budget_month
+        ensure_loaded(datetime.strptime(first_month, "%Y-%m").date(), month_end)
+        envelopes = get_envelopes(month_keys(first_month, budget_month))
         
         if budget_month in st.session_state.budgets:
-            budget_data = []
-            
-            for category, budget_amount in st.session_state.budgets[budget_month].items():
-                if budget_amount > 0:
-                    if not month_expenses.empty:
-                        actual = month_expenses[month_expenses['category'] == category]['amount'].sum()
-                    else:
-                        actual = 0
-                    remaining = budget_amount - actual
-                    percent_used = (actual / budget_amount * 100) if budget_amount > 0 else 0
-                    
-                    budget_data.append({
-                        'Category': category,
-                        'Budget': budget_amount,
-                        'Actual': actual,
-                        'Remaining': remaining,
-                        'Percent Used': percent_used
-                    })
+            budget_df = budget_vs_actual(envelopes, st.session_state.budgets[budget_month], budget_month)
             
-            if budget_data:
-                budget_df = pd.DataFrame(budget_data)
-                
+            if not budget_df.empty:
                 # Total budget summary
                 total_budget = budget_df['Budget'].sum()
                 total_actual = budget_df['Actual'].sum()
-                total_remaining = total_budget - total_actual
+                total_carryover = budget_df['Carryover'].sum()
+                total_remaining = budget_df['Available'].sum() - total_actual
                 
                 col_a, col_b, col_c = st.columns(3)
                 with col_a:
-                    st.metric("Total Budget", f"${total_budget:,.2f}")
+                    st.metric("Total Budget", f"{CUR}{total_budget:,.2f}")
                 with col_b:
-                    st.metric("Total Spent", f"${total_actual:,.2f}")
+                    st.metric("Total Spent", f"{CUR}{total_actual:,.2f}")
                 with col_c:
-                    st.metric("Remaining", f"${total_remaining:,.2f}",
-                             delta=f"${total_remaining:,.2f}",
+                    st.metric("Remaining", f"{CUR}{total_remaining:,.2f}",
+                             delta=f"{CUR}{total_remaining:,.2f}",
                              delta_color="normal" if total_remaining >= 0 else "inverse")
+                if rollover and abs(total_carryover) > 0.005:
+                    st.caption(f"Remaining includes {'+' if total_carryover > 0 else '−'}{CUR}{abs(total_carryover):,.2f} "
+                               f"carried over from previous months")
                 
                 st.divider()
                 
@@ -705,23 +1620,25 @@ with tab3:
                             st.progress(progress)
                         
                         with col2:
-                            st.write(f"${row['Actual']:,.2f}")
+                            st.write(f"{CUR}{row['Actual']:,.2f}")
                         
                         with col3:
                             if row['Remaining'] >= 0:
-                                st.success(f"${row['Remaining']:,.2f}")
+                                st.success(f"{CUR}{row['Remaining']:,.2f}")
                             else:
-                                st.error(f"${row['Remaining']:,.2f}")
+                                st.error(f"{CUR}{row['Remaining']:,.2f}")
                         
-                        st.caption(f"Budget: ${row['Budget']:,.2f} | {row['Percent Used']:.1f}% used")
+                        carryover_note = ""
+                        if row['Carryover'] > 0.005:
+                            carryover_note = f" + {CUR}{row['Carryover']:,.2f} carried over"
+                        elif row['Carryover'] < -0.005:
+                            carryover_note = f" − {CUR}{-row['Carryover']:,.2f} overspending carried over"
+                        st.caption(f"Budget: {CUR}{row['Budget']:,.2f}{carryover_note} | {row['Percent Used']:.1f}% used")
                         
                         st.divider()
                 
                 # Visualization
-                fig = px.bar(budget_df, x='Category', y=['Budget', 'Actual'],
-                            title='Budget vs Actual by Category',
-                            barmode='group')
-                st.plotly_chart(fig, use_container_width=True)
+                st.plotly_chart(budget_vs_actual_bar(budget_df, rollover), use_container_width=True)
             else:
                 st.info("Set some category budgets to see the comparison!")
         else:
@@ -739,9 +1656,18 @@ with tab4:
         with st.form("goal_form", clear_on_submit=True):
             goal_name = st.text_input("Goal Name", placeholder="Emergency Fund, Vacation, New Car...")
             
-            goal_target = st.number_input("Target Amount ($)", min_value=1.0, step=100.0, format="%.2f")
+            goal_target = st.number_input(f"Target Amount ({CUR.strip()})", min_value=1.0, step=100.0, format="%.2f")
             
-            goal_current = st.number_input("Current Amount ($)", min_value=0.0, step=10.0, format="%.2f")
+            goal_current = st.number_input(f"Already Saved ({CUR.strip()})", min_value=0.0, step=10.0, format="%.2f",
+                                           help="Saved before you started tracking; later contributions are "
+                                                "recorded as transfers in the ledger")
+            
+            goal_account_options = account_names()
+            if SAVINGS_ACCOUNT not in goal_account_options:
+                goal_account_options.append(SAVINGS_ACCOUNT)
+            goal_account = st.selectbox("Saved In", goal_account_options,
+                                        index=goal_account_options.index(SAVINGS_ACCOUNT),
+                                        help="Account contributions are transferred into")
             
             goal_deadline = st.date_input("Target Date", min_value=datetime.now().date())
             
@@ -751,15 +1677,18 @@ with tab4:
             
             if st.form_submit_button("Create Goal", type="primary", use_container_width=True):
                 goal = {
+                    'id': new_goal_id(),
                     'name': goal_name,
                     'target': float(goal_target),
-                    'current': float(goal_current),
+                    'starting': float(goal_current),
+                    'account': goal_account,
                     'deadline': goal_deadline.isoformat(),
                     'priority': goal_priority,
                     'notes': goal_notes,
                     'created': datetime.now().isoformat()
                 }
                 st.session_state.goals.append(goal)
+                ensure_account(goal_account)
                 save_data()
                 st.success(f"Goal '{goal_name}' created!")
                 st.rerun()
@@ -770,13 +1699,16 @@ with tab4:
         if st.session_state.goals:
             # Sort by priority
             priority_order = {"Critical": 0, "High": 1, "Medium": 2, "Low": 3}
-            sorted_goals = sorted(st.session_state.goals, 
-                                key=lambda x: priority_order.get(x.get('priority', 'Medium'), 2))
+            goal_contributions = get_goal_contributions()
+            goals_progress = get_goals_progress(goal_contributions)
+            sorted_goals = sorted(enumerate(goals_progress), 
+                                key=lambda x: priority_order.get(x[1].get('priority', 'Medium'), 2))
             
-            for idx, goal in enumerate(sorted_goals):
-                # Get the original index in the unsorted list
-                original_idx = st.session_state.goals.index(goal)
-                
+            ensure_loaded(datetime.now().date() - timedelta(days=731), None)
+            goal_projections = get_goal_projections(get_reporting_df(), get_ledger_version(),
+                                                    goals_progress, datetime.now().date())
+            
+            for original_idx, goal in sorted_goals:
                 # Check if this goal is in edit mode
                 edit_key = f"edit_goal_{original_idx}"
                 if edit_key not in st.session_state:
@@ -792,14 +1724,14 @@ with tab4:
                             
                             col_a, col_b = st.columns(2)
                             with col_a:
-                                new_target = st.number_input("Target Amount ($)", 
+                                new_target = st.number_input(f"Target Amount ({CUR.strip()})", 
                                                             value=float(goal['target']), 
                                                             min_value=1.0, 
                                                             step=100.0, 
                                                             format="%.2f")
                             with col_b:
-                                new_current = st.number_input("Current Amount ($)", 
-                                                             value=float(goal['current']), 
+                                new_current = st.number_input(f"Already Saved ({CUR.strip()})", 
+                                                             value=float(goal.get('starting', 0.0)), 
                                                              min_value=0.0, 
                                                              step=10.0, 
                                                              format="%.2f")
@@ -821,7 +1753,7 @@ with tab4:
                                 if st.form_submit_button("💾 Save Changes", type="primary", use_container_width=True):
                                     st.session_state.goals[original_idx]['name'] = new_name
                                     st.session_state.goals[original_idx]['target'] = float(new_target)
-                                    st.session_state.goals[original_idx]['current'] = float(new_current)
+                                    st.session_state.goals[original_idx]['starting'] = float(new_current)
                                     st.session_state.goals[original_idx]['deadline'] = new_deadline.isoformat()
                                     st.session_state.goals[original_idx]['priority'] = new_priority
                                     st.session_state.goals[original_idx]['notes'] = new_notes
@@ -858,14 +1790,14 @@ with tab4:
                         col1, col2, col3, col4 = st.columns(4)
                         
                         with col1:
-                            st.metric("Current", f"${goal['current']:,.2f}")
+                            st.metric("Current", f"{CUR}{goal['current']:,.2f}")
                         
                         with col2:
-                            st.metric("Target", f"${goal['target']:,.2f}")
+                            st.metric("Target", f"{CUR}{goal['target']:,.2f}")
                         
                         with col3:
                             remaining = goal['target'] - goal['current']
-                            st.metric("Remaining", f"${remaining:,.2f}")
+                            st.metric("Remaining", f"{CUR}{remaining:,.2f}")
                         
                         with col4:
                             percent = (goal['current'] / goal['target'] * 100) if goal['target'] > 0 else 0
@@ -881,34 +1813,59 @@ with tab4:
                             # Calculate required monthly savings
                             months_remaining = max(days_remaining / 30, 1)
                             monthly_needed = remaining / months_remaining
-                            st.caption(f"💡 Save ${monthly_needed:,.2f}/month to reach your goal")
+                            st.caption(f"💡 Save {CUR}{monthly_needed:,.2f}/month to reach your goal")
+                            
+                            # Monte Carlo projection from historical monthly savings
+                            projection = goal_projections[original_idx]
+                            completion = " / ".join(
+                                projection[p].strftime('%b %Y') if projection[p] is not None else "later"
+                                for p in ('p10', 'p50', 'p90')
+                            )
+                            st.caption(f"🎲 {projection['probability']:.0%} chance of reaching the target on time "
+                                       f"with an even share of your historical savings across open goals · Completion (P10 / P50 / P90): {completion}")
                         else:
                             st.warning(f"⚠️ Deadline passed on {deadline.strftime('%Y-%m-%d')}")
                         
                         if goal.get('notes'):
                             st.caption(f"📝 {goal['notes']}")
                         
+                        # Contribution history (monthly totals from the manifest)
+                        history = contribution_history(goal_contributions, goal['id'])
+                        if not history.empty:
+                            with st.expander(f"📈 Contributions: {CUR}{goal['contributed']:,.2f} "
+                                             f"over {len(history)} month(s)"):
+                                fig = contribution_chart(history, goal.get('starting', 0.0), reporting_currency())
+                                st.plotly_chart(fig, use_container_width=True)
+                        
                         # Actions
-                        col_a, col_b, col_c, col_d = st.columns([2, 2, 1, 1])
+                        goal_account = goal.get('account', SAVINGS_ACCOUNT)
+                        from_accounts = [name for name in account_names() if name != goal_account]
+                        col_a, col_b, col_c, col_d, col_e = st.columns([2, 2, 2, 1, 1])
                         
                         with col_a:
                             contribution = st.number_input(f"Add to goal", min_value=0.0, step=10.0, 
                                                           key=f"contrib_{original_idx}", format="%.2f")
                         
                         with col_b:
+                            contribution_account = st.selectbox("From account", from_accounts,
+                                                                key=f"contrib_account_{original_idx}",
+                                                                help=f"Transferred into {goal_account}")
+                        
+                        with col_c:
                             if st.button("💰 Add Contribution", key=f"add_{original_idx}"):
-                                if contribution > 0:
-                                    st.session_state.goals[original_idx]['current'] += contribution
-                                    save_data()
-                                    st.success(f"Added ${contribution:.2f} to {goal['name']}!")
+                                if contribution > 0 and contribution_account:
+                                    add_goal_contribution(goal, contribution, contribution_account)
+                                    st.success(f"Added {CUR}{contribution:.2f} to {goal['name']}!")
                                     st.rerun()
+                                elif not contribution_account:
+                                    st.error(f"Add another account to transfer into {goal_account} from.")
                         
-                        with col_c:
+                        with col_d:
                             if st.button("✏️", key=f"edit_goal_btn_{original_idx}", help="Edit goal"):
                                 st.session_state[edit_key] = True
                                 st.rerun()
                         
-                        with col_d:
+                        with col_e:
                             if st.button("🗑️", key=f"del_goal_{original_idx}", help="Delete goal"):
                                 st.session_state.goals.pop(original_idx)
                                 save_data()
@@ -930,83 +1887,47 @@ with tab5:
         "Spending Patterns",
         "Year-over-Year Comparison",
         "Cash Flow Analysis",
-        "Tax Summary"
+        "Tax Summary",
+        "HTML Report"
     ])
     
-    df = get_transactions_df()
+    # These reports always cover the whole history
+    if report_type in ("Spending Patterns", "Year-over-Year Comparison", "Cash Flow Analysis"):
+        ensure_loaded()
+    df = get_reporting_df()
     
-    if not df.empty:
+    if has_transactions():
         if report_type == "Monthly Summary":
             st.subheader("📅 Monthly Summary Report")
             
-            # Group by month
-            df['month'] = df['date'].dt.to_period('M')
-            monthly_income = df[df['type'] == 'Income'].groupby('month')['amount'].sum()
-            monthly_expenses = df[df['type'] == 'Expense'].groupby('month')['amount'].sum()
-            
-            summary_df = pd.DataFrame({
-                'Income': monthly_income,
-                'Expenses': monthly_expenses,
-                'Net Savings': monthly_income - monthly_expenses,
-                'Savings Rate': (monthly_income - monthly_expenses) / monthly_income * 100
-            }).reset_index()
-            
-            summary_df['month'] = summary_df['month'].astype(str)
+            # Group by month (years not loaded come from the segment manifest)
+            summary_df = monthly_summary(get_monthly_totals())
             
             st.dataframe(summary_df.style.format({
-                'Income': '${:,.2f}',
-                'Expenses': '${:,.2f}',
-                'Net Savings': '${:,.2f}',
+                'Income': MONEY,
+                'Expenses': MONEY,
+                'Net Savings': MONEY,
                 'Savings Rate': '{:.1f}%'
             }), use_container_width=True)
             
             # Visualization
-            fig = go.Figure()
-            fig.add_trace(go.Bar(name='Income', x=summary_df['month'], y=summary_df['Income'], marker_color='green'))
-            fig.add_trace(go.Bar(name='Expenses', x=summary_df['month'], y=summary_df['Expenses'], marker_color='red'))
-            fig.add_trace(go.Scatter(name='Net Savings', x=summary_df['month'], y=summary_df['Net Savings'], 
-                                    mode='lines+markers', marker_color='blue', yaxis='y2'))
-            
-            fig.update_layout(
-                title='Monthly Financial Overview',
-                xaxis_title='Month',
-                yaxis_title='Amount ($)',
-                yaxis2=dict(title='Net Savings ($)', overlaying='y', side='right'),
-                barmode='group'
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(monthly_overview(summary_df, reporting_currency()), use_container_width=True)
         
         elif report_type == "Category Analysis":
             st.subheader("🏷️ Category Analysis")
             
             analysis_type = st.radio("Analyze", ["Expenses", "Income"], horizontal=True)
-            time_period = st.selectbox("Time Period", ["Last Month", "Last 3 Months", "Last 6 Months", "Last Year", "All Time"])
+            time_period = st.selectbox("Time Period", list(CATEGORY_PERIODS))
             
             # Filter by time period
             today = datetime.now().date()
-            if time_period == "Last Month":
-                start_date = today - timedelta(days=30)
-            elif time_period == "Last 3 Months":
-                start_date = today - timedelta(days=90)
-            elif time_period == "Last 6 Months":
-                start_date = today - timedelta(days=180)
-            elif time_period == "Last Year":
-                start_date = today - timedelta(days=365)
-            else:
-                start_date = df['date'].min().date()
+            start_date = period_start(time_period, today, get_ledger_start_date())
             
-            filtered_df = filter_by_date_range(df, start_date, today)
-            type_df = filtered_df[filtered_df['type'] == analysis_type]
+            ensure_loaded(start_date, today)
+            df = get_reporting_df()
+            category_stats = category_analysis(df, analysis_type, start_date, today)
             
-            if not type_df.empty:
-                category_stats = type_df.groupby('category').agg({
-                    'amount': ['sum', 'mean', 'count']
-                }).reset_index()
-                
-                category_stats.columns = ['Category', 'Total', 'Average', 'Count']
-                category_stats = category_stats.sort_values('Total', ascending=False)
-                
+            if not category_stats.empty:
                 col1, col2 = st.columns(2)
                 
                 with col1:
@@ -1021,8 +1942,8 @@ with tab5:
                     st.plotly_chart(fig, use_container_width=True)
                 
                 st.dataframe(category_stats.style.format({
-                    'Total': '${:,.2f}',
-                    'Average': '${:,.2f}',
+                    'Total': MONEY,
+                    'Average': MONEY,
                     'Count': '{:,.0f}'
                 }), use_container_width=True)
             else:
@@ -1045,7 +1966,7 @@ with tab5:
                 with col1:
                     fig = px.bar(x=dow_spending.index, y=dow_spending.values,
                                 title='Spending by Day of Week',
-                                labels={'x': 'Day', 'y': 'Total Amount ($)'})
+                                labels={'x': 'Day', 'y': f'Total Amount ({CUR.strip()})'})
                     st.plotly_chart(fig, use_container_width=True)
                 
                 # Hour analysis (if time data available)
@@ -1055,7 +1976,7 @@ with tab5:
                     
                     fig = px.line(x=dom_spending.index, y=dom_spending.values,
                                  title='Spending by Day of Month',
-                                 labels={'x': 'Day of Month', 'y': 'Total Amount ($)'})
+                                 labels={'x': 'Day of Month', 'y': f'Total Amount ({CUR.strip()})'})
                     st.plotly_chart(fig, use_container_width=True)
                 
                 # Average transaction size by category
@@ -1064,81 +1985,215 @@ with tab5:
                 
                 fig = px.bar(x=avg_by_category.index, y=avg_by_category.values,
                             title='Average Transaction Size by Category',
-                            labels={'x': 'Category', 'y': 'Average Amount ($)'})
+                            labels={'x': 'Category', 'y': f'Average Amount ({CUR.strip()})'})
                 st.plotly_chart(fig, use_container_width=True)
         
-        elif report_type == "Cash Flow Analysis":
-            st.subheader("💸 Cash Flow Analysis")
+        elif report_type == "Year-over-Year Comparison":
+            st.subheader("📆 Year-over-Year Comparison")
+            
+            yoy_type = st.radio("Compare", ["Expense", "Income"], horizontal=True, key="yoy_type")
             
-            # Weekly cash flow
-            df['week'] = df['date'].dt.to_period('W')
+            cube, month_index = get_pivot_cube(df, get_ledger_version())
+            year_table = yoy_by_year(cube, yoy_type)
             
-            weekly_income = df[df['type'] == 'Income'].groupby('week')['amount'].sum()
-            weekly_expenses = df[df['type'] == 'Expense'].groupby('week')['amount'].sum()
-            weekly_net = weekly_income - weekly_expenses
+            if not year_table.empty:
+                latest = year_table.iloc[-1]
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric(f"{int(latest['Year'])} Total", f"{CUR}{latest['Total']:,.2f}")
+                with col2:
+                    prior = latest['Prior Year']
+                    st.metric(f"{int(latest['Year']) - 1} Total", f"{CUR}{prior:,.2f}" if pd.notna(prior) else "—")
+                with col3:
+                    change = latest['Change']
+                    change_pct = latest['Change %']
+                    st.metric("Year-over-Year Change", f"{CUR}{change:,.2f}" if pd.notna(change) else "—",
+                             delta=f"{change_pct:.1f}%" if pd.notna(change_pct) else None,
+                             delta_color="inverse" if yoy_type == "Expense" else "normal")
+                
+                year_format = {
+                    'Total': MONEY,
+                    'Prior Year': MONEY,
+                    'Change': MONEY,
+                    'Change %': '{:.1f}%'
+                }
+                st.dataframe(year_table.style.format(year_format, na_rep='—'),
+                            use_container_width=True, hide_index=True)
+                
+                # Same month, different years
+                matrix, delta, pct = yoy_month_matrix(cube, yoy_type)
+                
+                fig = go.Figure()
+                for year in matrix.index:
+                    fig.add_trace(go.Scatter(x=MONTH_NAMES, y=matrix.loc[year], name=str(year),
+                                            mode='lines+markers'))
+                fig.update_layout(title=f'Monthly {yoy_type}s by Year',
+                                 xaxis_title='Month',
+                                 yaxis_title=f'Amount ({CUR.strip()})',
+                                 hovermode='x unified')
+                st.plotly_chart(fig, use_container_width=True)
+                
+                if len(pct.index) > 1:
+                    fig = px.imshow(pct.iloc[1:], text_auto='.0f', aspect='auto',
+                                   color_continuous_scale='RdYlGn_r' if yoy_type == "Expense" else 'RdYlGn',
+                                   color_continuous_midpoint=0,
+                                   labels={'x': 'Month', 'y': 'Year', 'color': 'Change %'},
+                                   title='Change vs Same Month Last Year (%)')
+                    fig.update_yaxes(type='category')
+                    st.plotly_chart(fig, use_container_width=True)
+                
+                st.write("**By Category**")
+                category_matrix = yoy_category_matrix(cube, yoy_type)
+                category_matrix.columns = category_matrix.columns.astype(str)
+                st.dataframe(category_matrix.style.format(MONEY), use_container_width=True)
+                
+                # Drill-down: year -> month -> transactions
+                st.subheader("🔎 Drill Down")
+                
+                drill_years = [int(y) for y in year_table['Year'][::-1]]
+                drill_year = st.selectbox("Year", drill_years, key="yoy_drill_year")
+                
+                year_detail = yoy_year_detail(cube, yoy_type, drill_year)
+                st.dataframe(year_detail.style.format(year_format, na_rep='—'), use_container_width=True)
+                
+                active_months = [m for m, total in zip(MONTH_NAMES, year_detail['Total']) if total > 0]
+                drill_month_name = st.selectbox("Month", MONTH_NAMES,
+                                               index=MONTH_NAMES.index(active_months[-1]) if active_months else 0,
+                                               key="yoy_drill_month")
+                drill_month = MONTH_NAMES.index(drill_month_name) + 1
+                
+                month_detail = yoy_year_detail(cube, yoy_type, drill_year, drill_month)
+                st.write(f"**{drill_month_name} {drill_year} vs {drill_month_name} {drill_year - 1}**")
+                st.dataframe(month_detail.style.format(year_format, na_rep='—'), use_container_width=True)
+                
+                drill_category = st.selectbox("Category", ["All"] + list(month_detail.index), key="yoy_drill_category")
+                
+                month_rows = month_index.get((drill_year, drill_month), [])
+                month_tx = df.iloc[month_rows]
+                month_tx = month_tx[month_tx['type'] == yoy_type]
+                if drill_category != "All":
+                    month_tx = month_tx[month_tx['category'] == drill_category]
+                
+                if not month_tx.empty:
+                    month_tx = month_tx.sort_values('date')[['date', 'category', 'amount', 'description']]
+                    month_tx['date'] = month_tx['date'].dt.strftime('%Y-%m-%d')
+                    st.dataframe(month_tx.style.format({'amount': MONEY}),
+                                use_container_width=True, hide_index=True)
+                else:
+                    st.caption("No transactions in this month")
+            else:
+                st.info(f"No {yoy_type.lower()} data to compare yet")
+        
+        elif report_type == "Cash Flow Analysis":
+            st.subheader("💸 Cash Flow Analysis")
             
-            # Cumulative
-            cumulative_net = weekly_net.cumsum()
+            # Weekly cash flow and its running total
+            weekly = cash_flow(df)
             
             fig = go.Figure()
             
-            fig.add_trace(go.Scatter(x=weekly_income.index.astype(str), y=weekly_income.values,
+            fig.add_trace(go.Scatter(x=weekly['week'], y=weekly['Income'],
                                     name='Income', mode='lines', line=dict(color='green')))
-            fig.add_trace(go.Scatter(x=weekly_expenses.index.astype(str), y=weekly_expenses.values,
+            fig.add_trace(go.Scatter(x=weekly['week'], y=weekly['Expenses'],
                                     name='Expenses', mode='lines', line=dict(color='red')))
-            fig.add_trace(go.Scatter(x=weekly_net.index.astype(str), y=weekly_net.values,
+            fig.add_trace(go.Scatter(x=weekly['week'], y=weekly['Net Cash Flow'],
                                     name='Net Cash Flow', mode='lines', line=dict(color='blue', dash='dash')))
             
             fig.update_layout(title='Weekly Cash Flow',
                             xaxis_title='Week',
-                            yaxis_title='Amount ($)',
+                            yaxis_title=f'Amount ({CUR.strip()})',
                             hovermode='x unified')
             
             st.plotly_chart(fig, use_container_width=True)
             
             # Cumulative savings
-            fig = px.line(x=cumulative_net.index.astype(str), y=cumulative_net.values,
+            fig = px.line(x=weekly['week'], y=weekly['Cumulative Net'],
                          title='Cumulative Net Savings Over Time',
-                         labels={'x': 'Week', 'y': 'Cumulative Savings ($)'})
+                         labels={'x': 'Week', 'y': f'Cumulative Savings ({CUR.strip()})'})
             fig.update_traces(line_color='green', fill='tozeroy')
             st.plotly_chart(fig, use_container_width=True)
         
         elif report_type == "Tax Summary":
             st.subheader("📋 Tax Summary Report")
             
+            ledger_years = set(st.session_state.manifest['segments']) | {t['date'][:4] for t in st.session_state.transactions}
             tax_year = st.selectbox("Select Year", 
-                                   sorted(df['date'].dt.year.unique(), reverse=True))
+                                   sorted((int(y) for y in ledger_years), reverse=True))
             
-            year_df = df[df['date'].dt.year == tax_year]
+            ensure_loaded(datetime(tax_year, 1, 1).date(), datetime(tax_year, 12, 31).date())
+            tax = tax_summary(get_reporting_df(), tax_year)
             
             st.write(f"### {tax_year} Tax Year Summary")
             
-            income_df = year_df[year_df['type'] == 'Income']
-            
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                total_income = income_df['amount'].sum()
-                st.metric("Total Income", f"${total_income:,.2f}")
+                st.metric("Total Income", f"{CUR}{tax['total_income']:,.2f}")
             
             with col2:
-                # Deductible expenses (customize categories as needed)
-                deductible_categories = ["🏥 Healthcare", "🎓 Education", "🔧 Maintenance"]
-                deductible = year_df[year_df['category'].isin(deductible_categories)]['amount'].sum()
-                st.metric("Potential Deductions", f"${deductible:,.2f}")
+                # Deductible categories are DEDUCTIBLE_CATEGORIES in budget_reports
+                st.metric("Potential Deductions", f"{CUR}{tax['deductions']:,.2f}")
             
             with col3:
-                donations = year_df[year_df['category'] == "🎁 Gifts & Donations"]['amount'].sum()
-                st.metric("Charitable Donations", f"${donations:,.2f}")
+                st.metric("Charitable Donations", f"{CUR}{tax['donations']:,.2f}")
             
             # Income breakdown
             st.subheader("Income Sources")
-            income_by_source = income_df.groupby('category')['amount'].sum().reset_index()
-            
-            st.dataframe(income_by_source.style.format({'amount': '${:,.2f}'}),
+            st.dataframe(tax['income_sources'].style.format({'amount': MONEY}),
                         use_container_width=True)
             
             st.info("💡 This is a summary for informational purposes only. Consult a tax professional for actual tax preparation.")
+        
+        elif report_type == "HTML Report":
+            st.subheader("📄 HTML Report")
+            st.caption("One file with the summary metrics, Dashboard charts, Budget vs Actual and Goals for a range "
+                       "of months. It opens in any browser without the app running.")
+            
+            current_month = datetime.now().strftime("%Y-%m")
+            report_months = month_keys(min(get_monthly_totals().index.min(), current_month), current_month)
+            col1, col2 = st.columns(2)
+            with col2:
+                last_month = st.selectbox("To month", report_months[::-1], key="report_last_month")
+            with col1:
+                earlier = report_months[:report_months.index(last_month) + 1][::-1]
+                first_month = st.selectbox("From month", earlier, index=min(11, len(earlier) - 1),
+                                           key="report_first_month")
+            inline_plotly = st.checkbox("Embed plotly.js", value=True,
+                                        help="Works offline; adds about 4.6 MB. Unchecked, charts load plotly.js from its CDN.")
+            
+            if st.button("📄 Generate report", type="primary"):
+                with st.spinner("Building report..."):
+                    months = month_keys(first_month, last_month)
+                    rollover = st.session_state.get('budget_rollover', True)
+                    budgeted_months = sorted(m for m, b in st.session_state.budgets.items() if any(v > 0 for v in b.values()))
+                    load_from = min(budgeted_months[0], first_month) if budgeted_months and rollover else first_month
+                    ensure_loaded(datetime.strptime(load_from, "%Y-%m").date(),
+                                  pd.Period(last_month, freq='M').end_time.date())
+                    df = get_reporting_df()
+                    ledger_version = get_ledger_version()
+                    balances = get_month_end_balances(pd.date_range(start=first_month, periods=len(months), freq='ME'))
+                    balances.index = months
+                    contributions = get_goal_contributions()
+                    report = period_report(
+                        months, get_prefix_sums(df, ledger_version),
+                        report_envelopes(st.session_state.budgets, get_monthly_spend(df, ledger_version), months, rollover),
+                        st.session_state.budgets, rollover, get_net_worth().loc[:last_month], balances,
+                        get_goals_progress(contributions), contributions, reporting_currency(),
+                        account_currencies(), get_rates()
+                    )
+                    st.session_state.html_report = {
+                        'name': f"budget_report_{first_month}_{last_month}.html",
+                        'html': report.render(inline_plotly=inline_plotly).encode('utf-8'),
+                        'charts': report.chart_count,
+                        'figures': len(report.figures)
+                    }
+            
+            html_report = st.session_state.get('html_report')
+            if html_report:
+                st.caption(f"{html_report['name']}: {html_report['charts']} charts "
+                           f"({html_report['figures']} distinct figures), {len(html_report['html']) / 1e6:.1f} MB")
+                st.download_button("📥 Download report", html_report['html'], html_report['name'],
+                                   mime="text/html", use_container_width=True)
     else:
         st.info("No transaction data available for reports. Start adding transactions!")
 
@@ -1158,7 +2213,7 @@ with tab6:
             categories = st.session_state.categories['expense'] if rec_type == "Expense" else st.session_state.categories['income']
             rec_category = st.selectbox("Category", categories, key=f"rec_cat_{rec_type}")
             
-            rec_amount = st.number_input("Amount ($)", min_value=0.01, step=0.01, format="%.2f")
+            rec_amount = st.number_input(f"Amount ({CUR.strip()})", min_value=0.01, step=0.01, format="%.2f")
             
             rec_description = st.text_input("Description")
             
@@ -1201,7 +2256,7 @@ with tab6:
                         
                         with col_b:
                             color = "green" if rec['type'] == "Income" else "red"
-                            st.markdown(f":{color}[**${rec['amount']:,.2f}**]")
+                            st.markdown(f":{color}[**{CUR}{rec['amount']:,.2f}**]")
                             if rec.get('last_processed'):
                                 last_date = datetime.fromisoformat(rec['last_processed']).strftime('%Y-%m-%d')
                                 st.caption(f"Last: {last_date}")
@@ -1228,11 +2283,66 @@ with tab6:
             for idx, rec in enumerate(inactive):
                 actual_idx = st.session_state.recurring.index(rec)
                 with st.container():
-                    st.write(f"**{rec['description']}** - ${rec['amount']:.2f}")
+                    st.write(f"**{rec['description']}** - {CUR}{rec['amount']:.2f}")
                     if st.button("▶️ Resume", key=f"resume_{actual_idx}"):
                         st.session_state.recurring[actual_idx]['active'] = True
                         save_data()
                         st.rerun()
+    
+    # Discovery: regular charges in the history that have no template yet
+    st.divider()
+    st.subheader("🔍 Discovered Recurring Charges")
+    if has_transactions():
+        today = datetime.now().date()
+        proposals = get_recurring_proposals(get_transactions_df(), get_ledger_version(), today)
+        templated = {(r['type'], normalize_description(r['description'])) for r in st.session_state.recurring}
+        dismissed = st.session_state.setdefault('dismissed_recurring', set())
+        keys = list(zip(proposals['type'], proposals['description'].map(normalize_description)))
+        untracked = [key not in templated and key not in dismissed for key in keys]
+        proposals = proposals[untracked].reset_index(drop=True)
+        keys = [key for key, keep in zip(keys, untracked) if keep]
+        
+        if not proposals.empty:
+            st.caption(f"{len(proposals)} charges repeat at a regular interval in the loaded history but have no "
+                       f"recurring template. Tick the ones to add; each starts on its next expected date.")
+            review_df = pd.DataFrame({
+                'Add': False,
+                'Description': proposals['description'],
+                'Type': proposals['type'],
+                'Category': proposals['category'],
+                'Amount': [f"{currency_symbol(c)}{a:,.2f}" for c, a in zip(proposals['currency'], proposals['amount'])],
+                'Frequency': proposals['frequency'],
+                'Seen': proposals['occurrences'],
+                'Last': proposals['last_date'].dt.strftime('%Y-%m-%d'),
+                'Next': proposals['next_date'].dt.strftime('%Y-%m-%d'),
+                'Per Year': [f"{currency_symbol(c)}{a:,.2f}" for c, a in
+                             zip(proposals['currency'], proposals['yearly_amount'])]
+            })
+            edited = st.data_editor(review_df, use_container_width=True, hide_index=True,
+                                    disabled=[c for c in review_df.columns if c != 'Add'],
+                                    column_config={'Seen': st.column_config.NumberColumn(help="Occurrences found")},
+                                    key=f"recurring_review_{get_ledger_version()}_{len(st.session_state.recurring)}")
+            checked = [i for i, selected in enumerate(edited['Add']) if selected]
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.button(f"➕ Add {len(checked)} as Recurring", type="primary",
+                             use_container_width=True, disabled=not checked):
+                    for i in checked:
+                        proposal = proposals.iloc[i]
+                        st.session_state.recurring.append(recurring_template(proposal, proposal['next_date'].date()))
+                    save_data()
+                    st.success(f"Added {len(checked)} recurring transactions!")
+                    st.rerun()
+            with col2:
+                if st.button(f"🙈 Dismiss {len(checked)}", use_container_width=True, disabled=not checked):
+                    dismissed.update(keys[i] for i in checked)
+                    st.rerun()
+        else:
+            st.info("No untracked recurring charges found. Weekly, bi-weekly, monthly and yearly charges show up "
+                    "here once they have repeated a few times.")
+    else:
+        st.info("Add transactions to discover recurring charges in your history.")
 
 # TAB 7: CATEGORIES
 with tab7:
@@ -1300,11 +2410,12 @@ with tab7:
                                 st.error(f"Category '{new_name}' already exists!")
                             else:
                                 # Update category name in all transactions
+                                ensure_loaded()
                                 df = get_transactions_df()
                                 if not df.empty:
                                     for i, trans in enumerate(st.session_state.transactions):
                                         if trans['category'] == cat:
-                                            st.session_state.transactions[i]['category'] = new_name
+                                            update_transaction(i, category=new_name)
                                 
                                 # Update category name in budgets
                                 for month_key in st.session_state.budgets:
@@ -1316,11 +2427,16 @@ with tab7:
                                     if rec['category'] == cat:
                                         st.session_state.recurring[i]['category'] = new_name
                                 
+                                # Update the categorize rules that set it
+                                rename_rule_category(st.session_state.rules, "Expense", cat, new_name)
+                                
                                 # Update in categories list
                                 st.session_state.categories['expense'].remove(cat)
                                 st.session_state.categories['expense'].append(new_name)
                                 st.session_state.categories['expense'].sort()
                                 
+                                retrain_categorizer()
+                                
                                 st.session_state[edit_key] = False
                                 save_data()
                                 st.success(f"Renamed '{cat}' to '{new_name}'")
@@ -1346,6 +2462,7 @@ with tab7:
                 with col_c:
                     if st.button("🗑️", key=f"del_exp_{idx}_{cat}", help="Delete category"):
                         # Check if category is in use
+                        ensure_loaded()
                         df = get_transactions_df()
                         if not df.empty:
                             in_use = len(df[df['category'] == cat]) > 0
@@ -1424,22 +2541,28 @@ with tab7:
                                 st.error(f"Category '{new_name}' already exists!")
                             else:
                                 # Update category name in all transactions
+                                ensure_loaded()
                                 df = get_transactions_df()
                                 if not df.empty:
                                     for i, trans in enumerate(st.session_state.transactions):
                                         if trans['category'] == cat:
-                                            st.session_state.transactions[i]['category'] = new_name
+                                            update_transaction(i, category=new_name)
                                 
                                 # Update category name in recurring transactions
                                 for i, rec in enumerate(st.session_state.recurring):
                                     if rec['category'] == cat:
                                         st.session_state.recurring[i]['category'] = new_name
                                 
+                                # Update the categorize rules that set it
+                                rename_rule_category(st.session_state.rules, "Income", cat, new_name)
+                                
                                 # Update in categories list
                                 st.session_state.categories['income'].remove(cat)
                                 st.session_state.categories['income'].append(new_name)
                                 st.session_state.categories['income'].sort()
                                 
+                                retrain_categorizer()
+                                
                                 st.session_state[edit_key] = False
                                 save_data()
                                 st.success(f"Renamed '{cat}' to '{new_name}'")
@@ -1465,6 +2588,7 @@ with tab7:
                 with col_c:
                     if st.button("🗑️", key=f"del_inc_{idx}_{cat}", help="Delete category"):
                         # Check if category is in use
+                        ensure_loaded()
                         df = get_transactions_df()
                         if not df.empty:
                             in_use = len(df[df['category'] == cat]) > 0
@@ -1490,15 +2614,14 @@ with tab7:
     # Category statistics
     st.subheader("📊 Category Usage Statistics")
     
-    df = get_transactions_df()
-    if not df.empty:
+    if has_transactions():
         col1, col2 = st.columns(2)
         
         with col1:
             st.write("**Most Used Expense Categories:**")
-            expense_df = df[df['type'] == 'Expense']
-            if not expense_df.empty:
-                usage = expense_df['category'].value_counts().head(5)
+            expense_usage = get_category_counts('Expense')
+            if not expense_usage.empty:
+                usage = expense_usage.head(5)
                 for cat, count in usage.items():
                     st.write(f"• {cat}: {count} transactions")
             else:
@@ -1506,42 +2629,213 @@ with tab7:
         
         with col2:
             st.write("**Most Used Income Categories:**")
-            income_df = df[df['type'] == 'Income']
-            if not income_df.empty:
-                usage = income_df['category'].value_counts().head(5)
+            income_usage = get_category_counts('Income')
+            if not income_usage.empty:
+                usage = income_usage.head(5)
                 for cat, count in usage.items():
                     st.write(f"• {cat}: {count} transactions")
             else:
                 st.caption("No income transactions yet")
     else:
         st.info("Add some transactions to see category usage statistics!")
+    
+    st.divider()
+    
+    # Bulk auto-categorization
+    st.subheader("🤖 Auto-Categorization")
+    st.caption("Suggestions come from a model trained on your own descriptions and tags. It learns from every transaction you add or edit.")
+    
+    if has_transactions():
+        col1, col2, col3 = st.columns([2, 2, 1])
+        with col1:
+            bulk_scope = st.selectbox("Suggest categories for", ["Other / unknown categories", "All transactions"],
+                                      key="bulk_cat_scope")
+            show_suggestions = st.toggle("🔍 Scan the whole ledger", key="bulk_cat_scan")
+        with col2:
+            min_confidence = st.slider("Minimum confidence", min_value=0.5, max_value=1.0, value=0.8, step=0.05,
+                                       key="bulk_cat_confidence")
+        with col3:
+            st.write("")
+            if st.button("🔄 Retrain", use_container_width=True, help="Rebuild the model from the whole ledger"):
+                retrain_categorizer()
+                st.success("Auto-categorizer retrained!")
+        
+        if show_suggestions:
+            ensure_loaded()
+        known_categories = {
+            'Expense': set(st.session_state.categories['expense']),
+            'Income': set(st.session_state.categories['income']),
+            'Transfer': {TRANSFER_CATEGORY}
+        }
+        if not show_suggestions:
+            candidates = []
+        elif bulk_scope == "All transactions":
+            candidates = list(range(len(st.session_state.transactions)))
+        else:
+            candidates = [
+                i for i, t in enumerate(st.session_state.transactions)
+                if t['category'] in FALLBACK_CATEGORIES.values() or t['category'] not in known_categories.get(t['type'], set())
+            ]
+        
+        predictions = suggest_categories([st.session_state.transactions[i] for i in candidates])
+        suggestions = [
+            (i, category, confidence)
+            for i, (category, confidence) in zip(candidates, predictions)
+            if category and category != st.session_state.transactions[i]['category'] and confidence >= min_confidence
+        ]
+        
+        if suggestions:
+            suggestion_df = pd.DataFrame([{
+                'Date': st.session_state.transactions[i]['date'],
+                'Description': st.session_state.transactions[i].get('description', ''),
+                'Amount': f"{currency_symbol(st.session_state.transactions[i].get(CURRENCY_FIELD) or BASE_CURRENCY)}"
+                          f"{st.session_state.transactions[i]['amount']:,.2f}",
+                'Current': st.session_state.transactions[i]['category'],
+                'Suggested': category,
+                'Confidence': confidence * 100
+            } for i, category, confidence in suggestions])
+            st.dataframe(suggestion_df.style.format({'Confidence': '{:.0f}%'}),
+                        use_container_width=True, hide_index=True)
+            
+            if st.button(f"✅ Apply {len(suggestions)} Suggestions", type="primary"):
+                changed = [st.session_state.transactions[i] for i, _, _ in suggestions]
+                learn_transactions(changed, weight=-1)
+                for i, category, _ in suggestions:
+                    update_transaction(i, category=category)
+                learn_transactions(changed)
+                save_data()
+                st.success(f"Recategorized {len(suggestions)} transactions!")
+                st.rerun()
+        elif show_suggestions:
+            st.info(f"No suggestions for {bulk_scope.lower()} at {min_confidence:.0%} confidence")
+        else:
+            st.caption("Turn on the scan to get category suggestions across all years.")
+    else:
+        st.info("Add some transactions to train the auto-categorizer!")
+    
+    st.divider()
+    
+    # Categorize/tag rules
+    st.subheader("📐 Rules")
+    st.caption("Rules run on every transaction you add and every recurring entry. Rules are checked in order: "
+               "the first matching rule with a category sets it, and every matching rule adds its tags.")
+    
+    col1, col2 = st.columns([2, 3])
+    with col1:
+        with st.form("rule_form", clear_on_submit=True):
+            rule_name = st.text_input("Rule name", placeholder="Rideshare")
+            rule_contains = st.text_input("Description contains", placeholder="UBER")
+            rule_when = st.text_input("And matches (optional query)", placeholder="amount>1000 and category:salary",
+                                      help="Same syntax as the Transactions query box")
+            rule_category = st.selectbox("Set category", ["(keep)"] + st.session_state.categories['expense']
+                                         + st.session_state.categories['income'])
+            rule_tags = st.text_input("Add tags (comma-separated)", placeholder="rideshare")
+            
+            if st.form_submit_button("➕ Add Rule", type="primary", use_container_width=True):
+                category = None if rule_category == "(keep)" else rule_category
+                try:
+                    rule = validate_rule({
+                        'name': rule_name,
+                        'contains': rule_contains,
+                        'when': rule_when,
+                        'type': None if category is None else
+                                "Expense" if category in st.session_state.categories['expense'] else "Income",
+                        'category': category,
+                        'tags': rule_tags.split(',')
+                    })
+                except RuleError as e:
+                    st.error(f"❌ {e}")
+                else:
+                    st.session_state.rules.append(rule)
+                    save_data()
+                    st.success(f"✅ Added rule '{rule['name']}'")
+                    st.rerun()
+    
+    with col2:
+        if st.session_state.rules:
+            rules_grid = pd.DataFrame([{
+                'On': rule['enabled'],
+                'Name': rule['name'],
+                'Contains': rule['contains'],
+                'Condition': rule['when'],
+                'Category': rule['category'] or "",
+                'Tags': ", ".join(rule['tags']),
+                'Delete': False
+            } for rule in st.session_state.rules])
+            with st.form("rules_grid_form"):
+                edited_rules = st.data_editor(
+                    rules_grid, hide_index=True, use_container_width=True,
+                    disabled=['Name', 'Contains', 'Condition', 'Category', 'Tags'],
+                    column_config={
+                        'On': st.column_config.CheckboxColumn(help="Disabled rules are skipped"),
+                        'Delete': st.column_config.CheckboxColumn("🗑️", help="Delete on save")
+                    },
+                    key=f"rules_grid_{len(st.session_state.rules)}_{hash(json.dumps(st.session_state.rules))}"
+                )
+                if st.form_submit_button("💾 Save Rules", use_container_width=True):
+                    toggled, removed = diff_grid_edits(rules_grid, edited_rules, ['On'])
+                    for idx, changes in toggled.items():
+                        st.session_state.rules[idx]['enabled'] = bool(changes['On'])
+                    st.session_state.rules = [r for i, r in enumerate(st.session_state.rules) if i not in set(removed)]
+                    save_data()
+                    st.rerun()
+            
+            # Batch mode: run the rules over the whole ledger
+            if has_transactions() and st.toggle("🔍 Preview rules on the whole ledger", key="rules_scan"):
+                ensure_loaded()
+                rule_matches = rule_changes(get_rule_matcher(), st.session_state.transactions,
+                                            df=get_transactions_df())
+                if rule_matches:
+                    preview = pd.DataFrame([{
+                        'Date': st.session_state.transactions[i]['date'],
+                        'Description': st.session_state.transactions[i].get('description', ''),
+                        'Category': f"{st.session_state.transactions[i]['category']} → {changes['category']}"
+                                    if 'category' in changes else st.session_state.transactions[i]['category'],
+                        'Tags': ", ".join(changes.get('tags', st.session_state.transactions[i].get('tags') or []))
+                    } for i, changes in list(rule_matches.items())[:GRID_PAGE_SIZE]])
+                    st.dataframe(preview, use_container_width=True, hide_index=True)
+                    if len(rule_matches) > GRID_PAGE_SIZE:
+                        st.caption(f"Showing {GRID_PAGE_SIZE} of {len(rule_matches):,} changes")
+                    if st.button(f"✅ Apply Rules to {len(rule_matches):,} Transactions", type="primary"):
+                        apply_transaction_changes(rule_matches, [])
+                        st.success(f"Updated {len(rule_matches):,} transactions!")
+                        st.rerun()
+                else:
+                    st.info("The rules don't change any existing transaction")
+        else:
+            st.info("No rules yet. Add one to categorize and tag matching transactions automatically!")
 
 # TAB 8: INSIGHTS
 with tab8:
     st.header("📱 Financial Insights & Tips")
     
-    df = get_transactions_df()
+    # Trends, anomalies and the forecast learn from the last three years
+    ensure_loaded(datetime.now().date() - timedelta(days=3 * 366), None)
+    df = get_reporting_df()
     
     if not df.empty:
         # Current month data
         start_date, end_date = get_current_month_range()
-        current_month_df = filter_by_date_range(df, start_date, end_date)
         
         # Previous month data
         prev_month_end = start_date - timedelta(days=1)
         prev_month_start = prev_month_end.replace(day=1)
-        prev_month_df = filter_by_date_range(df, prev_month_start, prev_month_end)
         
         st.subheader("💡 Monthly Insights")
         
-        # Calculate changes
-        current_expenses = calculate_summary(current_month_df, 'Expense')
-        prev_expenses = calculate_summary(prev_month_df, 'Expense')
+        # Calculate changes (two prefix-sum lookups per month)
+        prefix_sums = get_prefix_sums(df, get_ledger_version())
+        current_summary = range_summary(prefix_sums, start_date, end_date)
+        prev_summary = range_summary(prefix_sums, prev_month_start, prev_month_end)
+        current_totals = range_category_totals(prefix_sums, start_date, end_date)
+        current_category_totals = current_totals.groupby(level='category').sum()
+        current_expenses = current_summary['expenses']
+        prev_expenses = prev_summary['expenses']
         expense_change = current_expenses - prev_expenses
         expense_change_pct = (expense_change / prev_expenses * 100) if prev_expenses > 0 else 0
         
-        current_income = calculate_summary(current_month_df, 'Income')
-        prev_income = calculate_summary(prev_month_df, 'Income')
+        current_income = current_summary['income']
+        prev_income = prev_summary['income']
         
         # Insights
         col1, col2 = st.columns(2)
@@ -1553,10 +2847,11 @@ with tab8:
                 st.success(f"🎉 Great job! Your expenses decreased by {abs(expense_change_pct):.1f}% compared to last month!")
             
             # Top spending category
-            if not current_month_df[current_month_df['type'] == 'Expense'].empty:
-                top_category = current_month_df[current_month_df['type'] == 'Expense'].groupby('category')['amount'].sum().idxmax()
-                top_amount = current_month_df[current_month_df['type'] == 'Expense'].groupby('category')['amount'].sum().max()
-                st.info(f"🏆 Your highest spending category this month is **{top_category}** at ${top_amount:,.2f}")
+            current_expense_totals = current_totals[current_totals.index.get_level_values('type') == 'Expense']
+            if (current_expense_totals != 0).any():
+                top_category = current_expense_totals.idxmax()[1]
+                top_amount = current_expense_totals.max()
+                st.info(f"🏆 Your highest spending category this month is **{top_category}** at {CUR}{top_amount:,.2f}")
         
         with col2:
             # Savings rate
@@ -1594,6 +2889,96 @@ with tab8:
             else:
                 st.info("➡️ Your spending has been relatively stable")
         
+        # Unusual spending
+        st.subheader("🚨 Unusual Spending")
+        
+        anomalies = get_anomaly_report(df, get_ledger_version(), datetime.now().date())
+        recent_df = filter_by_date_range(df, datetime.now().date() - timedelta(days=90), datetime.now().date())
+        outliers = transaction_outliers(recent_df, anomalies['stats'])
+        
+        if anomalies['monthly'].empty and anomalies['daily'].empty and outliers.empty:
+            st.success("✅ No unusual spending detected recently")
+        else:
+            anomaly_format = {'amount': MONEY, 'expected': MONEY, 'score': '{:.1f}'}
+            
+            if not anomalies['monthly'].empty:
+                st.write("**Months well above your usual category spending (last 6 months):**")
+                monthly_anomalies = anomalies['monthly'].assign(period=anomalies['monthly']['period'].astype(str))
+                st.dataframe(monthly_anomalies.style.format(anomaly_format),
+                            use_container_width=True, hide_index=True)
+            
+            if not anomalies['daily'].empty:
+                st.write("**Spending spikes (last 30 days):**")
+                daily_anomalies = anomalies['daily'].assign(period=anomalies['daily']['period'].astype(str))
+                st.dataframe(daily_anomalies.style.format(anomaly_format),
+                            use_container_width=True, hide_index=True)
+            
+            if not outliers.empty:
+                st.write("**Unusually large transactions (last 90 days):**")
+                outlier_rows = outliers[['date', 'category', 'description', 'amount', 'expected', 'score']].copy()
+                outlier_rows['date'] = outlier_rows['date'].dt.strftime('%Y-%m-%d')
+                st.dataframe(outlier_rows.style.format(anomaly_format),
+                            use_container_width=True, hide_index=True)
+            
+            st.caption("Score = how many robust standard deviations above the category's usual level")
+        
+        st.divider()
+        
+        # Cash flow forecast
+        st.subheader("🔮 Cash Flow Forecast")
+        st.caption("Projects your recurring transactions forward and adds a seasonal baseline for everything else, learned from your history.")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            forecast_months = st.slider("Months ahead", min_value=1, max_value=24, value=6, key="forecast_months")
+        with col2:
+            ledger_totals = get_monthly_totals().sum()
+            balance_to_date = ledger_totals['Income'] - ledger_totals['Expense']
+            starting_balance = st.number_input(f"Starting balance ({CUR.strip()})", value=float(round(balance_to_date, 2)),
+                                               step=100.0, format="%.2f", key="forecast_balance")
+        
+        forecast = get_cash_flow_forecast(df, get_ledger_version(), st.session_state.recurring,
+                                          forecast_months, datetime.now().date() + timedelta(days=1),
+                                          starting_balance)
+        monthly_forecast = forecast_by_month(forecast)
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Projected Income", f"{CUR}{forecast['income'].sum():,.2f}")
+        with col2:
+            st.metric("Projected Expenses", f"{CUR}{forecast['expenses'].sum():,.2f}")
+        with col3:
+            projected_net = forecast['net'].sum()
+            st.metric("Projected Net", f"{CUR}{projected_net:,.2f}",
+                     delta=f"{CUR}{projected_net:,.2f}", delta_color="normal")
+        with col4:
+            st.metric("Ending Balance", f"{CUR}{forecast['balance'].iloc[-1]:,.2f}")
+        
+        lowest = forecast.loc[forecast['balance'].idxmin()]
+        if lowest['balance'] < 0:
+            st.error(f"🚨 Your projected balance drops below zero on {lowest['date'].strftime('%Y-%m-%d')} ({CUR}{lowest['balance']:,.2f})")
+        
+        fig = go.Figure()
+        fig.add_trace(go.Bar(name='Income', x=monthly_forecast['month'], y=monthly_forecast['income'], marker_color='green'))
+        fig.add_trace(go.Bar(name='Expenses', x=monthly_forecast['month'], y=monthly_forecast['expenses'], marker_color='red'))
+        fig.add_trace(go.Scatter(name='Balance', x=monthly_forecast['month'], y=monthly_forecast['balance'],
+                                mode='lines+markers', marker_color='blue', yaxis='y2'))
+        fig.update_layout(
+            title='Projected Cash Flow',
+            xaxis_title='Month',
+            yaxis_title=f'Amount ({CUR.strip()})',
+            yaxis2=dict(title=f'Balance ({CUR.strip()})', overlaying='y', side='right'),
+            barmode='group'
+        )
+        st.plotly_chart(fig, use_container_width=True)
+        
+        st.dataframe(monthly_forecast.style.format({
+            'income': MONEY,
+            'expenses': MONEY,
+            'net': MONEY,
+            'balance': MONEY
+        }), use_container_width=True, hide_index=True)
+        
         # Recommendations
         st.subheader("💭 Personalized Recommendations")
         
@@ -1605,7 +2990,7 @@ with tab8:
             over_budget_categories = []
             for category, budget in st.session_state.budgets[current_month_key].items():
                 if budget > 0:
-                    actual = current_month_df[current_month_df['category'] == category]['amount'].sum()
+                    actual = current_category_totals.get(category, 0.0)
                     if actual > budget:
                         over_budget_categories.append((category, actual, budget))
             
@@ -1615,7 +3000,7 @@ with tab8:
         # Goal recommendations
         if st.session_state.goals:
             urgent_goals = []
-            for goal in st.session_state.goals:
+            for goal in get_goals_progress():
                 deadline = datetime.fromisoformat(goal['deadline']).date()
                 days_left = (deadline - datetime.now().date()).days
                 remaining = goal['target'] - goal['current']
@@ -1633,7 +3018,7 @@ with tab8:
             
             if current_savings < recommended_savings:
                 diff = recommended_savings - current_savings
-                recommendations.append(f"💰 Try to save an additional ${diff:,.2f} this month to reach the recommended 20% savings rate")
+                recommendations.append(f"💰 Try to save an additional {CUR}{diff:,.2f} this month to reach the recommended 20% savings rate")
         
         # Display recommendations
         if recommendations:
@@ -1659,7 +3044,7 @@ with tab8:
         # Savings rate (25 points)
         if current_income > 0:
             savings_rate = (current_income - current_expenses) / current_income
-            score += min(25, int(savings_rate * 125))  # Max at 20% savings rate
+            score += max(0, min(25, int(savings_rate * 125)))  # Max at 20% savings rate
         
         # Budget adherence (25 points)
         if current_month_key in st.session_state.budgets:
@@ -1670,7 +3055,7 @@ with tab8:
                 within_budget = 0
                 for category, budget in st.session_state.budgets[current_month_key].items():
                     if budget > 0:
-                        actual = current_month_df[current_month_df['category'] == category]['amount'].sum()
+                        actual = current_category_totals.get(category, 0.0)
                         if actual <= budget:
                             within_budget += 1
                 
@@ -1679,7 +3064,7 @@ with tab8:
         # Goal progress (20 points)
         if st.session_state.goals:
             total_progress = 0
-            for goal in st.session_state.goals:
+            for goal in get_goals_progress():
                 progress = min(goal['current'] / goal['target'], 1.0)
                 total_progress += progress
             
@@ -1708,3 +3093,16 @@ with tab8:
 # Footer
 st.divider()
 st.caption("💰 Ultimate Budget Tracker - Your complete personal finance solution | Data saved locally")
+
+# Startup report (developer instrumentation: only with ?debug=1 in the URL)
+run_timer.mark('full render')
+if st.query_params.get('debug') == '1':
+    with st.sidebar.expander("⏱️ Startup Report"):
+        timing_rows = [{'Phase': phase, 'Seconds': seconds} for phase, seconds in run_timer.marks]
+        timing_rows += [{'Phase': f"import {name} (deferred)", 'Seconds': seconds}
+                        for name, seconds in deferred_import_times.items()]
+        st.dataframe(pd.DataFrame(timing_rows), hide_index=True, use_container_width=True,
+                     column_config={'Seconds': st.column_config.NumberColumn(format="%.3f")})
+        for phase, seconds, budget in run_timer.over_budget():
+            st.warning(f"{phase.capitalize()} took {seconds:.2f}s (budget {budget:.2f}s)")
+        st.caption("Run `python budget_startup.py` for a cold-import report")
@@ -0,0 +1,154 @@
+"""Multinomial naive Bayes auto-categorizer trained on the ledger's description/tags -> category mapping"""
+import json
+import math
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+SMOOTHING = 1.0
+
+# Catch-all category per type for rows the model can't place
+FALLBACK_CATEGORIES = {'Expense': "💡 Other Expenses", 'Income': "📊 Other Income"}
+
+
+def empty_model():
+    """A categorizer with no training data"""
+    return {'revision': 0, 'class_counts': {}, 'token_counts': {}, 'types': {}}
+
+
+def tokenize(transaction):
+    """Word tokens from the description and tags, tag markers and a coarse amount bucket"""
+    text = f"{transaction.get('description') or ''} {' '.join(transaction.get('tags') or [])}".lower()
+    tokens = [t for t in TOKEN_PATTERN.findall(text) if len(t) > 1 and not t.isdigit()]
+    tokens.extend(f"tag:{tag.strip().lower()}" for tag in transaction.get('tags') or [] if tag.strip())
+    amount = float(transaction.get('amount') or 0)
+    if amount > 0:
+        tokens.append(f"amt:{int(math.log2(amount))}")
+    return tokens
+
+
+def update_categorizer(model, transaction, weight=1):
+    """Add (weight=1) or remove (weight=-1) one transaction's evidence in place"""
+    category = transaction.get('category')
+    if not category:
+        return model
+    class_counts = model['class_counts']
+    class_counts[category] = class_counts.get(category, 0) + weight
+    token_counts = model['token_counts'].setdefault(category, {})
+    for token in tokenize(transaction):
+        count = token_counts.get(token, 0) + weight
+        if count > 0:
+            token_counts[token] = count
+        else:
+            token_counts.pop(token, None)
+    if class_counts[category] <= 0:
+        class_counts.pop(category)
+        model['token_counts'].pop(category, None)
+    elif transaction.get('type'):
+        model['types'][category] = transaction['type']
+    model['revision'] += 1
+    return model
+
+
+def train_categorizer(transactions):
+    """Fit a model from scratch on a list of transactions"""
+    model = empty_model()
+    for transaction in transactions:
+        update_categorizer(model, transaction)
+    return model
+
+
+def save_categorizer(model, path):
+    """Persist the model counts as JSON, swapped in whole so other sessions never read a partial file"""
+    tmp = Path(path).with_name(Path(path).name + ".tmp")
+    with open(tmp, 'w') as f:
+        json.dump(model, f)
+    os.replace(tmp, path)
+
+
+def load_categorizer(path):
+    """Load a persisted model, or None if the file is missing or unreadable"""
+    try:
+        with open(path, 'r') as f:
+            model = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(model, dict) or not {'revision', 'class_counts', 'token_counts', 'types'} <= model.keys():
+        return None
+    return model
+
+
+def compile_categorizer(model):
+    """Dense log-probability arrays for vectorized inference"""
+    categories = sorted(model['class_counts'])
+    vocab = {}
+    for category in categories:
+        for token in model['token_counts'].get(category, {}):
+            vocab.setdefault(token, len(vocab))
+
+    counts = np.zeros((len(categories), len(vocab)))
+    for row, category in enumerate(categories):
+        tokens = model['token_counts'].get(category, {})
+        if tokens:
+            counts[row, [vocab[t] for t in tokens]] = list(tokens.values())
+
+    totals = counts.sum(axis=1, keepdims=True) + SMOOTHING * max(len(vocab), 1)
+    class_totals = np.array([model['class_counts'][c] for c in categories], dtype=float)
+    return {
+        'revision': model['revision'],
+        'categories': categories,
+        'types': np.array([model['types'].get(c, '') for c in categories]),
+        'vocab': vocab,
+        'log_likelihood': np.log(counts + SMOOTHING) - np.log(totals),
+        'log_prior': np.log(class_totals / class_totals.sum()) if len(categories) else class_totals
+    }
+
+
+def predict_categories(compiled, transactions, allowed_categories=None):
+    """Most likely category and its probability for each transaction
+
+    Token log-likelihoods are gathered for the whole batch at once and summed per row
+    with bincount, so inference cost is linear in the total number of tokens. Only
+    categories of the transaction's own type (and in `allowed_categories`, if given)
+    are considered. Rows with no usable category get (None, 0.0).
+    """
+    n = len(transactions)
+    categories = compiled['categories']
+    if not n or not categories:
+        return [(None, 0.0)] * n
+
+    vocab = compiled['vocab']
+    row_ids, token_ids = [], []
+    for row, transaction in enumerate(transactions):
+        ids = [vocab[t] for t in tokenize(transaction) if t in vocab]
+        token_ids.extend(ids)
+        row_ids.extend([row] * len(ids))
+    row_ids = np.asarray(row_ids, dtype=np.intp)
+    token_ids = np.asarray(token_ids, dtype=np.intp)
+
+    scores = np.tile(compiled['log_prior'], (n, 1))
+    if token_ids.size:
+        gathered = compiled['log_likelihood'][:, token_ids]
+        for col in range(len(categories)):
+            scores[:, col] += np.bincount(row_ids, weights=gathered[col], minlength=n)
+
+    # Restrict each row to categories of its own type
+    row_types = np.array([t.get('type', '') for t in transactions])
+    allowed = compiled['types'][None, :] == row_types[:, None]
+    if allowed_categories is not None:
+        allowed &= np.isin(categories, list(allowed_categories))[None, :]
+    scores = np.where(allowed, scores, -np.inf)
+
+    best = scores.argmax(axis=1)
+    top = scores[np.arange(n), best]
+    with np.errstate(invalid='ignore', over='ignore'):
+        probability = 1.0 / np.exp(scores - top[:, None]).sum(axis=1)
+    has_choice = np.isfinite(top)
+    return [
+        (categories[b], float(p)) if ok else (None, 0.0)
+        for b, p, ok in zip(best, probability, has_choice)
+    ]
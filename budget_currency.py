@@ -0,0 +1,192 @@
+"""Multi-currency amounts: a dated exchange-rate table and conversion into a reporting currency
+
+Transactions keep the amount in the currency they happened in (`currency`, absent for the
+base currency). The rate table (exchange_rates.csv in the data directory, columns
+date,currency,rate) gives the value of one unit of a currency in the base currency from
+that date on. Conversion is a vectorized as-of join of the transactions against the table:
+each row takes the latest rate on or before its date (the earliest one for rows older
+than the table).
+"""
+import json
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE_CURRENCY = 'USD'
+CURRENCY_FIELD = 'currency'
+RATES_FILE_NAME = "exchange_rates.csv"
+SETTINGS_FILE_NAME = "settings.json"
+
+CURRENCY_SYMBOLS = {'USD': '$', 'EUR': '€', 'GBP': '£', 'JPY': '¥', 'CAD': 'C$', 'AUD': 'A$', 'CHF': 'CHF ',
+                    'CNY': '¥', 'INR': '₹', 'MXN': 'MX$', 'BRL': 'R$', 'SEK': 'kr ', 'NZD': 'NZ$'}
+
+_CODE = re.compile(r'^[A-Z]{3}$')
+
+
+class CurrencyError(ValueError):
+    """A malformed exchange-rate table or currency code"""
+
+
+def is_currency_code(code):
+    """Whether `code` looks like an ISO 4217 code (three capital letters)"""
+    return isinstance(code, str) and bool(_CODE.match(code))
+
+
+def currency_symbol(code):
+    """Prefix amounts of a currency are shown with"""
+    return CURRENCY_SYMBOLS.get(code, f"{code} ")
+
+
+def empty_rates():
+    return pd.DataFrame({'date': pd.Series(dtype='datetime64[ns]'), 'currency': pd.Series(dtype=object),
+                         'rate': pd.Series(dtype=float)})
+
+
+def parse_rates(source):
+    """Rate table from a CSV path or file-like object, sorted by date for as-of joins
+
+    Raises CurrencyError naming the first bad rows.
+    """
+    try:
+        table = pd.read_csv(source, dtype={'currency': str})
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+        raise CurrencyError(f"Can't read the exchange-rate table: {e}") from None
+    table.columns = [str(c).strip().lower() for c in table.columns]
+    missing = {'date', 'currency', 'rate'} - set(table.columns)
+    if missing:
+        raise CurrencyError(f"The exchange-rate table needs the columns date, currency and rate "
+                            f"(missing: {', '.join(sorted(missing))})")
+    rates = pd.DataFrame({
+        'date': pd.to_datetime(table['date'], errors='coerce', format='%Y-%m-%d'),
+        'currency': table['currency'].astype(str).str.strip().str.upper(),
+        'rate': pd.to_numeric(table['rate'], errors='coerce')
+    })
+    bad = rates['date'].isna() | ~rates['currency'].str.fullmatch(r'[A-Z]{3}') | ~(rates['rate'] > 0)
+    if bad.any():
+        rows = ", ".join(str(i + 2) for i in np.flatnonzero(bad.values)[:5])
+        raise CurrencyError(f"{int(bad.sum())} malformed exchange-rate row(s) (line {rows}): dates must be "
+                            f"YYYY-MM-DD, currencies three-letter codes and rates positive numbers")
+    rates = rates[rates['currency'] != BASE_CURRENCY].astype({'date': 'datetime64[ns]'})
+    return rates.sort_values(['date', 'currency'], kind='stable').reset_index(drop=True)
+
+
+def read_rates(path):
+    """Rate table of a data directory's exchange_rates.csv (empty if there is none)"""
+    return parse_rates(path) if Path(path).exists() else empty_rates()
+
+
+def read_reporting_currency(data_dir):
+    """Reporting currency saved in a data directory's settings.json"""
+    path = Path(data_dir) / SETTINGS_FILE_NAME
+    if not path.exists():
+        return BASE_CURRENCY
+    with open(path, 'r') as f:
+        return json.load(f).get('reporting_currency', BASE_CURRENCY)
+
+
+def rates_at(rates, dates, currencies):
+    """Base-currency value of one unit of each row's currency on its date (NaN for a currency without rates)"""
+    currencies = np.asarray(currencies, dtype=object)
+    result = np.ones(len(currencies))
+    foreign = currencies != BASE_CURRENCY
+    if not foreign.any():
+        return result
+    result[foreign] = np.nan
+    if rates.empty:
+        return result
+    rates = rates.astype({'date': 'datetime64[ns]'})
+    rows = pd.DataFrame({
+        'date': np.asarray(dates, dtype='datetime64[ns]')[foreign],
+        'currency': currencies[foreign],
+        'row': np.flatnonzero(foreign)
+    }).sort_values('date', kind='stable')
+    joined = pd.merge_asof(rows, rates, on='date', by='currency', direction='backward')
+    older = joined['rate'].isna().values
+    if older.any():
+        # Rows dated before a currency's first rate take that first rate
+        joined.loc[older, 'rate'] = pd.merge_asof(rows[older], rates, on='date', by='currency',
+                                                  direction='forward')['rate'].values
+    result[joined['row'].values] = joined['rate'].values
+    return result
+
+
+def convert_amounts(dates, currencies, amounts, rates, target):
+    """(amounts in `target`, sorted currencies that had no rate and were left unconverted)"""
+    currencies = np.asarray(currencies, dtype=object)
+    factor = rates_at(rates, dates, currencies)
+    if target != BASE_CURRENCY:
+        factor = factor / rates_at(rates, dates, np.full(len(currencies), target, dtype=object))
+    unconverted = np.isnan(factor)
+    missing = []
+    if unconverted.any():
+        missing = sorted((set(currencies) | {target}) - set(rates['currency']) - {BASE_CURRENCY})
+    return np.asarray(amounts, dtype=float) * np.where(unconverted, 1.0, factor), missing
+
+
+def convert_balances(balances, currencies, on, rates, target):
+    """`convert_amounts` of {account: balance} on date `on`; `currencies` maps accounts to their currency
+
+    Accounts missing from `currencies` are in the base currency.
+    """
+    names = list(balances)
+    codes = np.array([currencies.get(name, BASE_CURRENCY) for name in names], dtype=object)
+    dates = np.full(len(names), np.datetime64(on, 'ns'))
+    return convert_amounts(dates, codes, [balances[name] for name in names], rates, target)
+
+
+def convert_frame(df, rates, target):
+    """`convert_amounts` of a transactions frame (rows without a currency are in the base currency)"""
+    currencies = df[CURRENCY_FIELD].fillna(BASE_CURRENCY).values if CURRENCY_FIELD in df else \
+        np.full(len(df), BASE_CURRENCY, dtype=object)
+    return convert_amounts(df['date'].values, currencies, df['amount'].values, rates, target)
+
+
+def needs_conversion(df, target):
+    """Whether any amount of a transactions frame changes when reported in `target`"""
+    return target != BASE_CURRENCY or (CURRENCY_FIELD in df and df[CURRENCY_FIELD].notna().any())
+
+
+def foreign_monthly_totals(rows):
+    """{currency: {'YYYY-MM': {'Income': amount, 'Expense': amount}}} of the non-base-currency rows"""
+    totals = {}
+    for t in rows:
+        currency = t.get(CURRENCY_FIELD)
+        if currency and currency != BASE_CURRENCY and t['type'] in ('Income', 'Expense'):
+            month = totals.setdefault(currency, {}).setdefault(t['date'][:7], {'Income': 0.0, 'Expense': 0.0})
+            month[t['type']] = round(month[t['type']] + float(t['amount']), 2)
+    return totals
+
+
+def segment_currencies(segments):
+    """{currency: {month: totals}} merged over manifest segment entries"""
+    merged = {}
+    for info in segments.values():
+        for currency, months in info.get('currencies', {}).items():
+            merged.setdefault(currency, {}).update(months)
+    return merged
+
+
+def convert_monthly(monthly, foreign, rates, target):
+    """Month-indexed Income/Expense frame of stored amounts, converted into `target`
+
+    `foreign` (from foreign_monthly_totals) says how much of each month was in which other
+    currency; the rest is base currency. Months are converted at the rates of their 15th.
+    """
+    if monthly.empty or (not foreign and target == BASE_CURRENCY):
+        return monthly
+    columns = ['Income', 'Expense']
+    parts = pd.DataFrame([{'month': month, 'currency': currency, **values}
+                          for currency, months in foreign.items() for month, values in months.items()],
+                         columns=['month', 'currency'] + columns)
+    parts = parts[parts['month'].isin(monthly.index)]
+    base = monthly[columns].fillna(0.0) - parts.groupby('month')[columns].sum().reindex(monthly.index).fillna(0.0)
+    parts = pd.concat([base.rename_axis('month').reset_index().assign(currency=BASE_CURRENCY), parts],
+                      ignore_index=True)
+    dates = pd.to_datetime(parts['month'] + '-15').values
+    converted, _ = convert_amounts(np.repeat(dates, 2), np.repeat(parts['currency'].values, 2),
+                                   parts[columns].values.ravel(), rates, target)
+    parts[columns] = converted.reshape(-1, 2)
+    result = parts.groupby('month')[columns].sum().reindex(monthly.index)
+    return result.where(monthly[columns].notna())
@@ -0,0 +1,399 @@
+"""Static HTML reports: summary metrics, Dashboard charts, Budget vs Actual and Goals in one file
+
+The chart builders here are shared with the app's tabs, so a report shows the same figures.
+A report keeps every distinct figure's JSON once (keyed by a hash of its content), the Plotly
+theme template once for all figures and plotly.js once, and draws each chart only when it
+scrolls into view, so a 12-month report opens instantly without a running Streamlit server.
+"""
+import hashlib
+import html
+import json
+from datetime import date
+
+import pandas as pd
+
+from budget_analytics import (
+    budget_matrix, budget_vs_actual, month_keys, range_category_totals, range_daily_totals, range_summary,
+    roll_envelopes
+)
+from budget_currency import BASE_CURRENCY, convert_balances, currency_symbol, empty_rates
+from budget_goals import contribution_history
+from budget_startup import LazyModule
+
+px = LazyModule("plotly.express")
+go = LazyModule("plotly.graph_objects")
+plotly_offline = LazyModule("plotly.offline")
+
+PERCENT = '{:.1f}%'
+
+
+# Chart builders (also used by the Dashboard, Budget, Goals and Reports tabs)
+def category_pie(totals, title):
+    """Donut chart of a category -> amount frame"""
+    fig = px.pie(totals, values='amount', names='category', title=title, hole=0.4)
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    return fig
+
+
+def _unit(currency):
+    """Axis-title unit of a currency, e.g. '$'"""
+    return currency_symbol(currency).strip()
+
+
+def daily_trend(daily_income, daily_expenses, currency=BASE_CURRENCY):
+    """Daily income and expense lines"""
+    fig = go.Figure()
+    if not daily_income.empty:
+        fig.add_trace(go.Scatter(x=daily_income['date'], y=daily_income['amount'],
+                                 mode='lines+markers', name='Income',
+                                 line=dict(color='green', width=2)))
+    if not daily_expenses.empty:
+        fig.add_trace(go.Scatter(x=daily_expenses['date'], y=daily_expenses['amount'],
+                                 mode='lines+markers', name='Expenses',
+                                 line=dict(color='red', width=2)))
+    fig.update_layout(title='Daily Income vs Expenses',
+                      xaxis_title='Date',
+                      yaxis_title=f'Amount ({_unit(currency)})',
+                      hovermode='x unified')
+    return fig
+
+
+def top_categories_bar(category_totals, currency=BASE_CURRENCY):
+    """Horizontal bars of the ten largest expense categories"""
+    fig = px.bar(category_totals.head(10), x='amount', y='category', orientation='h',
+                 title='Top 10 Expense Categories',
+                 labels={'amount': f'Total Amount ({_unit(currency)})', 'category': 'Category'})
+    fig.update_layout(yaxis={'categoryorder': 'total ascending'})
+    return fig
+
+
+def net_worth_area(net_worth, currency=BASE_CURRENCY):
+    """Net worth by month"""
+    return px.area(x=net_worth.index, y=net_worth.values, title='Net Worth by Month',
+                   labels={'x': 'Month', 'y': f'Net Worth ({_unit(currency)})'})
+
+
+def balance_lines(balances, currency=BASE_CURRENCY):
+    """One line per account of a month-end x account balance frame (currency None: accounts differ)"""
+    fig = go.Figure()
+    for name in balances.columns:
+        fig.add_trace(go.Scatter(x=balances.index, y=balances[name], mode='lines+markers', name=name))
+    fig.update_layout(title='Account Balances (Month End)', xaxis_title='Month',
+                      yaxis_title=f'Balance ({_unit(currency)})' if currency else 'Balance',
+                      hovermode='x unified')
+    return fig
+
+
+def budget_vs_actual_bar(budget_df, rollover):
+    """Grouped bars of each category's budget (or available amount with rollover) and actual spending"""
+    return px.bar(budget_df, x='Category', y=['Available' if rollover else 'Budget', 'Actual'],
+                  title='Budget vs Actual by Category',
+                  barmode='group')
+
+
+def monthly_overview(summary_df, currency=BASE_CURRENCY):
+    """Income and expense bars with a net savings line, one group per month"""
+    fig = go.Figure()
+    fig.add_trace(go.Bar(name='Income', x=summary_df['month'], y=summary_df['Income'], marker_color='green'))
+    fig.add_trace(go.Bar(name='Expenses', x=summary_df['month'], y=summary_df['Expenses'], marker_color='red'))
+    fig.add_trace(go.Scatter(name='Net Savings', x=summary_df['month'], y=summary_df['Net Savings'],
+                             mode='lines+markers', marker_color='blue', yaxis='y2'))
+    fig.update_layout(
+        title='Monthly Financial Overview',
+        xaxis_title='Month',
+        yaxis_title=f'Amount ({_unit(currency)})',
+        yaxis2=dict(title=f'Net Savings ({_unit(currency)})', overlaying='y', side='right'),
+        barmode='group'
+    )
+    return fig
+
+
+def contribution_chart(history, starting, currency=BASE_CURRENCY):
+    """Monthly contributions of a goal, the amount saved so far and the average contribution"""
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=history['month'], y=history['amount'],
+                         name='Monthly', marker_color='#1f77b4'))
+    fig.add_trace(go.Scatter(x=history['month'], y=history['cumulative'] + starting,
+                             name='Saved', mode='lines+markers',
+                             line=dict(color='#2ca02c'), yaxis='y2'))
+    fig.add_hline(y=history['amount'].mean(), line_dash='dot',
+                  annotation_text=f"Avg {currency_symbol(currency)}{history['amount'].mean():,.2f}/month")
+    fig.update_layout(height=300, margin=dict(t=30, b=10),
+                      yaxis=dict(title='Contributed'),
+                      yaxis2=dict(title='Saved', overlaying='y', side='right'),
+                      legend=dict(orientation='h', y=1.15))
+    return fig
+
+
+def type_totals(totals, transaction_type):
+    """Non-zero category totals of one type from range_category_totals, largest first"""
+    if transaction_type not in totals.index.get_level_values('type'):
+        return pd.DataFrame(columns=['category', 'amount'])
+    selected = totals.xs(transaction_type, level='type')
+    selected = selected[selected != 0].rename('amount').rename_axis('category')
+    return selected.reset_index().sort_values('amount', ascending=False)
+
+
+# Report document
+def _digest(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]
+
+
+def _script_json(text):
+    """JSON that is safe inside a <script> element"""
+    return text.replace('</', '<\\/')
+
+
+class HtmlReport:
+    """Sections of metrics, tables and charts, rendered to one HTML file with each figure stored once"""
+
+    def __init__(self, title, subtitle=''):
+        self.title = title
+        self.subtitle = subtitle
+        self.sections = []
+        self.figures = {}    # content hash -> figure JSON without its template
+        self.templates = {}  # content hash -> template JSON
+        self.chart_count = 0
+
+    def section(self, heading, level=2):
+        self.sections.append({'heading': heading, 'level': level, 'blocks': []})
+
+    def _add(self, block):
+        if not self.sections:
+            self.section(self.title)
+        self.sections[-1]['blocks'].append(block)
+
+    def metrics(self, items):
+        """(label, formatted value) cards"""
+        self._add(('metrics', list(items)))
+
+    def note(self, text):
+        self._add(('note', text))
+
+    def table(self, frame, formats=None):
+        formats = formats or {}
+        shown = frame.copy()
+        for column, fmt in formats.items():
+            shown[column] = shown[column].map(fmt.format)
+        self._add(('table', shown.to_html(index=False, border=0, classes='data', escape=True)))
+
+    def chart(self, fig):
+        """Store the figure (and its theme template) under content hashes; identical charts share one entry"""
+        spec = json.loads(fig.to_json())
+        template = json.dumps(spec['layout'].pop('template', {}), sort_keys=True, separators=(',', ':'))
+        figure = json.dumps(spec, sort_keys=True, separators=(',', ':'))
+        template_key, figure_key = _digest(template), _digest(figure)
+        self.templates.setdefault(template_key, template)
+        self.figures.setdefault(figure_key, figure)
+        self.chart_count += 1
+        self._add(('chart', figure_key, template_key))
+
+    def _section_html(self, index, section):
+        parts = [f"<section id=\"s{index}\"><h{section['level']}>{html.escape(section['heading'])}"
+                 f"</h{section['level']}>"]
+        for block in section['blocks']:
+            kind = block[0]
+            if kind == 'metrics':
+                cards = "".join(f"<div class=\"metric\"><div class=\"label\">{html.escape(label)}</div>"
+                                f"<div class=\"value\">{html.escape(value)}</div></div>" for label, value in block[1])
+                parts.append(f"<div class=\"metrics\">{cards}</div>")
+            elif kind == 'note':
+                parts.append(f"<p class=\"note\">{html.escape(block[1])}</p>")
+            elif kind == 'table':
+                parts.append(block[1])
+            else:
+                parts.append(f"<div class=\"chart\" data-fig=\"{block[1]}\" data-template=\"{block[2]}\"></div>")
+        parts.append("</section>")
+        return "".join(parts)
+
+    def render(self, inline_plotly=True):
+        """The whole report as one HTML document; without inline_plotly, plotly.js comes from its CDN"""
+        if inline_plotly:
+            plotly_js = f"<script>{plotly_offline.get_plotlyjs()}</script>"
+        else:
+            version = plotly_offline.offline.get_plotlyjs_version()
+            plotly_js = f"<script src=\"https://cdn.plot.ly/plotly-{version}.min.js\" charset=\"utf-8\"></script>"
+        store = ('{"figures":{' + ",".join(f'"{k}":{v}' for k, v in self.figures.items()) +
+                 '},"templates":{' + ",".join(f'"{k}":{v}' for k, v in self.templates.items()) + '}}')
+        contents = "".join(f"<li><a href=\"#s{i}\">{html.escape(s['heading'])}</a></li>"
+                           for i, s in enumerate(self.sections) if s['level'] == 2)
+        body = "".join(self._section_html(i, s) for i, s in enumerate(self.sections))
+        return REPORT_PAGE.format(
+            title=html.escape(self.title), subtitle=html.escape(self.subtitle), contents=contents, body=body,
+            plotly_js=plotly_js, store=_script_json(store)
+        )
+
+
+REPORT_PAGE = """<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title}</title>
+<style>
+body {{ font-family: -apple-system, "Segoe UI", Roboto, sans-serif; margin: 0 auto; max-width: 1100px; padding: 24px; color: #262730; }}
+h1 {{ margin-bottom: 4px; }} .subtitle, .note {{ color: #6b6f7b; }}
+nav ul {{ columns: 3; padding-left: 18px; }}
+section {{ border-top: 1px solid #e6e8ee; margin-top: 24px; }}
+.metrics {{ display: flex; flex-wrap: wrap; gap: 12px; }}
+.metric {{ background: #f0f2f6; border-radius: 10px; padding: 14px 18px; min-width: 170px; }}
+.metric .label {{ font-size: 13px; color: #6b6f7b; }} .metric .value {{ font-size: 24px; }}
+.chart {{ height: 420px; margin: 12px 0; }}
+table.data {{ border-collapse: collapse; width: 100%; font-size: 14px; }}
+table.data th, table.data td {{ padding: 4px 10px; border-bottom: 1px solid #e6e8ee; text-align: right; }}
+table.data th:first-child, table.data td:first-child {{ text-align: left; }}
+</style>
+{plotly_js}
+</head><body>
+<h1>{title}</h1><p class="subtitle">{subtitle}</p>
+<nav><ul>{contents}</ul></nav>
+{body}
+<script type="application/json" id="report-data">{store}</script>
+<script>
+const store = JSON.parse(document.getElementById('report-data').textContent);
+function draw(el) {{
+  const fig = store.figures[el.dataset.fig];
+  const layout = Object.assign({{}}, fig.layout, {{template: store.templates[el.dataset.template], autosize: true}});
+  if (layout.height) el.style.height = layout.height + 'px';
+  Plotly.newPlot(el, fig.data, layout, {{responsive: true, displaylogo: false}});
+}}
+const charts = document.querySelectorAll('.chart');
+if ('IntersectionObserver' in window) {{
+  const observer = new IntersectionObserver(entries => {{
+    for (const entry of entries) {{
+      if (entry.isIntersecting) {{ observer.unobserve(entry.target); draw(entry.target); }}
+    }}
+  }}, {{rootMargin: '400px'}});
+  charts.forEach(el => observer.observe(el));
+}} else {{
+  charts.forEach(draw);
+}}
+</script>
+</body></html>
+"""
+
+
+# Period report
+def report_envelopes(budgets, monthly_spend, months, rollover):
+    """Envelopes covering the report months; without rollover each month starts from zero carryover"""
+    budgeted = sorted(m for m, b in budgets.items() if any(v > 0 for v in b.values()))
+    first = min(budgeted[0], months[0]) if budgeted and rollover else months[0]
+    chain = month_keys(first, months[-1])
+    budget = budget_matrix(budgets, chain)
+    actual = monthly_spend.reindex(chain).fillna(0.0)
+    if rollover:
+        return roll_envelopes(budget, actual)
+    parts = [roll_envelopes(budget.loc[[m]], actual.loc[[m]]) for m in chain]
+    return {name: pd.concat([p[name] for p in parts]).fillna(0.0) for name in ('carry', 'available', 'closing')}
+
+
+def _summary_metrics(summary, money):
+    return [
+        ("Total Income", money.format(summary['income'])),
+        ("Total Expenses", money.format(summary['expenses'])),
+        ("Net Savings", money.format(summary['net'])),
+        ("Avg Daily Spend", money.format(summary['avg_daily_spend'])),
+        ("Savings Rate", PERCENT.format(summary['savings_rate']))
+    ]
+
+
+def _month_bounds(month):
+    period = pd.Period(month, freq='M')
+    return period.start_time.date(), period.end_time.date()
+
+
+def _spending_charts(report, prefix, start, end, currency):
+    """Expense and income donuts, daily trend and top categories of a date range"""
+    totals = range_category_totals(prefix, start, end)
+    expenses, income = type_totals(totals, 'Expense'), type_totals(totals, 'Income')
+    if not expenses.empty:
+        report.chart(category_pie(expenses, 'Expenses by Category'))
+    if not income.empty:
+        report.chart(category_pie(income, 'Income by Source'))
+    daily_income = range_daily_totals(prefix, start, end, 'Income')
+    daily_expenses = range_daily_totals(prefix, start, end, 'Expense')
+    if not daily_income.empty or not daily_expenses.empty:
+        report.chart(daily_trend(daily_income, daily_expenses, currency))
+    if not expenses.empty:
+        report.chart(top_categories_bar(expenses, currency))
+
+
+def period_report(months, prefix, envelopes, budgets, rollover, net_worth, balances, goals, contributions,
+                  currency=BASE_CURRENCY, account_currencies=None, rates=None, generated=None):
+    """HtmlReport of consecutive 'YYYY-MM' months: overview, one section per month and the goals
+
+    `prefix` comes from build_prefix_sums over a ledger covering the months, `envelopes` from
+    report_envelopes, `net_worth` is a month-indexed series, `balances` a month-end x account
+    frame and `goals` the output of goal_progress with `contributions` its matrix, all in `currency`
+    except the balances, which are in their accounts' currencies (`account_currencies`, base
+    currency when absent) and are converted with `rates` for the net worth.
+    """
+    generated = generated or date.today()
+    money = f"{currency_symbol(currency)}{{:,.2f}}"
+    first_day, last_day = _month_bounds(months[0])[0], _month_bounds(months[-1])[1]
+    report = HtmlReport(f"💰 Budget Report: {months[0]}" + (f" to {months[-1]}" if len(months) > 1 else ""),
+                        f"{first_day} to {last_day} · generated {generated}")
+
+    # Overview
+    report.section("📊 Overview")
+    report.metrics(_summary_metrics(range_summary(prefix, first_day, last_day), money))
+    if len(months) > 1:
+        rows = []
+        for month in months:
+            summary = range_summary(prefix, *_month_bounds(month))
+            rows.append({'month': month, 'Income': summary['income'], 'Expenses': summary['expenses'],
+                         'Net Savings': summary['net'], 'Savings Rate': summary['savings_rate']})
+        summary_df = pd.DataFrame(rows)
+        report.chart(monthly_overview(summary_df, currency))
+        report.table(summary_df, {'Income': money, 'Expenses': money, 'Net Savings': money,
+                                  'Savings Rate': PERCENT})
+        _spending_charts(report, prefix, first_day, last_day, currency)
+
+    report.section("🏦 Accounts & Net Worth")
+    if not balances.empty:
+        account_currencies = account_currencies or {}
+        closing = balances.iloc[-1].to_dict()
+        converted, _ = convert_balances(closing, account_currencies, last_day,
+                                        empty_rates() if rates is None else rates, currency)
+        codes = {account_currencies.get(name, BASE_CURRENCY) for name in closing}
+        report.metrics([("Net Worth", money.format(converted.sum()))] +
+                       [(name, f"{currency_symbol(account_currencies.get(name, BASE_CURRENCY))}{value:,.2f}")
+                        for name, value in closing.items()])
+        report.chart(balance_lines(balances, codes.pop() if len(codes) == 1 else None))
+    if not net_worth.empty:
+        report.chart(net_worth_area(net_worth, currency))
+
+    # One section per month, newest first
+    for month in reversed(months):
+        start, end = _month_bounds(month)
+        report.section(f"📅 {pd.Period(month, freq='M').strftime('%B %Y')}")
+        report.metrics(_summary_metrics(range_summary(prefix, start, end), money))
+        _spending_charts(report, prefix, start, end, currency)
+
+        report.section("🎯 Budget vs Actual", level=3)
+        budget_df = budget_vs_actual(envelopes, budgets.get(month, {}), month)
+        if budget_df.empty:
+            report.note(f"No budget set for {month}.")
+            continue
+        report.metrics([
+            ("Total Budget", money.format(budget_df['Budget'].sum())),
+            ("Total Spent", money.format(budget_df['Actual'].sum())),
+            ("Remaining", money.format(budget_df['Available'].sum() - budget_df['Actual'].sum()))
+        ])
+        report.chart(budget_vs_actual_bar(budget_df, rollover))
+        report.table(budget_df, {'Budget': money, 'Carryover': money, 'Available': money, 'Actual': money,
+                                 'Remaining': money, 'Percent Used': PERCENT})
+
+    report.section("💎 Goals")
+    if not goals:
+        report.note("No savings goals yet.")
+    else:
+        report.table(pd.DataFrame([{
+            'Goal': g['name'], 'Target': g['target'], 'Saved': g['current'],
+            'Remaining': g['target'] - g['current'],
+            'Progress': g['current'] / g['target'] * 100 if g['target'] > 0 else 0.0,
+            'Deadline': g['deadline']
+        } for g in goals]), {'Target': money, 'Saved': money, 'Remaining': money, 'Progress': PERCENT})
+        for goal in goals:
+            history = contribution_history(contributions, goal['id'])
+            if not history.empty:
+                report.section(f"{goal['name']}: {money.format(goal['contributed'])} contributed", level=3)
+                report.chart(contribution_chart(history, goal.get('starting', 0.0), currency))
+    return report
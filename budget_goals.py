@@ -0,0 +1,80 @@
+"""Savings goal contributions: ledger transfers tied to a goal ID, indexed per year segment
+
+A contribution is a Transfer row with a `goal_id`. Each segment's manifest entry keeps its
+contribution totals per goal and month, so goal progress and contribution history come
+from the manifest without reading the ledger.
+"""
+import hashlib
+import uuid
+
+import pandas as pd
+
+GOAL_FIELD = 'goal_id'
+
+# Account new savings goals are kept in unless another is chosen
+SAVINGS_ACCOUNT = "💰 Savings"
+
+
+def new_goal_id():
+    """Short random ID linking a goal to its contributions"""
+    return uuid.uuid4().hex[:12]
+
+
+def legacy_goal_id(goal):
+    """Stable ID of a goal saved before contribution tracking (from its name and creation time)
+
+    Readers that never save (the JSON API) must derive the same ID on every request.
+    """
+    key = f"{goal.get('name', '')}\x00{goal.get('created', '')}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+
+
+def migrate_goal(goal):
+    """Give a goal saved before contribution tracking an ID; its old `current` becomes `starting`"""
+    if 'id' not in goal:
+        goal['id'] = legacy_goal_id(goal)
+        goal['starting'] = float(goal.pop('current', 0.0))
+    return goal
+
+
+def contribution_totals(rows):
+    """{goal ID: {'YYYY-MM': amount}} of the contributions in a list of transactions"""
+    totals = {}
+    for t in rows:
+        goal_id = t.get(GOAL_FIELD)
+        if goal_id:
+            months = totals.setdefault(goal_id, {})
+            month = t['date'][:7]
+            months[month] = round(months.get(month, 0.0) + float(t['amount']), 2)
+    return totals
+
+
+def contribution_matrix(segments):
+    """Month x goal ID frame of contributions, assembled from the manifest's segment entries"""
+    columns = {}
+    for info in segments.values():
+        for goal_id, months in info.get('goals', {}).items():
+            columns.setdefault(goal_id, {}).update(months)
+    matrix = pd.DataFrame(columns, dtype=float).fillna(0.0)
+    return matrix.sort_index()
+
+
+def goal_progress(goals, matrix):
+    """Copies of the goals with `contributed` (from the ledger) and `current` (starting + contributed)"""
+    progress = []
+    for goal in goals:
+        contributed = float(matrix[goal['id']].sum()) if goal['id'] in matrix.columns else 0.0
+        progress.append({**goal, 'contributed': contributed,
+                         'current': float(goal.get('starting', 0.0)) + contributed})
+    return progress
+
+
+def contribution_history(matrix, goal_id):
+    """Monthly and cumulative contributions of one goal, one row per month from the first to the last"""
+    if goal_id not in matrix.columns or not matrix[goal_id].any():
+        return pd.DataFrame(columns=['month', 'amount', 'cumulative'])
+    monthly = matrix[goal_id]
+    monthly = monthly[monthly.ne(0).cumsum().gt(0)]
+    months = pd.period_range(monthly.index.min(), monthly.index.max(), freq='M').astype(str)
+    monthly = monthly.reindex(months, fill_value=0.0)
+    return pd.DataFrame({'month': months, 'amount': monthly.values, 'cumulative': monthly.cumsum().values})
@@ -0,0 +1,253 @@
+"""Ledger maintenance helpers that operate on the transaction list / DataFrame (no Streamlit imports here)"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from budget_currency import BASE_CURRENCY, CURRENCY_FIELD
+
+NON_ALNUM = re.compile(r"[^a-z0-9]+")
+RECURRING_SUFFIX = re.compile(r"\s*\(recurring\)\s*$", re.IGNORECASE)
+
+
+# Duplicate detection
+def normalize_description(text):
+    """Lowercase, drop the '(Recurring)' suffix and collapse punctuation/whitespace"""
+    text = RECURRING_SUFFIX.sub('', text or '')
+    return NON_ALNUM.sub(' ', text.lower()).strip()
+
+
+def epoch_days(dates):
+    """Datetime series -> integer days since 1970-01-01"""
+    return dates.values.astype('datetime64[D]').astype(np.int64)
+
+
+def duplicate_keys(df):
+    """64-bit hash of the normalized (type, amount, description) of each row"""
+    descriptions = df['description'].fillna('') if 'description' in df.columns else pd.Series([''] * len(df))
+    codes, uniques = pd.factorize(descriptions)
+    normalized = np.array([normalize_description(d) for d in uniques] + [''], dtype=object)
+    key_frame = pd.DataFrame({
+        'type': df['type'].values,
+        'cents': np.round(df['amount'].values.astype(float) * 100).astype(np.int64),
+        'description': normalized[codes]
+    })
+    return pd.util.hash_pandas_object(key_frame, index=False).values
+
+
+def find_duplicate_groups(df, tolerance_days=0):
+    """Duplicate group id per row (-1 for rows without duplicates)
+
+    Rows with the same normalized key whose dates are within `tolerance_days` of the
+    first row of their group are grouped; measuring from the first row (not the previous
+    one) keeps a regular series from chaining into one big group. Two rows created from
+    recurring templates only count as duplicates on the same day, so a daily recurring
+    charge is never merged. Keys are hashed once, then a single sort by (key, date) finds
+    the candidate neighbours; only those are walked to anchor the groups.
+    """
+    if df.empty:
+        return pd.Series(dtype=np.int64)
+    keys = duplicate_keys(df)
+    days = epoch_days(df['date'])
+    recurring = df['recurring'].fillna(False).astype(bool).values if 'recurring' in df.columns \
+        else np.zeros(len(df), dtype=bool)
+    order = np.lexsort((days, keys))
+    sorted_keys, sorted_days, sorted_recurring = keys[order], days[order], recurring[order]
+    same = (sorted_keys[1:] == sorted_keys[:-1]) & (sorted_days[1:] - sorted_days[:-1] <= tolerance_days)
+    starts = np.r_[True, ~same]
+    anchor, recurring_days = None, set()
+    for i in np.flatnonzero(~starts):
+        if starts[i - 1]:
+            anchor = sorted_days[i - 1]
+            recurring_days = {anchor} if sorted_recurring[i - 1] else set()
+        day = sorted_days[i]
+        if day - anchor > tolerance_days or (sorted_recurring[i] and recurring_days - {day}):
+            starts[i] = True
+            anchor, recurring_days = day, ({day} if sorted_recurring[i] else set())
+        elif sorted_recurring[i]:
+            recurring_days.add(day)
+    group_sorted = np.cumsum(starts) - 1
+    sizes = np.bincount(group_sorted)
+    groups = np.empty(len(df), dtype=np.int64)
+    groups[order] = np.where(sizes[group_sorted] > 1, group_sorted, -1)
+    return pd.Series(groups, index=df.index)
+
+
+def build_duplicate_index(df):
+    """Key hash -> sorted epoch days, for checking incoming batches against the ledger"""
+    if df.empty:
+        return {}
+    days = pd.Series(epoch_days(df['date']))
+    return {key: np.sort(group.values) for key, group in days.groupby(duplicate_keys(df))}
+
+
+def match_duplicates(index, batch_df, tolerance_days=0):
+    """Boolean array marking rows of an incoming batch that already exist in the indexed ledger"""
+    if batch_df.empty or not index:
+        return np.zeros(len(batch_df), dtype=bool)
+    matches = np.zeros(len(batch_df), dtype=bool)
+    for row, (key, day) in enumerate(zip(duplicate_keys(batch_df), epoch_days(batch_df['date']))):
+        known = index.get(key)
+        if known is None:
+            continue
+        pos = np.searchsorted(known, day)
+        nearest = [known[p] for p in (pos - 1, pos) if 0 <= p < len(known)]
+        matches[row] = any(abs(int(d) - int(day)) <= tolerance_days for d in nearest)
+    return matches
+
+
+def merge_duplicate_group(transactions, indices):
+    """Merge a duplicate group into its first row: union of tags, distinct notes joined"""
+    survivor = dict(transactions[indices[0]])
+    tags = list(survivor.get('tags') or [])
+    notes = [survivor['notes']] if survivor.get('notes') else []
+    for i in indices[1:]:
+        other = transactions[i]
+        tags.extend(tag for tag in other.get('tags') or [] if tag not in tags)
+        if other.get('notes') and other['notes'] not in notes:
+            notes.append(other['notes'])
+        survivor['recurring'] = survivor.get('recurring', False) and other.get('recurring', False)
+    survivor['tags'] = tags
+    survivor['notes'] = "\n".join(notes)
+    return survivor
+
+
+# Recurring-charge discovery
+# Frequency -> (shortest, longest) gap in days still counted as that frequency
+RECURRING_INTERVALS = {'Weekly': (6, 8), 'Bi-weekly': (12, 16), 'Monthly': (26, 35), 'Yearly': (350, 380)}
+RECURRING_OFFSETS = {'Weekly': pd.DateOffset(weeks=1), 'Bi-weekly': pd.DateOffset(weeks=2),
+                     'Monthly': pd.DateOffset(months=1), 'Yearly': pd.DateOffset(years=1)}
+RECURRING_PER_YEAR = {'Weekly': 52, 'Bi-weekly': 26, 'Monthly': 12, 'Yearly': 1}
+RECURRING_MIN_OCCURRENCES = {'Weekly': 4, 'Bi-weekly': 4, 'Monthly': 3, 'Yearly': 2}
+
+
+def find_recurring_charges(df, as_of=None, regularity=0.75, amount_tolerance=0.1):
+    """Income/expenses that repeat at a regular interval, as proposed recurring templates
+
+    Rows are grouped by (type, normalized description, currency) with one sort, and the gaps
+    between consecutive rows of a group are classified against RECURRING_INTERVALS in one
+    vectorized pass. A group is proposed when at least `regularity` of its gaps have the
+    same frequency and of its amounts are within `amount_tolerance` of the median amount.
+    Rows created from templates are skipped, and with `as_of` so are series that stopped
+    (more than one period overdue). Largest yearly cost first.
+    """
+    columns = ['type', 'category', 'description', 'amount', 'currency', 'frequency', 'occurrences',
+               'regularity', 'first_date', 'last_date', 'next_date', 'yearly_amount']
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+    candidates = df['type'].isin(['Income', 'Expense'])
+    if 'recurring' in df.columns:
+        candidates &= ~df['recurring'].fillna(False).astype(bool)
+    rows = df[candidates]
+    if rows.empty:
+        return pd.DataFrame(columns=columns)
+
+    descriptions = rows['description'].fillna('') if 'description' in rows.columns else pd.Series([''] * len(rows))
+    codes, uniques = pd.factorize(descriptions)
+    # Raw description -> normalized description code (-1 for descriptions that normalize to nothing)
+    normalized_codes, normalized = pd.factorize(np.array([normalize_description(d) for d in uniques], dtype=object))
+    description_codes = np.where(normalized[normalized_codes] == '', -1, normalized_codes)[codes]
+    currencies = rows[CURRENCY_FIELD].fillna(BASE_CURRENCY).values if CURRENCY_FIELD in rows.columns else \
+        np.full(len(rows), BASE_CURRENCY, dtype=object)
+    type_codes = (rows['type'].values == 'Income').astype(np.int64)
+    currency_codes, currency_uniques = pd.factorize(currencies)
+    keys = (description_codes * 2 + type_codes) * len(currency_uniques) + currency_codes
+    keys = np.where(description_codes < 0, -1, keys)
+    days = epoch_days(rows['date'])
+    order = np.lexsort((days, keys))
+    order = order[keys[order] >= 0]
+    if len(order) < 2:
+        return pd.DataFrame(columns=columns)
+    sorted_keys, sorted_days = keys[order], days[order]
+    group = np.cumsum(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]) - 1
+    groups = group[-1] + 1
+
+    # Frequency code of every gap inside a group (0 = no frequency, i + 1 = the i-th interval)
+    gaps = sorted_days[1:] - sorted_days[:-1]
+    within = group[1:] == group[:-1]
+    gap_codes = np.zeros(len(gaps), dtype=np.int64)
+    for i, (low, high) in enumerate(RECURRING_INTERVALS.values()):
+        gap_codes[(gaps >= low) & (gaps <= high)] = i + 1
+    counts = np.bincount(group[1:][within] * 5 + gap_codes[within], minlength=groups * 5).reshape(groups, 5)
+    gap_totals = counts.sum(axis=1)
+    best = counts[:, 1:].argmax(axis=1)
+    share = np.divide(counts[np.arange(groups), best + 1], gap_totals,
+                      out=np.zeros(groups), where=gap_totals > 0)
+
+    # Amount consistency around each group's median
+    amounts = rows['amount'].values.astype(float)[order]
+    median = pd.Series(amounts).groupby(group).median().values
+    close = np.abs(amounts - median[group]) <= amount_tolerance * np.abs(median[group])
+    amount_share = np.bincount(group, weights=close, minlength=groups) / np.bincount(group, minlength=groups)
+
+    occurrences = gap_totals + 1
+    frequencies = np.array(list(RECURRING_INTERVALS), dtype=object)[best]
+    needed = np.array([RECURRING_MIN_OCCURRENCES[f] for f in frequencies])
+    found = np.flatnonzero((share >= regularity) & (amount_share >= regularity) & (occurrences >= needed))
+    if not len(found):
+        return pd.DataFrame(columns=columns)
+
+    # Latest row of each found group supplies the category and description of the proposal
+    starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    first_rows = starts[found]
+    last_rows = np.r_[starts[1:] - 1, len(group) - 1][found]
+    latest = rows.iloc[order[last_rows]]
+    first_dates = rows['date'].values[order[first_rows]]
+    proposals = pd.DataFrame({
+        'type': latest['type'].values,
+        'category': latest['category'].values,
+        'description': latest['description'].fillna('').str.replace(RECURRING_SUFFIX, '', regex=True).str.strip().values,
+        'amount': np.round(median[found], 2),
+        'currency': currencies[order[last_rows]],
+        'frequency': frequencies[found],
+        'occurrences': occurrences[found],
+        'regularity': share[found],
+        'first_date': pd.to_datetime(first_dates),
+        'last_date': latest['date'].values
+    })
+    proposals['next_date'] = [last + RECURRING_OFFSETS[f] for last, f in
+                              zip(proposals['last_date'], proposals['frequency'])]
+    if as_of is not None:
+        # A series is stopped once its next payment is a full period late
+        overdue = [nxt + RECURRING_OFFSETS[f] < pd.Timestamp(as_of) for nxt, f in
+                   zip(proposals['next_date'], proposals['frequency'])]
+        proposals = proposals[~np.array(overdue, dtype=bool)]
+    proposals['yearly_amount'] = proposals['amount'] * proposals['frequency'].map(RECURRING_PER_YEAR)
+    return proposals.sort_values('yearly_amount', ascending=False, kind='stable').reset_index(drop=True)[columns]
+
+
+def recurring_template(proposal, start_date):
+    """Recurring tab template for a proposal of find_recurring_charges"""
+    template = {
+        'type': proposal['type'],
+        'category': proposal['category'],
+        'amount': float(proposal['amount']),
+        'description': proposal['description'],
+        'frequency': proposal['frequency'],
+        'start_date': start_date.isoformat(),
+        'tags': [],
+        'active': True,
+        'last_processed': None
+    }
+    if proposal['currency'] != BASE_CURRENCY:
+        template[CURRENCY_FIELD] = proposal['currency']
+    return template
+
+
+# Bulk edits
+def diff_grid_edits(original, edited, columns, delete_column='Delete'):
+    """Changes made in an edited grid, relative to the frame it was built from
+
+    Both frames share the index (ledger positions). Returns ({index: {column: new value}},
+    [deleted indices]); a row marked for deletion contributes no updates.
+    """
+    deleted = edited.index[edited[delete_column].fillna(False).astype(bool)]
+    kept = edited.drop(index=deleted)
+    before = original.loc[kept.index, columns]
+    after = kept[columns]
+    changed = ~((before == after) | (before.isna() & after.isna()))
+    updates = {
+        idx: {column: after.at[idx, column] for column in columns if flags[column]}
+        for idx, flags in changed[changed.any(axis=1)].iterrows()
+    }
+    return updates, list(deleted)
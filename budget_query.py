@@ -0,0 +1,335 @@
+"""Transaction query language: parsed once, compiled to a single vectorized boolean mask
+
+    amount>100 and category:groceries and tag:costco and date:2024-Q3
+    (type:income or recurring:yes) -tag:reimbursed date>=2024-01 "gift card"
+
+Terms are `field op value` or a bare word (searched in descriptions). Adjacent terms
+are ANDed; `and`, `or`, `not` / a leading `-`, and parentheses combine them.
+"""
+import calendar
+import re
+from datetime import date, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from budget_schema import DEFAULT_ACCOUNT
+
+FIELDS = {
+    'amount': 'amount', 'amt': 'amount',
+    'date': 'date',
+    'category': 'category', 'cat': 'category',
+    'type': 'type',
+    'account': 'account', 'acct': 'account',
+    'tag': 'tag', 'tags': 'tag',
+    'description': 'description', 'desc': 'description',
+    'notes': 'notes', 'note': 'notes',
+    'recurring': 'recurring',
+    'cleared': 'cleared'
+}
+TRUE_WORDS = {'yes', 'true', 'y', '1'}
+FALSE_WORDS = {'no', 'false', 'n', '0'}
+
+TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<lparen>\() | (?P<rparen>\)) |
+        (?P<term>-?[A-Za-z_]+(?:>=|<=|!=|>|<|=|:)(?:"[^"]*"|[^\s()]+)) |
+        (?P<quoted>-?"[^"]*") |
+        (?P<word>[^\s()]+)
+    )""", re.VERBOSE)
+TERM_PATTERN = re.compile(r'(-?)([A-Za-z_]+)(>=|<=|!=|>|<|=|:)(.*)')
+DANGLING_PATTERN = re.compile(r'-?([A-Za-z_]+)(>=|<=|!=|>|<|=|:)')
+BARE_OPERATOR_PATTERN = re.compile(r'-?(?:>=|<=|!=|>|<|=|:)')
+PERIOD_PATTERN = re.compile(r"^(\d{4})(?:-(?:Q([1-4])|(\d{1,2}))(?:-(\d{1,2}))?)?$", re.IGNORECASE)
+EMOJI_PREFIX = re.compile(r"^[^\w]+", re.UNICODE)
+
+
+class QueryError(ValueError):
+    """A query that can't be parsed"""
+
+
+def _tokenize(query):
+    tokens, pos = [], 0
+    query = query.strip()
+    while pos < len(query):
+        match = TOKEN_PATTERN.match(query, pos)
+        if not match or match.end() == pos:
+            raise QueryError(f"Unexpected input at position {pos}: {query[pos:pos + 10]!r}")
+        pos = match.end()
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+    return tokens
+
+
+def parse_period(text):
+    """'2024', '2024-Q3', '2024-07', '2024-07-15' or 'A..B' -> inclusive (start, end) dates"""
+    if '..' in text:
+        first, last = text.split('..', 1)
+        return parse_period(first)[0], parse_period(last)[1]
+    match = PERIOD_PATTERN.match(text.strip())
+    if not match:
+        raise QueryError(f"Unrecognized date {text!r} (use 2024, 2024-Q3, 2024-07 or 2024-07-15)")
+    year, quarter, month, day = match.groups()
+    year = int(year)
+    try:
+        if quarter:
+            if day:
+                raise ValueError
+            first_month = 3 * int(quarter) - 2
+            start = date(year, first_month, 1)
+            return start, date(year, first_month + 2, calendar.monthrange(year, first_month + 2)[1])
+        if day:
+            single = date(year, int(month), int(day))
+            return single, single
+        if month:
+            return date(year, int(month), 1), date(year, int(month), calendar.monthrange(year, int(month))[1])
+        return date(year, 1, 1), date(year, 12, 31)
+    except ValueError:
+        raise QueryError(f"Invalid date {text!r}") from None
+
+
+def _leaf(negate, field, op, value):
+    """Validated leaf node"""
+    if field not in FIELDS:
+        raise QueryError(f"Unknown field {field!r} (known: {', '.join(sorted(set(FIELDS.values())))})")
+    field = FIELDS[field]
+    value = value[1:-1] if len(value) >= 2 and value.startswith('"') and value.endswith('"') else value
+    if not value:
+        raise QueryError(f"Missing value for {field}")
+    if field == 'amount':
+        try:
+            value = float(value.lstrip('$').replace(',', ''))
+        except ValueError:
+            raise QueryError(f"amount needs a number, got {value!r}") from None
+    elif field == 'date':
+        value = parse_period(value)
+    elif field in ('recurring', 'cleared'):
+        if value.lower() not in TRUE_WORDS | FALSE_WORDS:
+            raise QueryError(f"{field} needs yes or no, got {value!r}")
+        value = value.lower() in TRUE_WORDS
+    elif op in ('>', '>=', '<', '<='):
+        raise QueryError(f"{field} doesn't support {op}")
+    else:
+        value = value.lower()
+    node = ('term', field, op, value)
+    return ('not', node) if negate else node
+
+
+class _Parser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            return None
+        node = self.parse_or()
+        if self.pos < len(self.tokens):
+            raise QueryError(f"Unexpected {self.peek()[1]!r}")
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.peek()[0] == 'word' and self.peek()[1].lower() == 'or':
+            self.take()
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ('or', nodes)
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while True:
+            kind, text = self.peek()
+            if kind is None or kind == 'rparen' or (kind == 'word' and text.lower() == 'or'):
+                break
+            if kind == 'word' and text.lower() == 'and':
+                self.take()
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else ('and', nodes)
+
+    def parse_not(self):
+        kind, text = self.peek()
+        if kind == 'word' and text.lower() == 'not':
+            self.take()
+            return ('not', self.parse_not())
+        return self.parse_atom()
+
+    def parse_atom(self):
+        kind, text = self.take()
+        if kind == 'lparen':
+            node = self.parse_or()
+            if self.take()[0] != 'rparen':
+                raise QueryError("Missing closing parenthesis")
+            return node
+        if kind == 'term':
+            negate, field, op, value = TERM_PATTERN.match(text).groups()
+            return _leaf(bool(negate), field.lower(), op, value)
+        if kind in ('word', 'quoted'):
+            if kind == 'word' and text.lower() in ('and', 'or'):
+                raise QueryError(f"Expected a term after {text!r}")
+            if kind == 'word' and BARE_OPERATOR_PATTERN.match(text):
+                # e.g. `amount > 100`: the spaces split the term, which would otherwise search for words
+                raise QueryError(f"{text!r} needs a field right before it, without spaces (e.g. amount>100)")
+            dangling = DANGLING_PATTERN.fullmatch(text) if kind == 'word' else None
+            if dangling and (dangling.group(1).lower() in FIELDS or dangling.group(2) not in (':', '=')):
+                raise QueryError(f"Missing value after {text!r}")
+            negate = text.startswith('-') and len(text) > 1
+            return _leaf(negate, 'description', ':', text[1:] if negate else text)
+        if kind is None:
+            raise QueryError("Query ends unexpectedly")
+        raise QueryError(f"Unexpected {text!r}")
+
+
+@lru_cache(maxsize=64)
+def parse_query(query):
+    """Query string -> syntax tree (None for an empty query); parsed trees are cached"""
+    return _Parser(_tokenize(query)).parse()
+
+
+def date_span(node):
+    """Smallest (start, end) date range the query can match; None ends are unbounded
+
+    Used to load only the year segments a query can touch.
+    """
+    if node is None:
+        return None, None
+    kind = node[0]
+    if kind == 'term':
+        _, field, op, value = node
+        if field != 'date' or op == '!=':
+            return None, None
+        start, end = value
+        return {
+            ':': (start, end), '=': (start, end),
+            # Clamped so date>9999-12-31 and date<0001 give an empty span instead of overflowing
+            '>': (end + timedelta(days=1) if end < date.max else date.max, None), '>=': (start, None),
+            '<': (None, start - timedelta(days=1) if start > date.min else date.min), '<=': (None, end)
+        }[op]
+    if kind == 'not':
+        return None, None
+    spans = [date_span(child) for child in node[1]]
+    starts, ends = [s for s, _ in spans], [e for _, e in spans]
+    if kind == 'and':
+        return (max((s for s in starts if s), default=None), min((e for e in ends if e), default=None))
+    return (None if None in starts else min(starts), None if None in ends else max(ends))
+
+
+class _Columns:
+    """Per-frame derived columns (lowercased text, exploded tags), built at most once per compile"""
+
+    def __init__(self, df):
+        self.df = df
+        self._cache = {}
+
+    def get(self, name):
+        if name not in self._cache:
+            self._cache[name] = self._build(name)
+        return self._cache[name]
+
+    def _build(self, name):
+        df = self.df
+        if name in ('description', 'notes', 'type'):
+            column = df[name] if name in df.columns else pd.Series('', index=df.index)
+            return column.fillna('').astype(str).str.lower()
+        if name == 'category':
+            return df['category'].fillna('').astype(str).str.lower()
+        if name == 'account':
+            column = df['account'] if 'account' in df.columns else pd.Series(None, index=df.index, dtype=object)
+            return column.fillna(DEFAULT_ACCOUNT).astype(str).str.lower()
+        if name in ('category_name', 'account_name'):
+            return self.get(name[:-5]).str.replace(EMOJI_PREFIX, '', regex=True).str.strip()
+        if name == 'tags':
+            tags = df['tags'] if 'tags' in df.columns else pd.Series([[]] * len(df), index=df.index)
+            exploded = tags.map(lambda t: t if isinstance(t, list) else []).explode()
+            return exploded.dropna().astype(str).str.strip().str.lower()
+        if name == 'days':
+            return df['date'].values.astype('datetime64[D]')
+        raise KeyError(name)
+
+
+def _compare(values, op, value):
+    if op in (':', '='):
+        return values == value
+    return {'!=': values != value, '>': values > value, '>=': values >= value,
+            '<': values < value, '<=': values <= value}[op]
+
+
+def _evaluate(node, columns):
+    kind = node[0]
+    if kind == 'and':
+        mask = _evaluate(node[1][0], columns)
+        for child in node[1][1:]:
+            mask &= _evaluate(child, columns)
+        return mask
+    if kind == 'or':
+        mask = _evaluate(node[1][0], columns)
+        for child in node[1][1:]:
+            mask |= _evaluate(child, columns)
+        return mask
+    if kind == 'not':
+        return ~_evaluate(node[1], columns)
+
+    _, field, op, value = node
+    df = columns.df
+    if field == 'amount':
+        return _compare(df['amount'].values.astype(float), op, value)
+    if field == 'date':
+        days = columns.get('days')
+        start, end = np.datetime64(value[0], 'D'), np.datetime64(value[1], 'D')
+        if op in (':', '='):
+            return (days >= start) & (days <= end)
+        if op == '!=':
+            return (days < start) | (days > end)
+        return {'>': days > end, '>=': days >= start, '<': days < start, '<=': days <= end}[op]
+    if field in ('recurring', 'cleared'):
+        flags = df[field].fillna(False).astype(bool).values if field in df.columns \
+            else np.zeros(len(df), dtype=bool)
+        return flags == value if op != '!=' else flags != value
+    if field == 'tag':
+        tags = columns.get('tags')
+        mask = df.index.isin(tags[tags == value].index)
+        return ~mask if op == '!=' else mask
+    if field in ('category', 'account') and op != ':':
+        mask = (columns.get(field).values == value) | (columns.get(field + '_name').values == value)
+        return ~mask if op == '!=' else mask
+    text = columns.get(field).values
+    if op == ':':
+        return np.array([value in t for t in text], dtype=bool)
+    return text == value if op == '=' else text != value
+
+
+def compile_query(query):
+    """Query string -> function(df) returning one boolean mask for the whole expression
+
+    The frame needs the columns of get_transactions_df(); derived columns such as
+    lowercased text and exploded tags are computed once per call, however many terms use them.
+    """
+    masks = compile_queries([query])
+    return lambda df: masks(df)[0]
+
+
+def compile_queries(queries):
+    """Several query strings -> function(df) returning one mask per query
+
+    Derived columns are shared by all the queries, so evaluating many queries over the
+    same frame costs little more than evaluating one.
+    """
+    trees = [parse_query(query) for query in queries]
+
+    def masks(df):
+        columns = _Columns(df)
+        return [
+            np.ones(len(df), dtype=bool) if tree is None or df.empty
+            else np.asarray(_evaluate(tree, columns), dtype=bool)
+            for tree in trees
+        ]
+
+    return masks
@@ -0,0 +1,111 @@
+"""Bank statement import and reconciliation against one account of the ledger"""
+import io
+
+import numpy as np
+import pandas as pd
+
+DATE_COLUMNS = ('date', 'posted date', 'posting date', 'transaction date', 'posted')
+AMOUNT_COLUMNS = ('amount', 'amt', 'value')
+DESCRIPTION_COLUMNS = ('description', 'memo', 'payee', 'name', 'details', 'narrative')
+
+
+class StatementError(ValueError):
+    """A statement file that can't be read"""
+
+
+def _find_column(columns, candidates):
+    return next((columns[c] for c in candidates if c in columns), None)
+
+
+def parse_statement(data, charges_positive=False):
+    """Statement CSV (bytes or text) -> frame of date, signed amount and description
+
+    Needs a date column plus either an amount column or separate debit/credit columns.
+    Amounts are positive for money coming in; `charges_positive` flips statements (typically
+    credit cards) that list charges as positive numbers.
+    """
+    if isinstance(data, bytes):
+        data = data.decode('utf-8-sig')
+    try:
+        raw = pd.read_csv(io.StringIO(data), dtype=str, skipinitialspace=True)
+    except (ValueError, pd.errors.ParserError) as e:
+        raise StatementError(f"Not a readable CSV file: {e}") from None
+    columns = {str(c).strip().lower(): c for c in raw.columns}
+
+    date_column = _find_column(columns, DATE_COLUMNS)
+    if date_column is None:
+        raise StatementError(f"No date column (looked for {', '.join(DATE_COLUMNS)})")
+
+    def money(column):
+        text = raw[column].fillna('0').str.replace(r'[$,\s]', '', regex=True)
+        text = text.str.replace(r'^\((.*)\)$', r'-\1', regex=True)  # (12.34) = -12.34
+        values = pd.to_numeric(text.replace('', '0'), errors='coerce')
+        if values.isna().any():
+            row = int(values.isna().values.argmax())
+            raise StatementError(f"Row {row + 2}: {raw[column].iloc[row]!r} is not an amount")
+        return values
+
+    amount_column = _find_column(columns, AMOUNT_COLUMNS)
+    if amount_column is not None:
+        amounts = money(amount_column)
+    elif 'debit' in columns and 'credit' in columns:
+        amounts = money(columns['credit']).abs() - money(columns['debit']).abs()
+    else:
+        raise StatementError("No amount column (or debit and credit columns)")
+    if charges_positive:
+        amounts = -amounts
+
+    dates = pd.to_datetime(raw[date_column].str.strip(), errors='coerce', format='mixed')
+    if dates.isna().any():
+        row = int(dates.isna().values.argmax())
+        raise StatementError(f"Row {row + 2}: {raw[date_column].iloc[row]!r} is not a date")
+
+    description_column = _find_column(columns, DESCRIPTION_COLUMNS)
+    return pd.DataFrame({
+        'date': dates.dt.normalize(),
+        'amount': amounts.astype(float),
+        'description': raw[description_column].fillna('').str.strip() if description_column is not None else ''
+    })
+
+
+def reconcile(ledger, statement, window_days=3):
+    """Match ledger rows to statement lines with the same amount (to the cent) at most window_days apart
+
+    Both sides are sorted by (amount, date) and merged in a single pass, so the cost is
+    O(n log n) for the sorts. Within one amount the greedy merge over dates pairs the most
+    rows any matching could. `ledger` and `statement` are frames with 'date' and signed
+    'amount'. Returns (pairs of (ledger label, statement label), unmatched ledger labels,
+    unmatched statement labels).
+    """
+    def keys(df):
+        cents = np.rint(df['amount'].to_numpy(dtype=float) * 100).astype(np.int64)
+        days = df['date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+        order = np.lexsort((days, cents))
+        return cents[order].tolist(), days[order].tolist(), df.index.to_numpy()[order].tolist()
+
+    ledger_cents, ledger_days, ledger_labels = keys(ledger)
+    statement_cents, statement_days, statement_labels = keys(statement)
+    ledger_matched = np.zeros(len(ledger_cents), dtype=bool)
+    statement_matched = np.zeros(len(statement_cents), dtype=bool)
+    pairs = []
+    i = j = 0
+    while i < len(ledger_cents) and j < len(statement_cents):
+        if ledger_cents[i] != statement_cents[j]:
+            if ledger_cents[i] < statement_cents[j]:
+                i += 1
+            else:
+                j += 1
+            continue
+        gap = ledger_days[i] - statement_days[j]
+        if abs(gap) <= window_days:
+            pairs.append((ledger_labels[i], statement_labels[j]))
+            ledger_matched[i] = statement_matched[j] = True
+            i += 1
+            j += 1
+        elif gap < 0:
+            i += 1
+        else:
+            j += 1
+    return (pairs,
+            [label for label, matched in zip(ledger_labels, ledger_matched) if not matched],
+            [label for label, matched in zip(statement_labels, statement_matched) if not matched])
@@ -0,0 +1,248 @@
+"""Report computations shared by the Reports tab and the headless month-end batch
+
+    python budget_reports.py households/* --out reports/2024-07 [--workers 8] [--as-of 2024-07-31]
+
+The batch treats each argument as a data directory (like budget_data) and writes the
+Monthly Summary, Category Analysis, Cash Flow and Tax Summary reports of each one as CSV
+files under --out/<ledger name>/, where the name is the ledger's path relative to the
+ledgers' common parent. Ledgers are spread over a process pool; the run ends with a
+per-ledger timing summary (also written to --out/timing.csv).
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+from budget_currency import RATES_FILE_NAME, convert_frame, needs_conversion, read_rates, read_reporting_currency
+from budget_schema import DAY_FIELD, days_to_datetimes
+from budget_storage import LEGACY_FILE_NAME, read_manifest, read_segment
+
+# Category Analysis periods: days back from today (None = the whole ledger)
+CATEGORY_PERIODS = {"Last Month": 30, "Last 3 Months": 90, "Last 6 Months": 180, "Last Year": 365, "All Time": None}
+
+# Tax Summary categories (customize as needed)
+DEDUCTIBLE_CATEGORIES = ["🏥 Healthcare", "🎓 Education", "🔧 Maintenance"]
+DONATION_CATEGORY = "🎁 Gifts & Donations"
+
+
+def period_start(period, today, ledger_start):
+    """First day a Category Analysis period covers"""
+    days = CATEGORY_PERIODS[period]
+    return ledger_start if days is None else today - timedelta(days=days)
+
+
+def monthly_summary(monthly_totals):
+    """Income, expenses, net savings and savings rate per month from a month-indexed Income/Expense frame"""
+    income = monthly_totals['Income']
+    expenses = monthly_totals['Expense']
+    summary = pd.DataFrame({
+        'Income': income,
+        'Expenses': expenses,
+        'Net Savings': income - expenses,
+        'Savings Rate': (income - expenses) / income * 100
+    })
+    summary.index.name = 'month'
+    return summary.reset_index()
+
+
+def frame_monthly_totals(df):
+    """Month-indexed Income/Expense frame of a transactions frame"""
+    if df.empty:
+        return pd.DataFrame(columns=['Income', 'Expense'], dtype=float).rename_axis('month')
+    monthly = df.groupby([df['date'].dt.strftime('%Y-%m'), 'type'])['amount'].sum().unstack('type')
+    monthly = monthly.reindex(columns=['Income', 'Expense'])
+    monthly = monthly.where(monthly != 0).sort_index()
+    monthly.index.name = 'month'
+    monthly.columns.name = None
+    return monthly
+
+
+def category_analysis(df, transaction_type, start, end):
+    """Total, average and count per category of one type between two dates, largest total first"""
+    if df.empty:
+        return pd.DataFrame(columns=['Category', 'Total', 'Average', 'Count'])
+    dates = df['date'].dt.date
+    selected = df[(df['type'] == transaction_type) & (dates >= start) & (dates <= end)]
+    stats = selected.groupby('category')['amount'].agg(['sum', 'mean', 'count']).reset_index()
+    stats.columns = ['Category', 'Total', 'Average', 'Count']
+    return stats.sort_values('Total', ascending=False)
+
+
+def cash_flow(df):
+    """Weekly income, expenses, net cash flow and cumulative net savings"""
+    if df.empty:
+        return pd.DataFrame(columns=['week', 'Income', 'Expenses', 'Net Cash Flow', 'Cumulative Net'])
+    weeks = df['date'].dt.to_period('W')
+    weekly = df.groupby([weeks, df['type']])['amount'].sum().unstack('type')
+    weekly = weekly.reindex(columns=['Income', 'Expense']).fillna(0.0)
+    flow = pd.DataFrame({'Income': weekly['Income'], 'Expenses': weekly['Expense']})
+    flow['Net Cash Flow'] = flow['Income'] - flow['Expenses']
+    flow['Cumulative Net'] = flow['Net Cash Flow'].cumsum()
+    flow.index = flow.index.astype(str)
+    flow.index.name = 'week'
+    return flow.reset_index()
+
+
+def tax_summary(df, year):
+    """Income, potential deductions, donations and income by source for one calendar year"""
+    year_df = df[df['date'].dt.year == year] if not df.empty else df
+    if year_df.empty:
+        return {'year': year, 'total_income': 0.0, 'deductions': 0.0, 'donations': 0.0,
+                'income_sources': pd.DataFrame(columns=['category', 'amount'])}
+    income_df = year_df[year_df['type'] == 'Income']
+    expense_df = year_df[year_df['type'] == 'Expense']
+    return {
+        'year': year,
+        'total_income': float(income_df['amount'].sum()),
+        'deductions': float(expense_df[expense_df['category'].isin(DEDUCTIBLE_CATEGORIES)]['amount'].sum()),
+        'donations': float(expense_df[expense_df['category'] == DONATION_CATEGORY]['amount'].sum()),
+        'income_sources': income_df.groupby('category')['amount'].sum().reset_index()
+    }
+
+
+# Batch
+
+def load_ledger(data_dir):
+    """Frame of every transaction of a data directory, with amounts in the ledger's reporting currency"""
+    segment_dir = Path(data_dir) / "transactions"
+    manifest = read_manifest(segment_dir)
+    if (Path(data_dir) / LEGACY_FILE_NAME).exists():
+        raise ValueError(f"Still has a {LEGACY_FILE_NAME}: open it in the app once to split it into year segments")
+    rows = [t for year in sorted(manifest['segments']) for t in read_segment(segment_dir, manifest, year)]
+    if not rows:
+        return pd.DataFrame({'date': pd.Series(dtype='datetime64[ns]'), 'type': pd.Series(dtype=object),
+                             'category': pd.Series(dtype=object), 'amount': pd.Series(dtype=float)})
+    df = pd.DataFrame(rows)
+    df['date'] = days_to_datetimes(df.pop(DAY_FIELD).values)
+    currency = read_reporting_currency(data_dir)
+    if needs_conversion(df, currency):
+        df['amount'], _ = convert_frame(df, read_rates(Path(data_dir) / RATES_FILE_NAME), currency)
+    return df
+
+
+def ledger_reports(df, as_of, period, tax_year):
+    """File name -> report frame for one ledger, covering the transactions up to `as_of`"""
+    df = df[df['date'].dt.date <= as_of] if not df.empty else df
+    ledger_start = df['date'].min().date() if not df.empty else as_of
+    start = period_start(period, as_of, ledger_start)
+    tax = tax_summary(df, tax_year)
+    return {
+        'monthly_summary.csv': monthly_summary(frame_monthly_totals(df)),
+        'category_analysis_expenses.csv': category_analysis(df, 'Expense', start, as_of),
+        'category_analysis_income.csv': category_analysis(df, 'Income', start, as_of),
+        'cash_flow.csv': cash_flow(df),
+        'tax_summary.csv': pd.DataFrame([
+            {'item': 'Total Income', 'amount': tax['total_income']},
+            {'item': 'Potential Deductions', 'amount': tax['deductions']},
+            {'item': 'Charitable Donations', 'amount': tax['donations']}
+        ]),
+        'tax_income_sources.csv': tax['income_sources']
+    }
+
+
+def ledger_names(ledgers):
+    """Unique name of each ledger directory: its path relative to the ledgers' common parent
+
+    households/a/budget_data and households/b/budget_data become a/budget_data and
+    b/budget_data, so their reports don't overwrite each other. A lone ledger keeps its
+    folder name. Arguments naming the same directory twice get the same name.
+    """
+    paths = [Path(ledger).resolve() for ledger in ledgers]
+    if not paths:
+        return []
+    common = Path(os.path.commonpath(paths))
+    if common in paths:
+        common = common.parent
+    return [path.relative_to(common).as_posix() for path in paths]
+
+
+def run_ledger(data_dir, out_dir, as_of, period, tax_year, name=None):
+    """Build and write one ledger's reports (runs in a worker process); returns its timing record"""
+    record = {'ledger': name or Path(data_dir).name, 'rows': 0, 'status': 'ok', 'error': ''}
+    started = time.perf_counter()
+    try:
+        df = load_ledger(data_dir)
+        loaded = time.perf_counter()
+        reports = ledger_reports(df, as_of, period, tax_year)
+        computed = time.perf_counter()
+        target = Path(out_dir) / record['ledger']
+        target.mkdir(parents=True, exist_ok=True)
+        for name, frame in reports.items():
+            frame.to_csv(target / name, index=False, float_format='%.2f')
+        record.update(rows=len(df), load_seconds=loaded - started, compute_seconds=computed - loaded,
+                      write_seconds=time.perf_counter() - computed)
+    except Exception as e:  # one broken ledger is reported, the others still run
+        record.update(status='error', error=str(e).splitlines()[0] if str(e) else type(e).__name__)
+    record['total_seconds'] = time.perf_counter() - started
+    record['worker'] = os.getpid()
+    return record
+
+
+def run_batch(ledgers, out_dir, as_of=None, period="Last Month", tax_year=None, workers=None):
+    """Reports for every ledger over a process pool; returns (timing records in input order, wall seconds)
+
+    Arguments that aren't directories, or that repeat a ledger already given, get an error
+    record instead of reports.
+    """
+    as_of = as_of or date.today()
+    tax_year = tax_year or as_of.year
+    started = time.perf_counter()
+    found = [i for i, ledger in enumerate(ledgers) if Path(ledger).is_dir()]
+    names = {i: str(ledger) for i, ledger in enumerate(ledgers)}
+    names.update(zip(found, ledger_names([ledgers[i] for i in found])))
+    records, seen = {}, set()
+    for i, name in names.items():
+        error = ("not a directory" if i not in found
+                 else "same ledger as an earlier argument" if name in seen else None)
+        seen.add(name)
+        if error:
+            records[i] = {'ledger': name, 'rows': 0, 'status': 'error', 'error': error, 'total_seconds': 0.0}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_ledger, str(ledgers[i]), str(out_dir), as_of, period, tax_year, names[i]): i
+                   for i in found if i not in records}
+        for future in as_completed(futures):
+            records[futures[future]] = future.result()
+    return [records[i] for i in range(len(ledgers))], time.perf_counter() - started
+
+
+def timing_summary(records, wall_seconds):
+    """Per-ledger timing table plus a totals line"""
+    lines = [f"{'Ledger':<28} {'Rows':>9} {'Load':>8} {'Compute':>8} {'Write':>8} {'Total':>8}  Status"]
+    for r in records:
+        if r['status'] == 'ok':
+            lines.append(f"{r['ledger'][-28:]:<28} {r['rows']:>9,} {r['load_seconds']:>7.2f}s {r['compute_seconds']:>7.2f}s "
+                         f"{r['write_seconds']:>7.2f}s {r['total_seconds']:>7.2f}s  ok")
+        else:
+            lines.append(f"{r['ledger'][-28:]:<28} {'':>9} {'':>8} {'':>8} {'':>8} {r['total_seconds']:>7.2f}s  "
+                         f"error: {r['error']}")
+    busy = sum(r['total_seconds'] for r in records)
+    failed = sum(r['status'] != 'ok' for r in records)
+    lines.append(f"{len(records)} ledgers ({failed} failed) in {wall_seconds:.2f}s wall, {busy:.2f}s of work "
+                 f"({busy / wall_seconds if wall_seconds else 0:.1f}x parallel speedup)")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write month-end reports for many ledgers in parallel")
+    parser.add_argument('ledgers', nargs='+', help="data directories (each like budget_data)")
+    parser.add_argument('--out', required=True, help="output directory (one subdirectory per ledger)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--as-of', type=date.fromisoformat, default=None, help="report date (default: today)")
+    parser.add_argument('--period', choices=list(CATEGORY_PERIODS), default="Last Month",
+                        help="Category Analysis period")
+    parser.add_argument('--tax-year', type=int, default=None, help="Tax Summary year (default: the as-of year)")
+    args = parser.parse_args()
+
+    records, wall_seconds = run_batch(args.ledgers, args.out, args.as_of, args.period, args.tax_year, args.workers)
+    print(timing_summary(records, wall_seconds))
+    Path(args.out).mkdir(parents=True, exist_ok=True)
+    pd.DataFrame(records).to_csv(Path(args.out) / "timing.csv", index=False, float_format='%.3f')
+    raise SystemExit(1 if any(r['status'] != 'ok' for r in records) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""User-defined categorize/tag rules, compiled once into a single multi-pattern matcher
+
+    {'name': "Rideshare", 'contains': "uber", 'when': "amount<100",
+     'type': "Expense", 'category': "🚗 Transportation", 'tags': ["rideshare"], 'enabled': True}
+
+`contains` is a case-insensitive description substring and `when` an optional query in
+the transaction query language (see budget_query), e.g. "amount>1000 and category:salary".
+Rules are in priority order: the first matching rule with a category sets it, and every
+matching rule adds its tags.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from budget_query import QueryError, compile_queries, parse_query
+from budget_schema import TRANSACTION_TYPES
+
+
+class RuleError(ValueError):
+    """A rule that can't be compiled"""
+
+
+def validate_rule(rule):
+    """Checked, normalized copy of a rule; raises RuleError"""
+    record = {
+        'name': str(rule.get('name') or '').strip(),
+        'contains': str(rule.get('contains') or '').strip(),
+        'when': str(rule.get('when') or '').strip(),
+        'type': rule.get('type') or None,
+        'category': rule.get('category') or None,
+        'tags': [str(tag).strip() for tag in rule.get('tags') or [] if str(tag).strip()],
+        'enabled': bool(rule.get('enabled', True))
+    }
+    if not record['contains'] and not record['when']:
+        raise RuleError("A rule needs a description match, a condition or both")
+    if not record['category'] and not record['tags']:
+        raise RuleError("A rule needs a category to set, tags to add or both")
+    if record['type'] is not None and record['type'] not in TRANSACTION_TYPES:
+        raise RuleError(f"type {record['type']!r} must be one of {', '.join(TRANSACTION_TYPES)}")
+    if record['category'] and record['type'] is None:
+        raise RuleError("A rule that sets a category needs the category's transaction type")
+    try:
+        parse_query(record['when'])
+    except QueryError as e:
+        raise RuleError(f"Condition: {e}") from None
+    record['name'] = record['name'] or record['contains'] or record['when']
+    return record
+
+
+
+def rename_rule_category(rules, transaction_type, old, new):
+    """Point the rules that set category `old` (of a transaction type) at `new`; returns how many changed"""
+    changed = 0
+    for rule in rules:
+        if rule.get('category') == old and rule.get('type') == transaction_type:
+            rule['category'] = new
+            changed += 1
+    return changed
+
+
+def compile_rules(rules):
+    """Enabled rules -> matcher: one regex over every `contains` pattern plus each rule's condition
+
+    The regex is a lookahead alternation, longest pattern first, so one scan of a
+    description reports the longest pattern starting at each position. Any pattern
+    that is a substring of a reported one occurs as well; `implied` maps each pattern
+    to every rule it triggers that way, so no rule is ever tested on its own.
+    """
+    active = [validate_rule(rule) for rule in rules if rule.get('enabled', True)]
+    by_pattern, always = {}, []
+    for position, rule in enumerate(active):
+        if rule['contains']:
+            by_pattern.setdefault(rule['contains'].lower(), []).append(position)
+        else:
+            always.append(position)
+
+    ordered = sorted(by_pattern, key=len, reverse=True)
+    regex = re.compile("(?=(" + "|".join(map(re.escape, ordered)) + "))") if ordered else None
+    implied = {
+        pattern: sorted({position for other in ordered if other in pattern for position in by_pattern[other]})
+        for pattern in ordered
+    }
+    conditional = [position for position, rule in enumerate(active) if rule['when']]
+    return {
+        'rules': active,
+        'regex': regex,
+        'implied': implied,
+        'always': always,
+        'conditional': conditional,
+        'conditions': compile_queries([active[position]['when'] for position in conditional])
+    }
+
+
+def transactions_frame(transactions):
+    """Minimal frame of a transaction list for evaluating rule conditions"""
+    df = pd.DataFrame(list(transactions))
+    df['date'] = pd.to_datetime(df['date'].astype(str).str[:10])
+    return df
+
+
+def match_rules(compiled, transactions, df=None):
+    """Positions (in priority order) of the rules matching each transaction
+
+    Descriptions are scanned once by the combined regex. Conditions are then evaluated
+    together, as vectorized masks over just the rows some conditional rule's pattern hit.
+    `df` may be a ready-made frame of `transactions` (same row order) to avoid building one.
+    """
+    rules = compiled['rules']
+    n = len(transactions)
+    candidates = {position: np.arange(n) for position in compiled['always']}
+    regex = compiled['regex']
+    if regex is not None:
+        for row, t in enumerate(transactions):
+            found = set()
+            for pattern in regex.findall((t.get('description') or '').lower()):
+                found.update(compiled['implied'][pattern])
+            for position in found:
+                candidates.setdefault(position, []).append(row)
+
+    types = np.array([t.get('type') for t in transactions], dtype=object)
+    rows_by_rule = {}
+    for position, rows in candidates.items():
+        rows = np.asarray(rows, dtype=np.intp)
+        if rules[position]['type']:
+            rows = rows[types[rows] == rules[position]['type']]
+        if rows.size:
+            rows_by_rule[position] = rows
+
+    conditional = [position for position in compiled['conditional'] if position in rows_by_rule]
+    if conditional:
+        needed = np.zeros(n, dtype=bool)
+        for position in conditional:
+            needed[rows_by_rule[position]] = True
+        needed = np.flatnonzero(needed)
+        frame = transactions_frame([transactions[row] for row in needed]) if df is None else df.iloc[needed]
+        masks = dict(zip(compiled['conditional'], compiled['conditions'](frame)))
+        for position in conditional:
+            rows = rows_by_rule[position]
+            rows_by_rule[position] = rows[masks[position][np.searchsorted(needed, rows)]]
+
+    matched = [[] for _ in range(n)]
+    for position in sorted(rows_by_rule):
+        for row in rows_by_rule[position]:
+            matched[row].append(position)
+    return matched
+
+
+def rule_changes(compiled, transactions, df=None, keep_category=False):
+    """{row: {field: value}} of what the matching rules change; untouched rows are left out
+
+    With keep_category the rules only add tags (for rows whose category the user chose).
+    """
+    rules = compiled['rules']
+    changes = {}
+    for row, positions in enumerate(match_rules(compiled, transactions, df)):
+        if not positions:
+            continue
+        t = transactions[row]
+        change = {}
+        if not keep_category:
+            category = next((rules[p]['category'] for p in positions if rules[p]['category']), None)
+            if category and category != t.get('category'):
+                change['category'] = category
+        tags = list(t.get('tags') or [])
+        seen = {tag.lower() for tag in tags}
+        for position in positions:
+            for tag in rules[position]['tags']:
+                if tag.lower() not in seen:
+                    tags.append(tag)
+                    seen.add(tag.lower())
+        if len(tags) != len(t.get('tags') or []):
+            change['tags'] = tags
+        if change:
+            changes[row] = change
+    return changes
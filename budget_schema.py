@@ -0,0 +1,119 @@
+"""Transaction record schema: validation at load time and the in-memory epoch-day date field"""
+import math
+import re
+from datetime import date
+
+import numpy as np
+
+TRANSACTION_TYPES = ("Income", "Expense", "Transfer")
+
+# Account of rows saved before accounts existed (and of rows added without one)
+DEFAULT_ACCOUNT = "🏦 Checking"
+
+# In-memory only: days since 1970-01-01, decoded once when a segment is read. Never persisted.
+DAY_FIELD = '_day'
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class SchemaError(ValueError):
+    """A stored transaction that doesn't match the schema"""
+
+
+def epoch_day(iso_date):
+    """'YYYY-MM-DD' -> days since 1970-01-01"""
+    return date.fromisoformat(iso_date).toordinal() - EPOCH_ORDINAL
+
+
+def from_epoch_day(day):
+    """Days since 1970-01-01 -> date"""
+    return date.fromordinal(int(day) + EPOCH_ORDINAL)
+
+
+def validate_transaction(t, where=""):
+    """Checked, normalized copy of a stored transaction with its date decoded
+
+    Raises SchemaError naming the row and field for anything malformed.
+    """
+    prefix = f"{where}: " if where else ""
+    if not isinstance(t, dict):
+        raise SchemaError(f"{prefix}expected an object, got {type(t).__name__}")
+    record = dict(t)
+
+    raw_date = record.get('date')
+    try:
+        parsed = date.fromisoformat(str(raw_date)[:10])
+    except (TypeError, ValueError):
+        raise SchemaError(f"{prefix}date {raw_date!r} is not an ISO date (YYYY-MM-DD)") from None
+    record['date'] = parsed.isoformat()
+    record[DAY_FIELD] = parsed.toordinal() - EPOCH_ORDINAL
+
+    raw_amount = record.get('amount')
+    try:
+        amount = float(raw_amount)
+    except (TypeError, ValueError):
+        raise SchemaError(f"{prefix}amount {raw_amount!r} is not a number") from None
+    if isinstance(raw_amount, bool) or not math.isfinite(amount):
+        raise SchemaError(f"{prefix}amount {raw_amount!r} is not a finite number")
+    record['amount'] = amount
+
+    if record.get('type') not in TRANSACTION_TYPES:
+        raise SchemaError(f"{prefix}type {record.get('type')!r} must be one of {', '.join(TRANSACTION_TYPES)}")
+    if not isinstance(record.get('category'), str) or not record['category']:
+        raise SchemaError(f"{prefix}category {record.get('category')!r} must be a non-empty string")
+    if not isinstance(record.get('description', ''), str):
+        raise SchemaError(f"{prefix}description must be a string")
+    if 'account' in record and (not isinstance(record['account'], str) or not record['account']):
+        raise SchemaError(f"{prefix}account {record['account']!r} must be a non-empty string")
+    if record['type'] == 'Transfer':
+        to_account = record.get('to_account')
+        if not isinstance(to_account, str) or not to_account:
+            raise SchemaError(f"{prefix}a transfer needs a to_account")
+        if to_account == (record.get('account') or DEFAULT_ACCOUNT):
+            raise SchemaError(f"{prefix}a transfer can't go to the account it comes from")
+    if 'goal_id' in record and (record['type'] != 'Transfer' or not isinstance(record['goal_id'], str)
+                                or not record['goal_id']):
+        raise SchemaError(f"{prefix}goal_id must be a non-empty string on a transfer")
+    if 'currency' in record and (not isinstance(record['currency'], str)
+                                 or not re.fullmatch(r'[A-Z]{3}', record['currency'])):
+        raise SchemaError(f"{prefix}currency {record['currency']!r} must be a three-letter code like EUR")
+    if not isinstance(record.get('cleared', False), bool):
+        raise SchemaError(f"{prefix}cleared must be true or false")
+    tags = record.get('tags', [])
+    if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+        raise SchemaError(f"{prefix}tags must be a list of strings")
+    return record
+
+
+def validate_transactions(rows, source):
+    """Validate a whole file's rows, collecting every error instead of stopping at the first
+
+    Returns (records, errors); records is only complete when errors is empty.
+    """
+    if not isinstance(rows, list):
+        return [], [f"{source}: expected a list of transactions"]
+    records, errors = [], []
+    for i, t in enumerate(rows):
+        try:
+            records.append(validate_transaction(t, f"{source} row {i + 1}"))
+        except SchemaError as e:
+            errors.append(str(e))
+    return records, errors
+
+
+def stamp_days(transactions):
+    """Decode the date of records added since load (those without a day field), in place"""
+    for t in transactions:
+        if DAY_FIELD not in t:
+            t[DAY_FIELD] = epoch_day(t['date'][:10])
+    return transactions
+
+
+def storable(t):
+    """A record without its in-memory fields, as written to disk"""
+    return {k: v for k, v in t.items() if k != DAY_FIELD}
+
+
+def days_to_datetimes(days):
+    """Epoch-day integers -> datetime64 array, without any string parsing"""
+    return np.asarray(days, dtype=np.int64).astype('datetime64[D]').astype('datetime64[ns]')
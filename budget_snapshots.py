@@ -0,0 +1,286 @@
+"""Versioned snapshots of the data folder: periodic full bases plus compressed line deltas"""
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+
+from budget_storage import ledger_lock
+
+SNAPSHOT_DIR_NAME = "snapshots"
+INDEX_NAME = "index.json"
+
+BASE_EVERY = 50         # versions between full bases
+REBASE_RATIO = 0.5      # ...or sooner, once a delta grows past half the size of its base
+KEEP_RECENT = 50        # retention: the newest versions are always kept
+KEEP_DAILY_DAYS = 30    # then the last version of each day for this many days
+KEEP_WEEKLY_WEEKS = 26  # then the last version of each week for this many weeks
+
+# Decoded files of the most recently used base, so consecutive deltas don't re-read it
+_base_cache = {}
+
+
+def _snapshot_dir(data_dir):
+    return data_dir / SNAPSHOT_DIR_NAME
+
+
+def _write_gzip_json(path, payload):
+    """Atomically write a gzip-compressed JSON document, returning its size in bytes"""
+    tmp = path.with_name(path.name + ".tmp")
+    with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+        json.dump(payload, f, separators=(',', ':'))
+    os.replace(tmp, path)
+    return path.stat().st_size
+
+
+def _read_gzip_json(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def read_index(data_dir):
+    """Snapshot index: every retained version, oldest first"""
+    path = _snapshot_dir(data_dir) / INDEX_NAME
+    if not path.exists():
+        return {'next_id': 1, 'versions': []}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _write_index(data_dir, index):
+    path = _snapshot_dir(data_dir) / INDEX_NAME
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, 'w') as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp, path)
+
+
+def _managed_files(data_dir, patterns):
+    """Snapshot key (path relative to data_dir, without .gz) -> file path"""
+    files = {}
+    for pattern in patterns:
+        for path in data_dir.glob(pattern):
+            if path.is_file() and not path.name.endswith(('.tmp', '.lock')):
+                key = path.relative_to(data_dir).as_posix()
+                files[key[:-3] if key.endswith('.gz') else key] = path
+    return files
+
+
+def _signature(files):
+    """Cheap change detector: (mtime, size, compressed) of every managed file"""
+    signature = {}
+    for key, path in files.items():
+        stat = path.stat()
+        signature[key] = [stat.st_mtime_ns, stat.st_size, path.suffix == '.gz']
+    return signature
+
+
+def encode_file(path):
+    """File content as lines: one JSON record per line for list files, text lines otherwise"""
+    compressed = path.suffix == '.gz'
+    opener = gzip.open if compressed else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = None
+    # json.dumps(list) == "[" + ", ".join(json.dumps(item)) + "]", so this round-trips exactly
+    if isinstance(data, list) and text == json.dumps(data):
+        return {'kind': 'list', 'gz': compressed, 'lines': [json.dumps(item) for item in data]}
+    return {'kind': 'text', 'gz': compressed, 'lines': text.split('\n')}
+
+
+def decode_file(entry):
+    """Inverse of encode_file"""
+    if entry['kind'] == 'list':
+        return "[" + ", ".join(entry['lines']) + "]"
+    return "\n".join(entry['lines'])
+
+
+def line_delta(base_lines, new_lines):
+    """Encode new_lines against base_lines in one pass
+
+    Ops are either [start, count] (copy a run of base lines) or a string (a new line).
+    Runs are found by hashing base lines and extending each match while lines agree.
+    """
+    positions = {}
+    for i, line in enumerate(base_lines):
+        positions.setdefault(line, i)
+    ops = []
+    j = 0
+    while j < len(new_lines):
+        i = positions.get(new_lines[j])
+        if i is None:
+            ops.append(new_lines[j])
+            j += 1
+            continue
+        run = 1
+        while i + run < len(base_lines) and j + run < len(new_lines) and base_lines[i + run] == new_lines[j + run]:
+            run += 1
+        ops.append([i, run])
+        j += run
+    return ops
+
+
+def apply_delta(base_lines, ops):
+    """Inverse of line_delta"""
+    lines = []
+    for op in ops:
+        if isinstance(op, str):
+            lines.append(op)
+        else:
+            lines.extend(base_lines[op[0]:op[0] + op[1]])
+    return lines
+
+
+def _load_base(data_dir, version):
+    """Decoded files of a base version (cached)"""
+    if _base_cache.get('id') != (str(data_dir), version['id']):
+        _base_cache.clear()
+        _base_cache['files'] = _read_gzip_json(_snapshot_dir(data_dir) / version['file'])
+        _base_cache['id'] = (str(data_dir), version['id'])
+    return _base_cache['files']
+
+
+def _find(index, version_id):
+    return next(v for v in index['versions'] if v['id'] == version_id)
+
+
+def materialize(data_dir, index, version_id):
+    """Full file state (key -> encoded file) of a version: its base plus at most one delta"""
+    version = _find(index, version_id)
+    base = _load_base(data_dir, version if version['kind'] == 'base' else _find(index, version['base']))
+    if version['kind'] == 'base':
+        return dict(base)
+    files = dict(base)
+    for key, change in _read_gzip_json(_snapshot_dir(data_dir) / version['file']).items():
+        if change is None:
+            files.pop(key, None)
+        else:
+            base_lines = base[key]['lines'] if key in base else []
+            files[key] = {'kind': change['kind'], 'gz': change['gz'], 'lines': apply_delta(base_lines, change['ops'])}
+    return files
+
+
+def take_snapshot(data_dir, patterns, label=""):
+    """Record the current state of the managed files as a new version (no-op if nothing changed)
+
+    Deltas are always taken against the latest base, so restoring any version reads at
+    most two files. Only files whose signature changed since the previous version are
+    re-read; unchanged files reuse the previous delta's entry. The snapshot lock is held
+    from reading the index to writing it back, so concurrent sessions can't take the
+    same version ID or drop each other's index entries.
+    """
+    with ledger_lock(_snapshot_dir(data_dir)):
+        return _record_version(data_dir, patterns, label)
+
+
+def _record_version(data_dir, patterns, label):
+    """take_snapshot with the snapshot lock already held"""
+    snap_dir = _snapshot_dir(data_dir)
+    snap_dir.mkdir(parents=True, exist_ok=True)
+    index = read_index(data_dir)
+    files = _managed_files(data_dir, patterns)
+    signature = _signature(files)
+    last = index['versions'][-1] if index['versions'] else None
+    if last is not None and last['signature'] == signature:
+        return None
+
+    version_id = index['next_id']
+    version = {'id': version_id, 'time': datetime.now().isoformat(timespec='seconds'),
+               'label': label, 'signature': signature}
+
+    payload = None
+    if last is not None:
+        base = last if last['kind'] == 'base' else _find(index, last['base'])
+        since_base = sum(1 for v in index['versions'] if v['id'] > base['id'])
+        if since_base < BASE_EVERY:
+            base_files = _load_base(data_dir, base)
+            previous = _read_gzip_json(snap_dir / last['file']) if last['kind'] == 'delta' else {}
+            delta = {}
+            for key, path in files.items():
+                if last['signature'].get(key) == signature[key]:
+                    if key in previous:
+                        delta[key] = previous[key]
+                    continue
+                entry = encode_file(path)
+                if base_files.get(key) == entry:
+                    continue
+                same_kind = key in base_files and base_files[key]['kind'] == entry['kind']
+                ops = line_delta(base_files[key]['lines'], entry['lines']) if same_kind else entry['lines']
+                delta[key] = {'kind': entry['kind'], 'gz': entry['gz'], 'ops': ops}
+            for key in base_files:
+                if key not in files:
+                    delta[key] = None
+            version.update(kind='delta', base=base['id'], file=f"v{version_id:06d}.delta.json.gz")
+            version['bytes'] = _write_gzip_json(snap_dir / version['file'], delta)
+            if version['bytes'] <= REBASE_RATIO * base['bytes']:
+                payload = delta
+            else:
+                (snap_dir / version['file']).unlink()
+
+    if payload is None:
+        version.update(kind='base', base=version_id, file=f"v{version_id:06d}.base.json.gz")
+        version['bytes'] = _write_gzip_json(snap_dir / version['file'],
+                                            {key: encode_file(path) for key, path in files.items()})
+
+    index['versions'].append(version)
+    index['next_id'] = version_id + 1
+    apply_retention(data_dir, index)
+    _write_index(data_dir, index)
+    return version
+
+
+def apply_retention(data_dir, index, now=None):
+    """Drop versions outside the retention policy, keeping every base a kept delta needs"""
+    now = now or datetime.now()
+    versions = index['versions']
+    keep = {v['id'] for v in versions[-KEEP_RECENT:]}
+    daily, weekly = {}, {}
+    for v in versions:
+        when = datetime.fromisoformat(v['time'])
+        if now - when <= timedelta(days=KEEP_DAILY_DAYS):
+            daily[when.date()] = v['id']
+        if now - when <= timedelta(weeks=KEEP_WEEKLY_WEEKS):
+            weekly[when.isocalendar()[:2]] = v['id']
+    keep |= set(daily.values()) | set(weekly.values())
+    keep |= {v['base'] for v in versions if v['id'] in keep}
+
+    snap_dir = _snapshot_dir(data_dir)
+    for v in versions:
+        if v['id'] not in keep:
+            (snap_dir / v['file']).unlink(missing_ok=True)
+    index['versions'] = [v for v in versions if v['id'] in keep]
+    return index
+
+
+def version_at(index, when):
+    """Latest version recorded at or before `when` (a datetime), or None"""
+    candidates = [v for v in index['versions'] if datetime.fromisoformat(v['time']) <= when]
+    return candidates[-1] if candidates else None
+
+
+def restore_snapshot(data_dir, patterns, version_id):
+    """Rewrite the managed files to match a version, then record the restore as a new version
+
+    Holds the snapshot lock throughout; callers restoring the ledger segments should hold
+    the ledger lock around this as well.
+    """
+    with ledger_lock(_snapshot_dir(data_dir)):
+        index = read_index(data_dir)
+        files = materialize(data_dir, index, version_id)
+        current = _managed_files(data_dir, patterns)
+
+        for key, path in current.items():
+            target = files.get(key)
+            if target is None or target['gz'] != (path.suffix == '.gz'):
+                path.unlink()
+        for key, entry in files.items():
+            path = data_dir / (key + ".gz" if entry['gz'] else key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(path.name + ".tmp")
+            opener = gzip.open if entry['gz'] else open
+            with opener(tmp, 'wt', encoding='utf-8') as f:
+                f.write(decode_file(entry))
+            os.replace(tmp, path)
+        return _record_version(data_dir, patterns, f"Restored version {version_id}")
@@ -0,0 +1,96 @@
+"""Startup performance: deferred heavy imports, per-run phase timings and an import-time report
+
+Run `python budget_startup.py` for a cold-import report; it exits non-zero when the
+app's eager imports exceed IMPORT_BUDGET_SECONDS.
+"""
+import importlib
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+IMPORT_BUDGET_SECONDS = 1.5      # cold interpreter importing everything budget_app imports eagerly
+FIRST_PAINT_BUDGET_SECONDS = 0.5  # script start -> title and Quick Stats on screen
+FULL_RENDER_BUDGET_SECONDS = 3.0  # script start -> every tab rendered
+
+EAGER_IMPORTS = [
+    "streamlit", "pandas", "numpy",
+    "budget_analytics", "budget_ledger", "budget_storage", "budget_categorizer",
+    "budget_schema", "budget_snapshots", "budget_query", "budget_rules", "budget_accounts",
+    "budget_reconcile", "budget_goals", "budget_ingest", "budget_reports", "budget_export",
+    "budget_currency"
+]
+DEFERRED_IMPORTS = ["plotly.express", "plotly.graph_objects"]
+
+# Seconds spent in each deferred import of this process (only the first access pays)
+deferred_import_times = {}
+
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            start = time.perf_counter()
+            self._module = importlib.import_module(self._name)
+            deferred_import_times[self._name] = time.perf_counter() - start
+        return getattr(self._module, attr)
+
+
+class StartupTimer:
+    """Wall-clock marks for the phases of one script run"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks = []
+
+    def mark(self, phase):
+        self.marks.append((phase, time.perf_counter() - self.start))
+
+    def elapsed(self, phase):
+        return next((seconds for name, seconds in self.marks if name == phase), None)
+
+    def over_budget(self):
+        """(phase, seconds, budget) for each budgeted phase that ran too long"""
+        budgets = {'first paint': FIRST_PAINT_BUDGET_SECONDS, 'full render': FULL_RENDER_BUDGET_SECONDS}
+        return [
+            (phase, seconds, budgets[phase])
+            for phase, seconds in self.marks
+            if phase in budgets and seconds > budgets[phase]
+        ]
+
+
+def cold_import_time(modules, python=sys.executable):
+    """Seconds a fresh interpreter takes to import `modules` (in order)"""
+    statements = "; ".join(f"import {m}" for m in modules)
+    code = f"import time; t = time.perf_counter(); {statements}; print(time.perf_counter() - t)"
+    result = subprocess.run([python, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=Path(__file__).resolve().parent)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def import_report():
+    """Cold import time of each heavy module on its own, plus the whole eager set together"""
+    rows = [(m, cold_import_time([m]), "eager") for m in EAGER_IMPORTS]
+    rows += [(m, cold_import_time([m]), "deferred") for m in DEFERRED_IMPORTS]
+    return rows, cold_import_time(EAGER_IMPORTS)
+
+
+def main():
+    rows, eager_total = import_report()
+    width = max(len(m) for m, _, _ in rows)
+    for module, seconds, when in rows:
+        print(f"{module:<{width}}  {seconds * 1000:8.1f} ms  {when}")
+    print(f"{'eager total':<{width}}  {eager_total * 1000:8.1f} ms  (budget {IMPORT_BUDGET_SECONDS * 1000:.0f} ms)")
+    if eager_total > IMPORT_BUDGET_SECONDS:
+        print("Eager imports are over budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
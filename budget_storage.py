@@ -0,0 +1,338 @@
+"""Year-partitioned transaction storage: one segment file per year plus a small manifest"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date
+
+from budget_accounts import account_totals
+from budget_currency import foreign_monthly_totals
+from budget_goals import contribution_totals
+from budget_schema import SchemaError, validate_transaction, validate_transactions, storable
+
+MANIFEST_NAME = "manifest.json"
+LEGACY_FILE_NAME = "transactions.json"  # single-file ledger of older versions, beside the segment folder
+LOCK_NAME = "ledger.lock"
+LOCK_STALE_SECONDS = 30
+MAX_CACHED_SEGMENTS = 32
+MAX_REPORTED_ERRORS = 10
+
+# Parsed segments shared by all sessions of the process, least recently used first
+_segment_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class FrozenRow(dict):
+    """A stored transaction shared by every session of the process
+
+    Sessions hold references to these rows instead of private copies, so a row is read-only:
+    to change one, replace it in the session's list with an edited dict(row) copy.
+    """
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("Shared transactions are read-only; replace the row with an edited dict(row) copy")
+
+    __setitem__ = __delitem__ = setdefault = pop = popitem = clear = update = __ior__ = _read_only
+
+    def __reduce__(self):
+        return FrozenRow, (dict(self),)
+
+
+class LedgerView(list):
+    """A session's transactions: shared rows of whole segments, plus any local changes
+
+    While `pristine`, the list is exactly the listed segments in order, so it can be served
+    from structures shared across sessions; any mutation clears the flag.
+    """
+
+    def __init__(self, rows=(), segments=()):
+        super().__init__(rows)
+        self.segments = list(segments)
+        self.pristine = True
+
+    def attach(self, year, rows):
+        """Append a whole segment without losing pristine status"""
+        super().extend(rows)
+        self.segments.append(year)
+
+    def _changed(method):
+        def wrapper(self, *args, **kwargs):
+            self.pristine = False
+            return method(self, *args, **kwargs)
+        wrapper.__name__ = method.__name__
+        return wrapper
+
+    append = _changed(list.append)
+    extend = _changed(list.extend)
+    insert = _changed(list.insert)
+    pop = _changed(list.pop)
+    remove = _changed(list.remove)
+    sort = _changed(list.sort)
+    reverse = _changed(list.reverse)
+    __setitem__ = _changed(list.__setitem__)
+    __delitem__ = _changed(list.__delitem__)
+    __iadd__ = _changed(list.__iadd__)
+    del _changed
+
+
+def _atomic_write(path, data, compressed=False):
+    """Write to a temporary file and swap it in, so readers never see a half-written segment"""
+    tmp = path.with_name(path.name + ".tmp")
+    if compressed:
+        with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+            f.write(data)
+    else:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(data)
+    os.replace(tmp, path)
+
+
+def read_manifest(segment_dir):
+    """Segment index: file, row count, date span and monthly/category/account summaries per year"""
+    path = segment_dir / MANIFEST_NAME
+    if not path.exists():
+        return {'segments': {}, 'compress_closed': False}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def write_manifest(segment_dir, manifest):
+    """Persist the manifest"""
+    segment_dir.mkdir(parents=True, exist_ok=True)
+    _atomic_write(segment_dir / MANIFEST_NAME, json.dumps(manifest, indent=1, sort_keys=True))
+
+
+@contextmanager
+def ledger_lock(segment_dir, timeout=10.0):
+    """Hold the cross-process write lock of the segments (a lock file) for a read-modify-write
+
+    Writers in other processes (the ingestion service) commit between the app's runs; the
+    lock keeps their manifest updates from interleaving. A lock file older than
+    LOCK_STALE_SECONDS belongs to a writer that died and is taken over.
+    """
+    segment_dir.mkdir(parents=True, exist_ok=True)
+    path = segment_dir / LOCK_NAME
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - path.stat().st_mtime > LOCK_STALE_SECONDS:
+                    path.unlink(missing_ok=True)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"The ledger is locked by another writer ({path})")
+            time.sleep(0.005)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        path.unlink(missing_ok=True)
+
+
+def rows_added_elsewhere(segment_dir, seen, current, transactions, years, key, deleted=()):
+    """Rows another process added to `years` between the manifests `seen` and `current`
+
+    Only rows carrying `key` (an ID the other writer sets on every row) count, and only
+    those whose ID isn't among `transactions` already, so merging them into a session
+    that loaded `seen` and then saving keeps both sides' changes. `deleted` holds the IDs
+    of rows the session removed since it loaded `seen`; they are still on disk and are
+    not brought back.
+    """
+    changed = [year for year in years if year in current['segments']
+               and current['segments'][year]['digest'] != seen['segments'].get(year, {}).get('digest')]
+    if not changed:
+        return []
+    known = {t[key] for t in transactions if key in t} | set(deleted)
+    return [t for year in changed for t in read_segment(segment_dir, current, year) if key in t and t[key] not in known]
+
+
+def segment_years(manifest, start=None, end=None):
+    """Years whose segments overlap the [start, end] date range (None = open-ended)"""
+    years = []
+    for year, info in manifest['segments'].items():
+        if start is not None and info['max_date'] < start.isoformat():
+            continue
+        if end is not None and info['min_date'] > end.isoformat():
+            continue
+        years.append(year)
+    return sorted(years)
+
+
+def _read_segment_file(path):
+    """Parse a plain or gzip-compressed segment"""
+    opener = gzip.open if path.suffix == '.gz' else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _check_rows(rows, source):
+    """Validated records of a file, or SchemaError listing what is wrong with it"""
+    records, errors = validate_transactions(rows, source)
+    if errors:
+        more = len(errors) - MAX_REPORTED_ERRORS
+        raise SchemaError("\n".join(errors[:MAX_REPORTED_ERRORS]) + (f"\n...and {more} more" if more > 0 else ""))
+    return records
+
+
+def read_segment(segment_dir, manifest, year):
+    """Validated transactions of one year as shared read-only rows
+
+    Files are parsed, validated and date-decoded once per process and then cached; every
+    session loading the year gets the same FrozenRow objects.
+    """
+    info = manifest['segments'].get(year)
+    if not info:
+        return []
+    path = segment_dir / info['file']
+    stat = path.stat()
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        rows = _segment_cache.get(key)
+        if rows is not None:
+            _segment_cache.move_to_end(key)
+    if rows is None:
+        rows = [FrozenRow(t) for t in _check_rows(_read_segment_file(path), info['file'])]
+        with _cache_lock:
+            _segment_cache[key] = rows
+            while len(_segment_cache) > MAX_CACHED_SEGMENTS:
+                _segment_cache.popitem(last=False)
+    return list(rows)
+
+
+def _remember_segment(path, rows):
+    """Cache rows just written to a segment as if read back, so the next read skips parsing it
+
+    Rows that came from read_segment are already validated; the rest are validated here
+    (a row that fails is left for read_segment to report).
+    """
+    try:
+        frozen = [t if isinstance(t, FrozenRow) else FrozenRow(validate_transaction(storable(t))) for t in rows]
+    except SchemaError:
+        return
+    stat = path.stat()
+    with _cache_lock:
+        _segment_cache[(str(path), stat.st_mtime_ns, stat.st_size)] = frozen
+        while len(_segment_cache) > MAX_CACHED_SEGMENTS:
+            _segment_cache.popitem(last=False)
+
+
+def summarize_segment(rows):
+    """Manifest entry fields for one segment"""
+    dates = [t['date'] for t in rows]
+    monthly = {}
+    category_counts = {}
+    for t in rows:
+        month = monthly.setdefault(t['date'][:7], {'Income': 0.0, 'Expense': 0.0})
+        month[t['type']] = month.get(t['type'], 0.0) + float(t['amount'])
+        counts = category_counts.setdefault(t['type'], {})
+        counts[t['category']] = counts.get(t['category'], 0) + 1
+    return {
+        'count': len(rows),
+        'min_date': min(dates),
+        'max_date': max(dates),
+        'monthly': monthly,
+        'categories': category_counts,
+        'accounts': account_totals(rows),
+        'goals': contribution_totals(rows),
+        'currencies': foreign_monthly_totals(rows)
+    }
+
+
+def write_segments(segment_dir, manifest, transactions, loaded_years):
+    """Persist the loaded years of the ledger, rewriting only segments whose content changed
+
+    `transactions` holds the fully loaded years in `loaded_years` plus possibly new rows
+    for years that were never loaded; those are merged into the stored segment.
+    """
+    segment_dir.mkdir(parents=True, exist_ok=True)
+    by_year = {}
+    for t in transactions:
+        by_year.setdefault(t['date'][:4], []).append(t)
+    for year in set(by_year) - set(loaded_years):
+        by_year[year] = read_segment(segment_dir, manifest, year) + by_year[year]
+
+    closed_before = str(date.today().year)
+    changed = not (segment_dir / MANIFEST_NAME).exists()
+    for year in set(loaded_years) | set(by_year):
+        rows = sorted(by_year.get(year, []), key=lambda t: t['date'])
+        old = manifest['segments'].get(year)
+        if not rows:
+            if old:
+                (segment_dir / old['file']).unlink(missing_ok=True)
+                manifest['segments'].pop(year)
+                changed = True
+            continue
+
+        data = json.dumps([storable(t) for t in rows])
+        digest = hashlib.sha1(data.encode('utf-8')).hexdigest()
+        compressed = bool(manifest.get('compress_closed')) and year < closed_before
+        file_name = f"{year}.json.gz" if compressed else f"{year}.json"
+        if old and old.get('digest') == digest and old['file'] == file_name:
+            continue
+
+        _atomic_write(segment_dir / file_name, data, compressed=compressed)
+        _remember_segment(segment_dir / file_name, rows)
+        if old and old['file'] != file_name:
+            (segment_dir / old['file']).unlink(missing_ok=True)
+        manifest['segments'][year] = {'file': file_name, 'compressed': compressed, 'digest': digest,
+                                      **summarize_segment(rows)}
+        changed = True
+    # Leaving the manifest untouched keeps its timestamp, which callers use as the ledger version
+    if changed:
+        write_manifest(segment_dir, manifest)
+    return manifest
+
+
+def clear_segments(segment_dir, manifest):
+    """Delete every segment and empty the manifest"""
+    for info in manifest['segments'].values():
+        (segment_dir / info['file']).unlink(missing_ok=True)
+    manifest['segments'] = {}
+    write_manifest(segment_dir, manifest)
+    return manifest
+
+
+def migrate_legacy_file(legacy_file, segment_dir):
+    """Split a single transactions.json into year segments (the old file is kept as .bak)
+
+    Rows are merged into any segments already there (e.g. written by the ingestion service
+    before the app first opened the ledger). Hold the ledger lock around this.
+    """
+    with open(legacy_file, 'r') as f:
+        transactions = _check_rows(json.load(f), legacy_file.name)
+    manifest = write_segments(segment_dir, read_manifest(segment_dir), transactions, [])
+    os.replace(legacy_file, legacy_file.with_name(legacy_file.name + ".bak"))
+    return manifest
+
+
+def set_closed_year_compression(segment_dir, manifest, enabled):
+    """Turn gzip compression of past years on or off, rewriting the affected segments"""
+    manifest['compress_closed'] = bool(enabled)
+    years = list(manifest['segments'])
+    rows = [t for year in years for t in read_segment(segment_dir, manifest, year)]
+    manifest = write_segments(segment_dir, manifest, rows, years)
+    write_manifest(segment_dir, manifest)
+    return manifest
+
+
+def write_quick_stats(path, stats):
+    """Persist the sidebar's current-month totals so the next cold start can paint them immediately"""
+    _atomic_write(path, json.dumps(stats))
+
+
+def read_quick_stats(path):
+    """Saved sidebar totals, or None if missing or unreadable"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
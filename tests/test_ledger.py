@@ -0,0 +1,26 @@
+import pandas as pd
+
+from budget_ledger import find_duplicate_groups
+
+
+def ledger(dates, description, recurring):
+    return pd.DataFrame({'date': pd.to_datetime(dates), 'type': 'Expense', 'amount': 4.5,
+                         'description': description, 'recurring': recurring})
+
+
+def test_daily_recurring_series_is_not_merged():
+    days = ['2026-01-01', '2026-01-02', '2026-01-03', '2026-01-04', '2026-01-05']
+    groups = find_duplicate_groups(ledger(days, "Coffee (Recurring)", True), tolerance_days=1)
+    assert (groups == -1).all()
+
+
+def test_daily_series_does_not_chain_into_one_group():
+    days = ['2026-01-01', '2026-01-02', '2026-01-03', '2026-01-04', '2026-01-05']
+    groups = find_duplicate_groups(ledger(days, "Coffee", False), tolerance_days=1)
+    assert groups.value_counts().max() <= 2
+
+
+def test_manual_copy_of_a_recurring_row_is_a_duplicate():
+    df = ledger(['2026-01-02', '2026-01-03'], ["Rent (Recurring)", "rent"], [True, False])
+    groups = find_duplicate_groups(df, tolerance_days=1)
+    assert groups[0] == groups[1] != -1
@@ -0,0 +1,18 @@
+import pytest
+
+from budget_query import QueryError, date_span, parse_query
+
+
+@pytest.mark.parametrize('query', ["amount > 100", "amount >100", "amount >= 100", "date : 2024", "amount>", "cat:"])
+def test_split_or_dangling_comparison_is_rejected(query):
+    with pytest.raises(QueryError):
+        parse_query(query)
+
+
+def test_bare_words_are_still_searched():
+    assert parse_query("re:") == ('term', 'description', ':', 're:')
+
+
+def test_open_date_spans_at_the_calendar_limits_do_not_overflow():
+    assert date_span(parse_query("date<0001"))[1] is not None
+    assert date_span(parse_query("date>9999-12-31"))[0] is not None
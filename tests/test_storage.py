@@ -0,0 +1,19 @@
+import copy
+
+from budget_storage import read_manifest, rows_added_elsewhere, write_segments
+
+
+def row(feed_id, day):
+    return {'date': f"2026-01-{day:02d}", 'type': 'Expense', 'category': "🍔 Food & Dining", 'amount': 5.0,
+            'description': "Feed", 'tags': [], 'notes': '', 'recurring': False, 'feed_id': feed_id}
+
+
+def test_rows_deleted_in_the_session_are_not_merged_back(tmp_path):
+    seen = copy.deepcopy(write_segments(tmp_path, read_manifest(tmp_path), [row('a', 1), row('b', 2)], set()))
+    # Another writer commits while the session has deleted 'b'
+    current = write_segments(tmp_path, read_manifest(tmp_path), [row('c', 3)], set())
+    session = [row('a', 1)]
+    added = rows_added_elsewhere(tmp_path, seen, current, session, {'2026'}, 'feed_id', deleted={'b'})
+    assert [t['feed_id'] for t in added] == ['c']
+    added = rows_added_elsewhere(tmp_path, seen, current, session, {'2026'}, 'feed_id')
+    assert sorted(t['feed_id'] for t in added) == ['b', 'c']